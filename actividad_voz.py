@@ -0,0 +1,129 @@
+"""
+DETECCIÓN DE ACTIVIDAD DE VOZ (VAD)
+Compuerta barata delante del análisis: energía por trama (dBFS) contra un
+piso de ruido adaptativo que baja de inmediato y sube despacio, con tramas
+de "colgado" que mantienen la voz activa después de la última trama sonora.
+Las ventanas sin voz se resuelven como "sin voz" sin extraer características,
+y el ruido de fondo de una cabina vacía deja de clasificarse como emoción.
+Si ya hay un frente STFT (espectro.py), la energía por trama sale de sus
+espectros (Parseval) y se pasa a `procesar_db` sin volver a enmarcar.
+"""
+
+import numpy as np
+
+from caracteristicas import enmarcar
+
+TRAMA_SEGUNDOS = 0.02
+MARGEN_DB = 9.0              # Voz: energía por encima del piso de ruido + margen
+UMBRAL_ABSOLUTO_DB = -55.0   # Por debajo de esto nunca es voz (silencio digital)
+SUBIDA_DB_POR_SEG = 0.5      # Velocidad máxima a la que sube el piso de ruido
+PERCENTIL_RUIDO = 10         # Tramas más silenciosas de la ventana = estimación del ruido
+COLGADO_SEGUNDOS = 0.3       # Voz sostenida tras la última trama sonora
+MIN_VOZ_SEGUNDOS = 0.1       # Voz mínima en la ventana para analizarla
+PISO_MINIMO_DB = -90.0
+
+
+def potencia_db(potencia):
+    """Potencia media por trama (x² promedio, escala [-1, 1]) en dBFS."""
+    return np.maximum(10.0 * np.log10(np.asarray(potencia) + 1e-12), PISO_MINIMO_DB)
+
+
+class DetectorVoz:
+    """
+    VAD por ventanas con estado entre llamadas (una instancia por stream).
+    `procesar` regresa si la ventana tiene voz y lleva la cuenta de las
+    ventanas omitidas para reportar la proporción.
+    """
+
+    def __init__(self, rate=16000, trama_seg=TRAMA_SEGUNDOS, margen_db=MARGEN_DB,
+                 colgado_seg=COLGADO_SEGUNDOS, min_voz_seg=MIN_VOZ_SEGUNDOS,
+                 subida_db_por_seg=SUBIDA_DB_POR_SEG):
+        self.rate = rate
+        self.trama_seg = trama_seg
+        self.tam_trama = max(1, int(rate * trama_seg))
+        self.margen_db = margen_db
+        self.subida_db_por_seg = subida_db_por_seg
+        self.tramas_colgado = int(round(colgado_seg / trama_seg))
+        self.min_tramas_voz = max(1, int(round(min_voz_seg / trama_seg)))
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el piso de ruido y los contadores (ej. al cambiar de archivo)."""
+        self.piso_db = None
+        self._voz_al_final = False
+        self.ventanas = 0
+        self.omitidas = 0
+
+    def energia_db(self, audio):
+        """
+        Energía de cada trama en dBFS (int16 o float en [-1, 1]). Con un
+        bloque (canales x muestras) cuenta el micrófono más fuerte de cada trama.
+        """
+        x = np.asarray(audio)
+        escala = 32768.0 ** 2 if x.dtype == np.int16 else 1.0
+        tramas = enmarcar(x.astype(np.float32), self.tam_trama)
+        energia = np.einsum('...j,...j->...', tramas, tramas) / (self.tam_trama * escala)
+        if energia.ndim > 1:
+            energia = energia.reshape(-1, energia.shape[-1]).max(axis=0)
+        return potencia_db(energia)
+
+    def procesar(self, audio, avance_seg=None):
+        """
+        Decide si la ventana tiene voz. `avance_seg` es el audio nuevo desde
+        la llamada anterior (por defecto la ventana completa; menos si las
+        ventanas se traslapan) y limita cuánto puede subir el piso.
+        """
+        db = self.energia_db(audio) if audio is not None else np.zeros(0)
+        return self.procesar_db(db, avance_seg)
+
+    def procesar_db(self, db, avance_seg=None):
+        """
+        Igual que `procesar` con la energía por trama (dBFS) ya calculada;
+        las tramas deben avanzar `trama_seg` entre sí.
+        """
+        self.ventanas += 1
+        n = len(db)
+        if n == 0:
+            self.omitidas += 1
+            return {'voz': False, 'ratio_voz': 0.0, 'piso_db': self.piso_db, 'umbral_db': None}
+
+        # Piso de ruido: baja de inmediato, sube como mucho subida_db_por_seg
+        avance_seg = n * self.trama_seg if avance_seg is None else avance_seg
+        ruido = float(np.percentile(db, PERCENTIL_RUIDO))
+        if self.piso_db is None or ruido < self.piso_db:
+            self.piso_db = ruido
+        else:
+            self.piso_db = min(ruido, self.piso_db + self.subida_db_por_seg * avance_seg)
+
+        umbral = max(self.piso_db + self.margen_db, UMBRAL_ABSOLUTO_DB)
+        activas = db > umbral
+        tramas_voz = int(activas.sum())
+
+        # Colgado: cada trama activa mantiene la voz las siguientes tramas
+        # (distancia a la última trama activa; sin sumas que se desborden)
+        if self.tramas_colgado and tramas_voz:
+            indices = np.arange(n)
+            ultima = np.maximum.accumulate(np.where(activas, indices, -n - self.tramas_colgado))
+            activas = indices - ultima <= self.tramas_colgado
+
+        # La ventana que sigue a una que terminó con voz también se analiza
+        voz = tramas_voz >= self.min_tramas_voz or self._voz_al_final
+        self._voz_al_final = bool(activas[-1])
+        if not voz:
+            self.omitidas += 1
+
+        return {
+            'voz': voz,
+            'ratio_voz': float(activas.mean()),
+            'piso_db': round(self.piso_db, 1),
+            'umbral_db': round(umbral, 1)
+        }
+
+    def estadisticas(self):
+        """Ventanas vistas, omitidas por silencio y proporción omitida."""
+        return {
+            'ventanas': self.ventanas,
+            'omitidas': self.omitidas,
+            'ratio_omitidas': round(self.omitidas / self.ventanas, 3) if self.ventanas else 0.0,
+            'piso_db': round(self.piso_db, 1) if self.piso_db is not None else None
+        }
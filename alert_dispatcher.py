@@ -0,0 +1,249 @@
+"""
+DESPACHADOR DE ALERTAS DE EMERGENCIA
+Cola de prioridad con hilos propios para que una alerta crítica nunca
+espere detrás del análisis o de escrituras a disco. Los avisos salen por
+backends intercambiables (socket.io, log, stub para pruebas, Twilio...),
+con reintentos hasta una fecha límite. Cada alerta registra sus tiempos
+(detección → cola → persistencia → notificación) y el despachador calcula
+la latencia p50/p99.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 5
+
+DEFAULT_DEADLINE = 30.0     # Segundos para lograr la notificación
+RETRY_BASE = 0.25           # Primer reintento; se duplica hasta RETRY_MAX
+RETRY_MAX = 5.0
+LATENCY_WINDOW = 1000       # Alertas recientes usadas para p50/p99
+
+
+class Alert:
+    """Una alerta en curso con sus marcas de tiempo (time.monotonic)."""
+
+    def __init__(self, incident, priority, detected_at, deadline, notifiers):
+        self.incident = incident
+        self.priority = priority
+        self.timestamps = {'detected': detected_at, 'queued': time.monotonic()}
+        self.deadline = detected_at + deadline
+        self.pending = list(notifiers)
+        self.attempts = 0
+        self.status = 'pending'
+        self._dispatcher = None
+
+    @property
+    def alert_id(self):
+        return self.incident.get('incident_id')
+
+    def mark(self, stage):
+        """
+        Registra el momento en que la alerta alcanzó una etapa. Solo cuenta
+        la primera vez: los reintentos no agregan muestras de latencia.
+        """
+        if stage in self.timestamps:
+            return
+        self.timestamps[stage] = time.monotonic()
+        if self._dispatcher:
+            self._dispatcher._record(self, stage)
+
+    def latencies_ms(self):
+        """Milisegundos desde la detección hasta cada etapa."""
+        start = self.timestamps['detected']
+        return {stage: round((t - start) * 1000, 2)
+                for stage, t in self.timestamps.items() if stage != 'detected'}
+
+
+# ============================================================================
+# BACKENDS DE NOTIFICACIÓN
+# ============================================================================
+
+class Notifier:
+    """Backend de notificación. `send` lanza una excepción si falla."""
+
+    name = 'notifier'
+
+    def send(self, alert):
+        raise NotImplementedError
+
+
+class LogNotifier(Notifier):
+    """Deja la alerta en el log del sistema."""
+
+    name = 'log'
+
+    def __init__(self, log=None):
+        self.log = log or logger
+
+    def send(self, alert):
+        self.log.critical(f"🚨 ALERTA {alert.alert_id} (cabina {alert.incident.get('cabin_id')})")
+
+
+class SocketIONotifier(Notifier):
+    """Emite 'emergency_alert' a todos los clientes de socket.io."""
+
+    name = 'socketio'
+
+    def __init__(self, socketio, event='emergency_alert'):
+        self.socketio = socketio
+        self.event = event
+
+    def send(self, alert):
+        self.socketio.emit(self.event, alert.incident)
+
+
+class StubNotifier(Notifier):
+    """Notificador local para pruebas: guarda las alertas y puede fallar a propósito."""
+
+    name = 'stub'
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.sent = []
+
+    def send(self, alert):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("falla simulada")
+        self.sent.append(alert.incident)
+
+
+class TwilioNotifier(Notifier):
+    """Llamada/SMS a la línea de crisis vía Twilio (requiere el paquete twilio)."""
+
+    name = 'twilio'
+
+    def __init__(self, account_sid, auth_token, from_number, to_number):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+        self.to_number = to_number
+
+    def send(self, alert):
+        self.client.messages.create(
+            body=f"🚨 Emergencia en cabina {alert.incident.get('cabin_id')}: {alert.alert_id}",
+            from_=self.from_number,
+            to=self.to_number
+        )
+
+
+# ============================================================================
+# DESPACHADOR
+# ============================================================================
+
+class AlertDispatcher:
+    """Despacha alertas por prioridad con reintentos y contabilidad de latencia."""
+
+    def __init__(self, notifiers=None, workers=2, deadline=DEFAULT_DEADLINE):
+        self.notifiers = list(notifiers or [])
+        self.deadline = deadline
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"alert-dispatcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def add_notifier(self, notifier):
+        self.notifiers.append(notifier)
+
+    def dispatch(self, incident, priority=PRIORITY_CRITICAL, detected_at=None, deadline=None):
+        """Encola una alerta y regresa de inmediato con el objeto Alert."""
+        detected_at = time.monotonic() if detected_at is None else detected_at
+        alert = Alert(incident, priority, detected_at, deadline or self.deadline, self.notifiers)
+        alert._dispatcher = self
+        self._record(alert, 'queued')
+        self._queue.put((priority, next(self._seq), alert))
+        return alert
+
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            _, _, alert = self._queue.get()
+            alert.mark('dispatched')
+            alert.attempts += 1
+
+            still_pending = []
+            for notifier in alert.pending:
+                try:
+                    notifier.send(alert)
+                    alert.mark(f"notified_{notifier.name}")
+                except Exception as e:
+                    logger.error(f"Fallo al notificar {alert.alert_id} por {notifier.name}: {e}")
+                    still_pending.append(notifier)
+            alert.pending = still_pending
+
+            if not still_pending:
+                alert.status = 'sent'
+                alert.mark('notified')
+                with self._lock:
+                    self.sent += 1
+                continue
+
+            self._schedule_retry(alert)
+
+    def _schedule_retry(self, alert):
+        delay = min(RETRY_BASE * 2 ** (alert.attempts - 1), RETRY_MAX)
+        if time.monotonic() + delay > alert.deadline:
+            alert.status = 'expired'
+            with self._lock:
+                self.failed += 1
+            logger.critical(f"🚨 Alerta {alert.alert_id} sin notificar antes del límite "
+                            f"({', '.join(n.name for n in alert.pending)})")
+            return
+
+        with self._lock:
+            self.retries += 1
+        timer = threading.Timer(delay, lambda: self._queue.put((alert.priority, next(self._seq), alert)))
+        timer.daemon = True
+        timer.start()
+
+    def _record(self, alert, stage):
+        latency = alert.timestamps[stage] - alert.timestamps['detected']
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    # ------------------------------------------------------------------
+
+    def latency_stats(self):
+        """p50/p99/max (ms) desde la detección hasta cada etapa."""
+        import numpy as np  # Solo aquí; el despachador se crea al arrancar el servidor
+
+        with self._lock:
+            samples = {stage: np.array(values) for stage, values in self._latencies.items()}
+            counters = {'sent': self.sent, 'failed': self.failed, 'retries': self.retries}
+
+        stages = {}
+        for stage, values in samples.items():
+            if len(values) == 0:
+                continue
+            p50, p99 = np.percentile(values, [50, 99]) * 1000
+            stages[stage] = {
+                'count': int(len(values)),
+                'p50_ms': round(float(p50), 2),
+                'p99_ms': round(float(p99), 2),
+                'max_ms': round(float(values.max()) * 1000, 2)
+            }
+        counters['pending'] = self._queue.qsize()
+        counters['stages'] = stages
+        return counters
@@ -0,0 +1,402 @@
+"""
+ANÁLISIS POR LOTES DE GRABACIONES - CABINAS ANTI-SUICIDIO
+Re-evalúa grabaciones archivadas (WAV, o el audio de sesión .pcm de
+audio_archive.py, leído con memmap) con el mismo pipeline del demo
+(analizar_audio / _clasificar_emocion), repartiendo el trabajo en un
+ProcessPoolExecutor. Escribe JSONL: una fila por ventana y un resumen por
+archivo. Si la corrida se interrumpe, volver a ejecutarla continúa donde
+se quedó (los archivos que terminaron con error se vuelven a intentar). Si
+un trabajador muere, el pool se recrea y lo que estaba en vuelo se reenvía
+archivo por archivo. Con --reclasificar toma los resultados de una corrida anterior y
+solo vuelve a clasificar sus métricas (otra tabla de umbrales) en una
+llamada vectorizada, sin tocar el audio.
+
+Uso:
+    python analisis_lotes.py grabaciones/ -o resultados.jsonl
+    python analisis_lotes.py manifiesto.txt -o resultados.jsonl --salto 1.5
+    python analisis_lotes.py grabaciones/ -o r.jsonl --umbral umbral_volumen_bajo=1200
+    python analisis_lotes.py data/audio/ -o sesiones.jsonl --suavizar
+    python analisis_lotes.py resultados.jsonl --reclasificar -o r2.jsonl --umbral umbral_volumen_bajo=1200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import wave
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from audio_archive import AUDIO_SUFFIX, INDEX_SUFFIX, ArchivedAudio
+from caracteristicas import enmarcar
+from clasificador import CARACTERISTICAS, NIVELES_RIESGO, TablaCompilada, suavizar
+
+# Analizador del proceso trabajador (uno por proceso, se crea al iniciar)
+_analizador = None
+
+MAX_CAIDAS = 2   # Caídas del pool con un archivo en vuelo antes de darlo por fallido
+
+
+# ============================================================================
+# ENTRADAS
+# ============================================================================
+
+def listar_entradas(origen):
+    """Regresa la lista de WAV (o audio de sesión) de un directorio o de un manifiesto."""
+    if os.path.isdir(origen):
+        rutas = []
+        for raiz, _, archivos in os.walk(origen):
+            rutas.extend(os.path.join(raiz, a) for a in archivos
+                         if a.lower().endswith(('.wav', AUDIO_SUFFIX)))
+        return sorted(rutas)
+
+    # Manifiesto: una ruta por línea, o JSONL con la llave 'ruta' / 'path'
+    base = os.path.dirname(os.path.abspath(origen))
+    rutas = []
+    with open(origen, encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea or linea.startswith('#'):
+                continue
+            if linea.startswith('{'):
+                registro = json.loads(linea)
+                linea = registro.get('ruta') or registro.get('path')
+            rutas.append(linea if os.path.isabs(linea) else os.path.join(base, linea))
+    return rutas
+
+
+def leer_wav(ruta):
+    """
+    Lee un WAV PCM de 16 bits. Regresa (muestras int16, rate); con varios
+    canales las muestras son (canales x muestras), sin mezclar.
+    """
+    with wave.open(ruta, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"Solo se soporta PCM de 16 bits (archivo: {wf.getsampwidth() * 8} bits)")
+        canales = wf.getnchannels()
+        rate = wf.getframerate()
+        datos = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+    if canales > 1:
+        datos = datos.reshape(-1, canales).T
+    return datos, rate
+
+
+def leer_audio(ruta):
+    """
+    WAV o audio de sesión archivado. El archivado se abre con memmap: las
+    ventanas son vistas sobre el archivo, sin cargarlo completo. Igual que
+    leer_wav, el audio multicanal sale como (canales x muestras).
+    """
+    if not ruta.endswith(AUDIO_SUFFIX):
+        return leer_wav(ruta)
+    archivado = ArchivedAudio(ruta, ruta[:-len(AUDIO_SUFFIX)] + INDEX_SUFFIX)
+    return archivado.samples.T, archivado.sample_rate
+
+
+# ============================================================================
+# TRABAJADOR
+# ============================================================================
+
+def _iniciar_trabajador(umbrales):
+    """Crea el analizador una sola vez por proceso."""
+    global _analizador
+    from demo_voz_real import AnalizadorVozSimple
+
+    _analizador = AnalizadorVozSimple(usar_microfono=False)
+    for nombre, valor in umbrales.items():
+        setattr(_analizador, nombre, valor)
+
+
+def _redondear(metricas):
+    return {k: round(float(v), 3) for k, v in metricas.items()}
+
+
+def _resumir(filas, suavizado=False):
+    """
+    Resumen de las ventanas de un archivo. Con `suavizado` cada ventana
+    recibe también 'riesgo_suavizado' (histéresis sobre la secuencia).
+    """
+    if suavizado:
+        for fila, riesgo in zip(filas, suavizar(f['riesgo'] for f in filas)):
+            fila['riesgo_suavizado'] = riesgo
+    emociones = Counter(f['emocion'] for f in filas)
+    riesgos = Counter(f['riesgo'] for f in filas)
+    return {
+        'ventanas': len(filas),
+        'emocion_dominante': emociones.most_common(1)[0][0] if emociones else None,
+        'distribucion_emociones': dict(emociones),
+        'riesgo_maximo': max(riesgos, key=NIVELES_RIESGO.index) if riesgos else None,
+        'distribucion_riesgo': dict(riesgos)
+    }
+
+
+def analizar_archivo(ruta, ventana_seg, salto_seg, suavizado=False):
+    """Analiza un archivo completo. Regresa sus filas (ventanas + resumen)."""
+    try:
+        audio, rate = leer_audio(ruta)
+        if rate != _analizador.RATE:
+            raise ValueError(f"Frecuencia de muestreo {rate} Hz no soportada (se espera {_analizador.RATE} Hz)")
+
+        tam = int(ventana_seg * rate)
+        salto = int(salto_seg * rate)
+        largo = audio.shape[-1]
+        ventanas = enmarcar(audio, tam, salto) if largo >= tam else audio[..., None, :]
+        if ventanas.ndim > 2:
+            # (canales x ventanas x muestras) -> una ventana multicanal por paso
+            ventanas = ventanas.transpose(1, 0, 2)
+
+        # El piso de ruido del VAD y la línea base de la voz son de cada archivo
+        _analizador.vad.reiniciar()
+        _analizador.linea_base.reiniciar()
+        filas = []
+        for i, ventana in enumerate(ventanas):
+            resultado = _analizador.analizar_audio(ventana, salto_seg if i else None)
+            filas.append({
+                'tipo': 'ventana',
+                'archivo': ruta,
+                'indice': i,
+                'inicio_s': round(i * salto / rate, 3),
+                'fin_s': round((i * salto + ventana.shape[-1]) / rate, 3),
+                'emocion': resultado['emocion'],
+                'riesgo': resultado['riesgo'],
+                'confianza': resultado['confianza'],
+                'personalizado': resultado.get('personalizado', False),
+                'metricas': _redondear(resultado['metricas'])
+            })
+            if resultado.get('canal') is not None:
+                filas[-1]['canal'] = resultado['canal']
+
+        resumen = {'tipo': 'archivo', 'archivo': ruta, 'duracion_s': round(largo / rate, 3)}
+        if audio.ndim > 1:
+            resumen['canales'] = audio.shape[0]
+        resumen.update(_resumir(filas, suavizado))
+        filas.append(resumen)
+        return filas
+
+    except Exception as e:
+        return [{'tipo': 'archivo', 'archivo': ruta, 'error': str(e)}]
+
+
+def analizar_lote(rutas, ventana_seg, salto_seg, suavizado=False):
+    """Tarea del pool: analiza varios archivos seguidos."""
+    return [analizar_archivo(r, ventana_seg, salto_seg, suavizado) for r in rutas]
+
+
+# ============================================================================
+# RECLASIFICACIÓN (sin audio)
+# ============================================================================
+
+def reclasificar(entrada, salida, umbrales=None, suavizado=False):
+    """
+    Vuelve a clasificar las ventanas de una corrida anterior con otros
+    umbrales: todas sus métricas forman una matriz (ventanas × características)
+    que se clasifica en una sola llamada. Reescribe ventanas y resúmenes.
+    """
+    inicio = time.perf_counter()
+    with open(entrada, encoding='utf-8') as f:
+        filas = [json.loads(linea) for linea in f if linea.strip()]
+
+    # Las ventanas sin voz no tienen métricas que clasificar
+    ventanas = [f for f in filas if f.get('tipo') == 'ventana' and f['emocion'] != 'sin_voz']
+    matriz = np.array([[f['metricas'][c] for c in CARACTERISTICAS] for f in ventanas],
+                      dtype=np.float64).reshape(-1, len(CARACTERISTICAS))
+    emociones, riesgos, _ = TablaCompilada(umbrales=umbrales).clasificar_lote(matriz)
+    for fila, emocion, riesgo in zip(ventanas, emociones, riesgos):
+        fila['emocion'], fila['riesgo'] = emocion, riesgo
+
+    archivos = 0
+    with open(salida, 'w', encoding='utf-8') as out:
+        del_archivo = []
+        for fila in filas:
+            if fila.get('tipo') == 'ventana':
+                del_archivo.append(fila)
+                continue
+            if 'error' not in fila:
+                fila.update(_resumir(del_archivo, suavizado))
+            out.write(''.join(json.dumps(f, ensure_ascii=False) + '\n' for f in del_archivo + [fila]))
+            archivos += 1
+            del_archivo = []
+
+    return {'archivos': archivos, 'ventanas': len(ventanas), 'errores': 0,
+            'segundos': time.perf_counter() - inicio}
+
+
+# ============================================================================
+# REANUDACIÓN
+# ============================================================================
+
+def archivos_completados(salida):
+    """
+    Lee la salida de una corrida anterior y regresa los archivos ya resueltos.
+    Recorta cualquier bloque incompleto al final (corrida interrumpida) y
+    quita las filas de error (un bloque de una sola línea) para reintentarlos.
+    """
+    if not os.path.exists(salida):
+        return set()
+
+    completados = set()
+    fin_valido = 0
+    con_error = []   # (inicio, fin) en bytes de cada fila de error
+    with open(salida, 'rb') as f:
+        posicion = 0
+        for linea in f:
+            inicio, posicion = posicion, posicion + len(linea)
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                break
+            if fila.get('tipo') == 'archivo':
+                if 'error' in fila:
+                    con_error.append((inicio, posicion))
+                else:
+                    completados.add(fila['archivo'])
+                fin_valido = posicion
+
+    if not con_error:
+        with open(salida, 'r+b') as f:
+            f.truncate(fin_valido)
+        return completados
+
+    temporal = f"{salida}.tmp"
+    with open(salida, 'rb') as f, open(temporal, 'wb') as out:
+        posicion = 0
+        for inicio, fin in con_error + [(fin_valido, fin_valido)]:
+            out.write(f.read(inicio - posicion))
+            f.seek(fin)
+            posicion = fin
+    os.replace(temporal, salida)
+    return completados
+
+
+# ============================================================================
+# PRINCIPAL
+# ============================================================================
+
+def procesar(rutas, salida, ventana_seg=3.0, salto_seg=3.0, trabajadores=None,
+             tam_lote=8, umbrales=None, suavizado=False):
+    """
+    Reparte los archivos en el pool y escribe los resultados en streaming.
+    Si un trabajador muere (BrokenProcessPool) se crea otro pool y los
+    archivos que estaban en vuelo se reenvían uno por uno y solos (sin otras
+    tareas en vuelo), así la siguiente caída apunta al archivo culpable; el
+    que cae con el pool MAX_CAIDAS veces queda como error.
+    """
+    trabajadores = trabajadores or os.cpu_count() or 1
+    pendientes = [rutas[i:i + tam_lote] for i in range(0, len(rutas), tam_lote)]
+    pendientes.reverse()
+    caidas = Counter()
+
+    archivos = ventanas = errores = 0
+    inicio = time.perf_counter()
+
+    def escribir(out, resultados):
+        nonlocal archivos, ventanas, errores
+        for filas in resultados:
+            # Cada archivo se escribe en bloque, terminando con su resumen
+            out.write(''.join(json.dumps(f, ensure_ascii=False) + '\n' for f in filas))
+            archivos += 1
+            ventanas += len(filas) - 1
+            errores += 'error' in filas[-1]
+
+    with open(salida, 'a', encoding='utf-8') as out:
+        while pendientes:
+            en_vuelo = {}
+            with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_trabajador,
+                                     initargs=(umbrales or {},)) as pool:
+                try:
+                    while pendientes or en_vuelo:
+                        # Mantener acotado el número de tareas enviadas
+                        while pendientes and len(en_vuelo) < 2 * trabajadores:
+                            sospechoso = caidas[pendientes[-1][0]] > 0
+                            if sospechoso and en_vuelo:
+                                break
+                            lote = pendientes.pop()
+                            en_vuelo[pool.submit(analizar_lote, lote, ventana_seg, salto_seg, suavizado)] = lote
+                            if sospechoso:
+                                break
+
+                        listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                        for futuro in listos:
+                            escribir(out, futuro.result())
+                            del en_vuelo[futuro]
+                        out.flush()
+
+                        transcurrido = time.perf_counter() - inicio
+                        print(f"\r   {archivos}/{len(rutas)} archivos | {ventanas} ventanas | "
+                              f"{ventanas / max(transcurrido, 1e-9):.0f} ventanas/s", end="", flush=True)
+
+                except BrokenProcessPool:
+                    print(f"\n⚠️ Un trabajador terminó inesperadamente; se reenvían {len(en_vuelo)} tareas")
+                    for futuro, lote in en_vuelo.items():
+                        if futuro.done() and not futuro.cancelled() and futuro.exception() is None:
+                            escribir(out, futuro.result())
+                            continue
+                        for ruta in lote:
+                            caidas[ruta] += 1
+                            if caidas[ruta] < MAX_CAIDAS:
+                                pendientes.append([ruta])
+                            else:
+                                escribir(out, [[{'tipo': 'archivo', 'archivo': ruta,
+                                                 'error': 'El proceso trabajador terminó inesperadamente'}]])
+                    out.flush()
+
+    print()
+    return {'archivos': archivos, 'ventanas': ventanas, 'errores': errores,
+            'segundos': time.perf_counter() - inicio}
+
+
+def _parsear_umbrales(pares):
+    umbrales = {}
+    for par in pares:
+        nombre, _, valor = par.partition('=')
+        umbrales[nombre.strip()] = float(valor)
+    return umbrales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis por lotes de grabaciones de cabina")
+    parser.add_argument('origen', help="Directorio con WAV o manifiesto (una ruta por línea / JSONL)")
+    parser.add_argument('-o', '--salida', required=True, help="Archivo JSONL de resultados")
+    parser.add_argument('--ventana', type=float, default=3.0, help="Duración de la ventana (s)")
+    parser.add_argument('--salto', type=float, default=3.0, help="Salto entre ventanas (s)")
+    parser.add_argument('-j', '--trabajadores', type=int, default=None, help="Procesos (por defecto: núcleos)")
+    parser.add_argument('--lote', type=int, default=8, help="Archivos por tarea enviada al pool")
+    parser.add_argument('--umbral', action='append', default=[], metavar='NOMBRE=VALOR',
+                        help="Sobrescribe un umbral del analizador (ej. umbral_volumen_bajo=1200)")
+    parser.add_argument('--desde-cero', action='store_true', help="Ignora resultados anteriores")
+    parser.add_argument('--suavizar', action='store_true',
+                        help="Agrega 'riesgo_suavizado' (histéresis entre ventanas) a cada ventana")
+    parser.add_argument('--reclasificar', action='store_true',
+                        help="El origen es un JSONL de resultados: solo se vuelve a clasificar")
+    args = parser.parse_args(argv)
+
+    if args.reclasificar:
+        resumen = reclasificar(args.origen, args.salida, _parsear_umbrales(args.umbral), args.suavizar)
+        print(f"✓ {resumen['ventanas']} ventanas de {resumen['archivos']} archivos reclasificadas en "
+              f"{resumen['segundos']:.1f}s")
+        return 0
+
+    rutas = listar_entradas(args.origen)
+    if args.desde_cero and os.path.exists(args.salida):
+        os.remove(args.salida)
+
+    hechos = archivos_completados(args.salida)
+    rutas = [r for r in rutas if r not in hechos]
+    print(f"📂 {len(rutas)} archivos por analizar ({len(hechos)} ya completados)")
+    if not rutas:
+        return 0
+
+    resumen = procesar(rutas, args.salida, args.ventana, args.salto, args.trabajadores,
+                       args.lote, _parsear_umbrales(args.umbral), args.suavizar)
+    print(f"✓ {resumen['archivos']} archivos, {resumen['ventanas']} ventanas en "
+          f"{resumen['segundos']:.1f}s ({resumen['errores']} con error)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,86 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from voice_analyzer import EmotionalVoiceAnalyzer
-import threading
+from startup import AnalyzerPool
+from pipeline import AnalysisPipeline
+from actividad_voz import DetectorVoz
+import os
 import time
 
 app = Flask(__name__)
 CORS(app)
 
-analyzer = EmotionalVoiceAnalyzer(duration=3)
+# El analizador se importa y crea al primer /api/start (o al precalentar)
+analyzer_pool = AnalyzerPool(size=1, duration=3)
+analyzer = None
+vad = None
 current_state = {'emotion': 'neutral', 'risk': 'normal'}
-is_analyzing = False
+pipeline = None
+SILENT_WINDOW = object()  # Ventana que el VAD dejó fuera
 
-def continuous_analysis():
-    """Análisis continuo en background."""
-    global current_state, is_analyzing
-    while is_analyzing:
-        audio = analyzer.record_audio_segment()
-        features = analyzer.extract_features(audio)
-        if features:
-            emotion, risk, conf, expl = analyzer.classify_emotion(features)
-            current_state = {
-                'emotion': emotion,
-                'risk_level': risk,
-                'confidence': conf,
-                'explanation': expl,
-                'timestamp': time.time()
-            }
-        time.sleep(1)
+def detect_voice(audio):
+    """Etapa VAD: las ventanas sin voz no llegan a la extracción."""
+    return audio if vad.procesar(audio)['voz'] else SILENT_WINDOW
+
+def extract(audio):
+    """Etapa de características (las ventanas sin voz pasan de largo)."""
+    return audio if audio is SILENT_WINDOW else analyzer.extract_features(audio)
+
+def classify(features):
+    """Etapa de clasificación del pipeline."""
+    if features is SILENT_WINDOW:
+        return {'emotion': 'neutral', 'risk_level': 'normal', 'confidence': 0,
+                'explanation': 'Sin voz detectada', 'timestamp': time.time()}
+    if not features:
+        return None
+    emotion, risk, conf, expl = analyzer.classify_emotion(features)
+    return {
+        'emotion': emotion,
+        'risk_level': risk,
+        'confidence': conf,
+        'explanation': expl,
+        'timestamp': time.time()
+    }
+
+def update_state(state):
+    """Última etapa: publica el estado actual."""
+    global current_state
+    if state:
+        current_state = state
 
 @app.route('/api/start', methods=['POST'])
 def start_analysis():
     """Inicia el análisis de voz."""
-    global is_analyzing
-    if not is_analyzing:
-        is_analyzing = True
-        thread = threading.Thread(target=continuous_analysis)
-        thread.daemon = True
-        thread.start()
+    global pipeline, analyzer, vad
+    if not (pipeline and pipeline.running):
+        analyzer = analyzer or analyzer_pool.acquire()
+        if analyzer is None:
+            return jsonify({'status': 'error', 'message': 'Analizador no disponible'}), 503
+        vad = vad or DetectorVoz(analyzer.sample_rate)
+        # Captura, características y clasificación corren en paralelo
+        pipeline = AnalysisPipeline(
+            name='analysis',
+            source=analyzer.record_audio_segment,
+            stages=[
+                ('vad', detect_voice, None),
+                ('features', extract, None),
+                ('classify', classify, None)
+            ],
+            sink=update_state
+        ).start()
         return jsonify({'status': 'started'})
     return jsonify({'status': 'already_running'})
 
 @app.route('/api/stop', methods=['POST'])
 def stop_analysis():
     """Detiene el análisis."""
-    global is_analyzing
-    is_analyzing = False
+    if pipeline:
+        pipeline.stop()
     return jsonify({'status': 'stopped'})
 
 @app.route('/api/state', methods=['GET'])
 def get_state():
     """Obtiene el estado emocional actual."""
-    return jsonify(current_state)
+    return jsonify(dict(current_state, vad=vad.estadisticas() if vad else None))
 
 @app.route('/api/emergency', methods=['POST'])
 def emergency():
@@ -63,4 +93,6 @@ def emergency():
     })
 
 if __name__ == '__main__':
+    if os.environ.get('ANALYZER_WARMUP', '1') == '1':
+        analyzer_pool.warm_up()
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,403 @@
+"""
+ARCHIVO DE AUDIO POR SESIÓN (opcional)
+Guarda el audio crudo de cada ventana analizada para poder re-examinar una
+clasificación después. Por sesión hay dos archivos append-only:
+  data/audio/<session_id>.pcm  encabezado fijo de 64 bytes + muestras int16
+                               intercaladas, preasignado por bloques y
+                               recortado al tamaño real al cerrar
+  data/audio/<session_id>.idx  índice de ventanas (muestra inicial, muestras,
+                               timestamp) en registros binarios fijos
+Un solo hilo escribe; la captura solo encola y, si la cola está llena, la
+ventana no se archiva (nunca espera al disco). Los lectores abren ambos
+archivos con np.memmap, así cualquier rango de tiempo es una vista sin
+copiar ni cargar el archivo completo. La retención borra sesiones cerradas
+más viejas que `retention_days` y luego las más viejas hasta quedar bajo
+`max_bytes`.
+"""
+
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/audio'
+AUDIO_SUFFIX = '.pcm'
+INDEX_SUFFIX = '.idx'
+
+MAGIC = b'CABAUD01'
+# magic, sample_rate, canales, bytes por muestra, creado (epoch), session_id
+HEADER = struct.Struct('<8sIHHd40s')
+SAMPLE_DTYPE = np.dtype('<i2')
+INDEX_DTYPE = np.dtype([('start', '<i8'), ('frames', '<i4'), ('timestamp', '<f8')])
+
+PREALLOC_SECONDS = 60            # Bloque de preasignación del archivo de audio
+MAX_SESSION_SECONDS = 4 * 3600   # Audio máximo por sesión
+MAX_PENDING = 64                 # Ventanas en cola antes de descartar
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_RETENTION_DAYS = 7
+WAV_CHUNK_FRAMES = 64 * 1024     # Muestras por bloque al servir un WAV
+
+WRITE_SECONDS = metrics.histogram('storage_write_seconds', 'Duración de escrituras a disco',
+                                  op='audio_archive')
+DROPPED = metrics.counter('audio_archive_windows_dropped_total',
+                          'Ventanas de audio no archivadas (cola llena o límite por sesión)')
+
+
+def to_int16(audio):
+    """Muestras int16 (float en [-1, 1] se escala; int16 pasa sin copiar)."""
+    audio = np.asarray(audio)
+    if audio.dtype == np.int16:
+        return audio
+    return np.clip(np.rint(audio * 32767.0), -32768, 32767).astype(np.int16)
+
+
+class _SessionFile:
+    """Archivos abiertos de una sesión (solo los toca el hilo escritor)."""
+
+    def __init__(self, audio_path, index_path, session_id, rate, channels, prealloc_frames, max_frames):
+        self.audio_path = audio_path
+        self.channels = channels
+        self.prealloc_frames = prealloc_frames
+        self.max_frames = max_frames
+        self.frame_bytes = channels * SAMPLE_DTYPE.itemsize
+
+        if os.path.exists(audio_path):
+            # Sesión reanudada: se sigue después de la última ventana indexada
+            self.f = open(audio_path, 'r+b')
+            header = read_header(self.f)
+            self.channels = header['channels']
+            self.frame_bytes = self.channels * SAMPLE_DTYPE.itemsize
+            self.frames = _indexed_frames(index_path)
+            self.capacity = (os.path.getsize(audio_path) - HEADER.size) // self.frame_bytes
+        else:
+            self.f = open(audio_path, 'w+b')
+            self.f.write(HEADER.pack(MAGIC, rate, channels, SAMPLE_DTYPE.itemsize, time.time(),
+                                     session_id.encode('utf-8')[:40]))
+            self.frames = 0
+            self.capacity = 0
+        self.index = open(index_path, 'ab')
+        self.index_bytes = self.index.tell()
+
+    @property
+    def nbytes(self):
+        """Bytes que ocupan sus archivos (con la preasignación)."""
+        return HEADER.size + self.capacity * self.frame_bytes + self.index_bytes
+
+    def write(self, samples, timestamp):
+        frames = len(samples)
+        if self.frames + frames > self.max_frames:
+            return False
+        if self.frames + frames > self.capacity:
+            # Preasignar otro bloque (el sistema de archivos lo deja disperso)
+            self.capacity = min(self.max_frames, max(self.frames + frames, self.capacity + self.prealloc_frames))
+            self.f.truncate(HEADER.size + self.capacity * self.frame_bytes)
+        self.f.seek(HEADER.size + self.frames * self.frame_bytes)
+        self.f.write(samples.tobytes())
+        self.index.write(np.array([(self.frames, frames, timestamp)], dtype=INDEX_DTYPE).tobytes())
+        self.index_bytes += INDEX_DTYPE.itemsize
+        self.frames += frames
+        return True
+
+    def close(self):
+        """Recorta la preasignación sobrante y lleva todo a disco."""
+        self.capacity = self.frames
+        self.f.truncate(HEADER.size + self.frames * self.frame_bytes)
+        for f in (self.f, self.index):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+
+class AudioArchive:
+    """
+    Escritor compartido por todas las cabinas (hilo propio) y política de
+    retención. Las llamadas públicas no bloquean.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 retention_days=DEFAULT_RETENTION_DAYS, max_session_seconds=MAX_SESSION_SECONDS,
+                 max_pending=MAX_PENDING):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.max_session_seconds = max_session_seconds
+        self.max_pending = max_pending
+        self.windows_written = 0
+        self.files_removed = 0
+        self.bytes = 0       # Total en disco; lo lleva el hilo escritor (la retención lo recalcula)
+        self._queue = queue.Queue()
+        self._files = {}
+        self._full = set()   # Sesiones que llegaron al límite (se avisa una vez)
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='audio-archive', daemon=True)
+        self._thread.start()
+        self.enforce_retention()
+
+    # ------------------------------------------------------------------
+    # API (no bloquea al que llama)
+    # ------------------------------------------------------------------
+
+    def append(self, session_id, audio, rate, timestamp=None):
+        """
+        Encola una ventana de la sesión. `timestamp` es el inicio de la
+        ventana (por defecto ahora menos su duración). Regresa False si se
+        descartó porque el escritor va atrasado.
+        """
+        if self._queue.qsize() >= self.max_pending:
+            DROPPED.inc()
+            return False
+        if timestamp is None:
+            timestamp = time.time() - len(audio) / rate
+        self._queue.put(('append', session_id, (audio, rate, timestamp)))
+        return True
+
+    def close_session(self, session_id):
+        """Cierra los archivos de la sesión y aplica la retención."""
+        self._queue.put(('close', session_id, None))
+
+    def enforce_retention(self):
+        self._queue.put(('retention', None, None))
+
+    def flush(self, timeout=None):
+        """Espera a que lo encolado hasta ahora se haya escrito."""
+        done = threading.Event()
+        self._queue.put(('sync', None, done))
+        return done.wait(timeout)
+
+    def paths(self, session_id):
+        base = os.path.join(self.directory, os.path.basename(session_id))
+        return base + AUDIO_SUFFIX, base + INDEX_SUFFIX
+
+    def stats(self):
+        return {
+            'open_sessions': len(self._files),
+            'pending': self._queue.qsize(),
+            'windows_written': self.windows_written,
+            'windows_dropped': DROPPED.value,
+            'files_removed': self.files_removed,
+            'bytes': self.bytes
+        }
+
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            op, session_id, payload = self._queue.get()
+            try:
+                if op == 'append':
+                    with WRITE_SECONDS.time():
+                        self._append(session_id, *payload)
+                elif op == 'close':
+                    self._close(session_id)
+                    self._retention()
+                elif op == 'retention':
+                    self._retention()
+                elif op == 'sync':
+                    for session_file in self._files.values():
+                        session_file.f.flush()
+                        session_file.index.flush()
+                    payload.set()
+            except Exception as e:
+                logger.error(f"Error en el archivo de audio ({session_id}): {e}")
+
+    def _open(self, session_id, rate=0, channels=1):
+        session_file = self._files.get(session_id)
+        if session_file is None:
+            audio_path, index_path = self.paths(session_id)
+            existed = os.path.exists(audio_path)   # Ya contado en self.bytes
+            prealloc = int(PREALLOC_SECONDS * rate) if rate else 0
+            session_file = self._files[session_id] = _SessionFile(
+                audio_path, index_path, session_id, rate, channels,
+                prealloc, int(self.max_session_seconds * rate) if rate else 0)
+            if not existed:
+                self.bytes += session_file.nbytes
+        return session_file
+
+    def _append(self, session_id, audio, rate, timestamp):
+        samples = to_int16(audio)
+        session_file = self._open(session_id, rate, samples.shape[1] if samples.ndim > 1 else 1)
+        before = session_file.nbytes
+        written = session_file.write(samples, timestamp)
+        self.bytes += session_file.nbytes - before
+        if written:
+            self.windows_written += 1
+        else:
+            DROPPED.inc()
+            if session_id not in self._full:
+                self._full.add(session_id)
+                logger.warning(f"⚠️ Audio de {session_id} llegó al límite de {self.max_session_seconds}s")
+
+    def _close(self, session_id):
+        self._full.discard(session_id)
+        session_file = self._files.pop(session_id, None)
+        if session_file is None and os.path.exists(self.paths(session_id)[0]):
+            session_file = self._open(session_id)  # Quedó abierto antes de una caída
+            self._files.pop(session_id)
+        if session_file:
+            before = session_file.nbytes
+            session_file.close()
+            self.bytes += session_file.nbytes - before
+
+    def _archived(self):
+        """(session_id, mtime, bytes) de cada sesión en disco."""
+        if not os.path.isdir(self.directory):
+            return []
+        sessions = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(AUDIO_SUFFIX):
+                continue
+            session_id = name[:-len(AUDIO_SUFFIX)]
+            try:
+                size = sum(os.path.getsize(p) for p in self.paths(session_id) if os.path.exists(p))
+                sessions.append((session_id, os.path.getmtime(os.path.join(self.directory, name)), size))
+            except OSError:
+                continue
+        return sessions
+
+    def _retention(self):
+        """Borra sesiones cerradas por antigüedad y luego por tamaño total."""
+        sessions = sorted(self._archived(), key=lambda s: s[1])
+        total = sum(size for _, _, size in sessions)
+        cutoff = time.time() - self.retention_days * 86400
+        for session_id, mtime, size in sessions:
+            if session_id in self._files:
+                continue  # Nunca se borra una sesión abierta
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                for path in self.paths(session_id):
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar el audio de {session_id}: {e}")
+                continue
+            total -= size
+            self.files_removed += 1
+            logger.info(f"🗑️ Audio archivado eliminado por retención: {session_id}")
+        self.bytes = total
+
+
+# ============================================================================
+# LECTURA (np.memmap, sin copias)
+# ============================================================================
+
+def read_header(f):
+    f.seek(0)
+    magic, rate, channels, width, created, session_id = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or width != SAMPLE_DTYPE.itemsize:
+        raise ValueError("No es un archivo de audio de sesión")
+    return {'sample_rate': rate, 'channels': channels, 'created': created,
+            'session_id': session_id.rstrip(b'\0').decode('utf-8')}
+
+
+def _read_index(index_path):
+    """Índice de ventanas como memmap (ignora un registro cortado al final)."""
+    count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+    if not count:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', shape=(count,))
+
+
+def _indexed_frames(index_path):
+    index = _read_index(index_path)
+    return int(index['start'][-1] + index['frames'][-1]) if len(index) else 0
+
+
+class ArchivedAudio:
+    """
+    Audio de una sesión abierto con np.memmap. `samples` es int16 de forma
+    (muestras,) en mono o (muestras, canales); las rebanadas son vistas.
+    """
+
+    def __init__(self, audio_path, index_path):
+        with open(audio_path, 'rb') as f:
+            header = read_header(f)
+        self.session_id = header['session_id']
+        self.sample_rate = header['sample_rate']
+        self.channels = header['channels']
+        self.created = header['created']
+        self.windows = _read_index(index_path)
+
+        # Solo lo indexado es audio válido (el resto es preasignación)
+        frame_bytes = self.channels * SAMPLE_DTYPE.itemsize
+        on_disk = (os.path.getsize(audio_path) - HEADER.size) // frame_bytes
+        frames = min(_indexed_frames(index_path), on_disk)
+        shape = (frames,) if self.channels == 1 else (frames, self.channels)
+        if frames:
+            self.samples = np.memmap(audio_path, dtype=SAMPLE_DTYPE, mode='r', offset=HEADER.size, shape=shape)
+        else:
+            self.samples = np.zeros(shape, dtype=SAMPLE_DTYPE)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate if self.sample_rate else 0.0
+
+    def slice(self, start_s=0.0, end_s=None):
+        """Vista del rango [start_s, end_s) en segundos desde el inicio del audio."""
+        start = max(0, int(start_s * self.sample_rate))
+        end = len(self.samples) if end_s is None else max(start, int(end_s * self.sample_rate))
+        return self.samples[start:end]
+
+    def wav_size(self, start_s=0.0, end_s=None):
+        """Bytes del WAV del rango (encabezado + datos)."""
+        return WAV_HEADER.size + self.slice(start_s, end_s).nbytes
+
+    def iter_wav(self, start_s=0.0, end_s=None, chunk_frames=WAV_CHUNK_FRAMES):
+        """
+        WAV del rango por bloques: el encabezado y luego rebanadas del memmap,
+        sin copiar el rango completo a memoria.
+        """
+        samples = self.slice(start_s, end_s)
+        yield wav_header(len(samples), self.channels, self.sample_rate)
+        for i in range(0, len(samples), chunk_frames):
+            yield samples[i:i + chunk_frames].tobytes()
+
+    def window(self, i):
+        """Vista de la ventana `i` del índice."""
+        start, frames = int(self.windows['start'][i]), int(self.windows['frames'][i])
+        return self.samples[start:start + frames]
+
+    def windows_between(self, start_s=0.0, end_s=None):
+        """Posiciones de las ventanas que empiezan dentro del rango."""
+        starts = self.windows['start'] / self.sample_rate
+        mask = starts >= start_s
+        if end_s is not None:
+            mask &= starts < end_s
+        return np.flatnonzero(mask)
+
+    def describe(self):
+        return {
+            'session_id': self.session_id,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'duration_seconds': round(self.duration, 3),
+            'windows': len(self.windows)
+        }
+
+
+# RIFF, tamaño, WAVE, fmt, 16, PCM, canales, rate, bytes/s, bloque, bits, data, tamaño
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+
+def wav_header(frames, channels, sample_rate):
+    """Encabezado WAV PCM de 16 bits para `frames` muestras por canal."""
+    block = channels * SAMPLE_DTYPE.itemsize
+    data_bytes = frames * block
+    return WAV_HEADER.pack(b'RIFF', WAV_HEADER.size - 8 + data_bytes, b'WAVE', b'fmt ', 16, 1,
+                           channels, sample_rate, sample_rate * block, block, 16, b'data', data_bytes)
+
+
+def open_session(session_id, directory=ARCHIVE_DIR):
+    """Abre el audio archivado de una sesión. Lanza FileNotFoundError si no hay."""
+    base = os.path.join(directory, os.path.basename(session_id))
+    return ArchivedAudio(base + AUDIO_SUFFIX, base + INDEX_SUFFIX)
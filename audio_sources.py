@@ -0,0 +1,200 @@
+"""
+FUENTES DE AUDIO DEL PIPELINE
+El pipeline de una cabina solo llama `read()` para obtener la siguiente
+ventana (float32 en [-1, 1], o (canales x muestras) con varios micrófonos).
+Detrás puede estar el micrófono real, la reproducción de un WAV o el
+generador de voz sintética; las dos últimas permiten probar el pipeline
+completo (VAD, características, clasificación, difusión) sin micrófono y
+con muchas cabinas a la vez (ver prueba_carga.py).
+
+Especificación (AUDIO_SOURCE o 'audio_source' al iniciar la sesión):
+    mic                          micrófono del analizador (por defecto)
+    wav:<ruta>                   reproduce el archivo en bucle
+    synthetic                    recorre todos los perfiles de voz_sintetica
+    synthetic:estable,ansiedad   solo esos perfiles
+Las fuentes de prueba entregan a tiempo real (una ventana cada `duration`
+segundos) salvo con realtime=False, que entrega tan rápido como se consuma.
+Con `wav_dir` las rutas wav: se resuelven dentro de ese directorio y no
+pueden salir de él (fuentes pedidas por un cliente de la API).
+"""
+
+import os
+import time
+
+import numpy as np
+
+SOURCE_KINDS = ('mic', 'wav', 'synthetic')
+
+
+class MicrophoneSource:
+    """
+    Micrófono de una cabina con su propio stream de entrada (sd.InputStream)
+    y su propio remuestreador: varias cabinas capturan a la vez sin pisarse
+    (sd.rec / sd.wait usan un solo stream global del módulo). El stream se
+    abre en la primera lectura y `read` bloquea hasta tener `duration`
+    segundos contiguos.
+    """
+
+    kind = 'mic'
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.sample_rate = analyzer.sample_rate
+        self.overflows = 0
+        self._stream = None
+        self._resampler = None
+        self._frames = 0
+
+    def _open(self):
+        import sounddevice as sd
+
+        native_rate, channels = self.analyzer.input_format()
+        stream = sd.InputStream(samplerate=native_rate, channels=channels, dtype='float32',
+                                device=self.analyzer.device)
+        stream.start()
+        self._stream = stream
+        self._frames = int(self.analyzer.duration * native_rate)
+        # Historial del filtro solo de este stream
+        self._resampler = self.analyzer.new_resampler(native_rate, channels)
+
+    def read(self):
+        if self._stream is None:
+            self._open()
+        audio, overflowed = self._stream.read(self._frames)
+        if overflowed:
+            self.overflows += 1
+        return self.analyzer.convert_input(audio, self._resampler)
+
+    def close(self):
+        """Cierra el stream (se reabre, con el filtro limpio, en la siguiente lectura)."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def describe(self):
+        return {'kind': self.kind, 'device': self.analyzer.device, 'open': self._stream is not None,
+                'overflows': self.overflows}
+
+
+class _PacedSource:
+    """Entrega ventanas de `duration` segundos al ritmo del reloj (si `realtime`)."""
+
+    kind = None
+
+    def __init__(self, sample_rate=16000, duration=3, realtime=True):
+        self.sample_rate = sample_rate
+        self.duration = duration
+        self.realtime = realtime
+        self.windows = 0
+        self._next_due = None
+
+    def _window(self):
+        raise NotImplementedError
+
+    def read(self):
+        if self.realtime:
+            now = time.monotonic()
+            if self._next_due is None:
+                self._next_due = now
+            # Si el consumidor se atrasó no se acumulan ventanas pendientes
+            self._next_due = max(self._next_due + self.duration, now)
+            time.sleep(max(0.0, self._next_due - now))
+        self.windows += 1
+        return self._window()
+
+    def close(self):
+        self._next_due = None
+
+    def describe(self):
+        return {'kind': self.kind, 'windows': self.windows, 'realtime': self.realtime}
+
+
+class WavReplaySource(_PacedSource):
+    """Reproduce un WAV (o audio de sesión .pcm) en bucle, remuestreado a `sample_rate`."""
+
+    kind = 'wav'
+
+    def __init__(self, path, sample_rate=16000, duration=3, realtime=True, offset=0.0):
+        super().__init__(sample_rate, duration, realtime)
+        from analisis_lotes import leer_audio
+        from remuestreo import RemuestreadorPolifasico
+
+        self.path = path
+        audio, rate = leer_audio(path)
+        audio = np.asarray(audio, dtype=np.float32) / 32768.0
+        if rate != sample_rate:
+            # Todo el archivo de una vez: el remuestreador trabaja por muestras (eje 0)
+            resampler = RemuestreadorPolifasico(rate, sample_rate, audio.shape[0] if audio.ndim > 1 else 1)
+            audio = resampler.procesar(audio.T).T
+        self.audio = np.ascontiguousarray(audio)
+        self.window_samples = int(duration * sample_rate)
+        if self.audio.shape[-1] < self.window_samples:
+            raise ValueError(f"{path}: más corto que una ventana ({duration} s)")
+        # Desfase inicial: cabinas con el mismo archivo no van sincronizadas
+        self.position = int(offset * sample_rate) % self.audio.shape[-1]
+
+    def _window(self):
+        total = self.audio.shape[-1]
+        end = self.position + self.window_samples
+        if end <= total:
+            window = self.audio[..., self.position:end]
+        else:
+            window = np.concatenate([self.audio[..., self.position:],
+                                     self.audio[..., :end - total]], axis=-1)
+        self.position = end % total
+        return window
+
+    def describe(self):
+        return dict(super().describe(), path=self.path)
+
+
+class SyntheticSource(_PacedSource):
+    """Ventanas de voz_sintetica recorriendo `profiles` (semilla distinta en cada ventana)."""
+
+    kind = 'synthetic'
+
+    def __init__(self, profiles=None, sample_rate=16000, duration=3, realtime=True, seed=0):
+        super().__init__(sample_rate, duration, realtime)
+        from voz_sintetica import PERFILES, generar_perfil
+
+        self.profiles = list(profiles or PERFILES)
+        unknown = [p for p in self.profiles if p not in PERFILES]
+        if unknown:
+            raise ValueError(f"Perfiles desconocidos: {unknown} (opciones: {', '.join(PERFILES)})")
+        self._generate = generar_perfil
+        self.seed = seed
+
+    def _window(self):
+        profile = self.profiles[(self.windows - 1) % len(self.profiles)]
+        audio = self._generate(profile, self.duration, self.sample_rate, self.seed + self.windows)
+        return audio.astype(np.float32) / 32768.0
+
+    def describe(self):
+        return dict(super().describe(), profiles=self.profiles)
+
+
+def _inside(directory, path):
+    """Ruta real de `path` relativa a `directory`; ValueError si queda fuera."""
+    base = os.path.realpath(directory)
+    full = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, full]) != base:
+        raise ValueError(f"Ruta fuera de {directory}: {path}")
+    return full
+
+
+def make_source(spec, analyzer, realtime=True, seed=0, wav_dir=None):
+    """Crea la fuente de `spec` (ver el docstring del módulo) para el analizador."""
+    kind, _, arg = (spec or 'mic').partition(':')
+    options = {'sample_rate': analyzer.sample_rate, 'duration': analyzer.duration, 'realtime': realtime}
+    if kind == 'mic':
+        return MicrophoneSource(analyzer)
+    if kind == 'wav':
+        if not arg:
+            raise ValueError("La fuente 'wav' necesita una ruta: wav:<ruta>")
+        if wav_dir is not None:
+            arg = _inside(wav_dir, arg)
+        return WavReplaySource(arg, offset=seed * 0.37, **options)
+    if kind == 'synthetic':
+        return SyntheticSource([p for p in arg.split(',') if p] or None, seed=seed, **options)
+    raise ValueError(f"Fuente de audio desconocida: {spec!r} (opciones: {', '.join(SOURCE_KINDS)})")
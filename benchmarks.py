@@ -0,0 +1,457 @@
+"""
+BENCHMARKS - CABINAS ANTI-SUICIDIO
+Mide las rutas calientes con voz sintética determinista (voz_sintetica.py),
+sin micrófono:
+  - analizar_audio y _clasificar_emocion del demo, y la tabla de reglas en
+    lote (clasificador.py) sobre una matriz de ventanas
+  - metricas_ventana (motor de tramas) y extract_features / classify_emotion
+  - STFT compartida (espectro.py): transformar solo el salto nuevo (0.5 s)
+    contra la ventana completa de 3 s
+  - VAD (actividad_voz.py) y analizar_audio sobre ventanas en silencio
+  - remuestreo polifásico de un bloque de captura (48 y 44.1 kHz → 16 kHz)
+  - cabina de 8 micrófonos: analizar_audio y metricas_canales sobre bloques
+    (8 × muestras), con su costo relativo a una ventana mono
+  - REST: GET /api/cabins/<id>/analysis/state
+  - socket.io: clasificación → add_state → state_update hasta el cliente
+  - costo de un span de metrics.py (instrumentación siempre activa)
+  - historial: agregar un estado (con rollups) y consultar 8 h agregadas
+  - difusión: un estado a 50 clientes suscritos con deltas (broadcast.py)
+  - arranque: cargar 'api flask.txt' en un proceso nuevo (startup.py)
+
+Reporta throughput, latencia (p50/p99) y memoria pico. Con --guardar-base
+guarda los resultados; en corridas siguientes compara contra esa base y
+termina con código 1 si algo empeora más que el umbral.
+
+Uso:
+    python benchmarks.py                      # corre y compara con la base
+    python benchmarks.py --guardar-base       # actualiza la base
+    python benchmarks.py --solo analizar_audio --solo rest_estado --umbral 0.5
+"""
+
+import argparse
+import gc
+import importlib.machinery
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from voz_sintetica import generar_perfil, ventanas_de_prueba
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+BASE_POR_DEFECTO = os.path.join(DIRECTORIO, 'data', 'benchmark_base.json')
+UMBRAL_POR_DEFECTO = 0.25   # 25 % más lento (o más memoria) = regresión
+LATENCIA_MIN_MS = 0.005     # Diferencias de latencia menores se ignoran (ruido)
+MEMORIA_MIN_KB = 64         # Diferencias de memoria menores se ignoran
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def medir(nombre, funcion, entradas, repeticiones=3, calentamiento=3):
+    """
+    Llama `funcion(x)` para cada entrada, `repeticiones` veces.
+    La memoria pico se mide en una pasada aparte (tracemalloc agrega costo).
+    """
+    for x in entradas[:calentamiento]:
+        funcion(x)
+
+    tiempos = []
+    gc.collect()
+    inicio_total = time.perf_counter()
+    for _ in range(repeticiones):
+        for x in entradas:
+            inicio = time.perf_counter()
+            funcion(x)
+            tiempos.append(time.perf_counter() - inicio)
+    total = time.perf_counter() - inicio_total
+
+    tracemalloc.start()
+    for x in entradas:
+        funcion(x)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiempos = np.array(tiempos) * 1000
+    return {
+        'nombre': nombre,
+        'llamadas': int(len(tiempos)),
+        'p50_ms': round(float(np.percentile(tiempos, 50)), 4),
+        'p99_ms': round(float(np.percentile(tiempos, 99)), 4),
+        'media_ms': round(float(tiempos.mean()), 4),
+        'por_segundo': round(len(tiempos) / total, 1),
+        'memoria_pico_kb': round(pico / 1024, 1)
+    }
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_demo(ventanas, repeticiones):
+    from demo_voz_real import AnalizadorVozSimple
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    metricas = [analizador.analizar_audio(v)['metricas'] for v in ventanas]
+    argumentos = [(m['volumen'], m['variabilidad'], m['frecuencia'], m['duracion_pausas']) for m in metricas]
+    return [
+        medir('analizar_audio', analizador.analizar_audio, ventanas, repeticiones),
+        medir('_clasificar_emocion', lambda a: analizador._clasificar_emocion(*a),
+              argumentos * 50, repeticiones)
+    ]
+
+
+def bench_clasificador(ventanas, repeticiones, filas=100_000):
+    from clasificador import TablaCompilada
+    from demo_voz_real import AnalizadorVozSimple
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    metricas = [analizador.analizar_audio(v)['metricas'] for v in ventanas]
+    base = np.array([[m['volumen'], m['variabilidad'], m['frecuencia'], m['duracion_pausas']] for m in metricas])
+    matriz = np.resize(base, (filas, base.shape[1]))
+    tabla = TablaCompilada()
+    return [medir('clasificar_lote', tabla.clasificar_lote, [matriz], repeticiones, calentamiento=1)]
+
+
+def bench_caracteristicas(ventanas, repeticiones):
+    from caracteristicas import metricas_ventana
+    return [medir('metricas_ventana', lambda v: metricas_ventana(v, 16000), ventanas, repeticiones)]
+
+
+def bench_vad(ventanas, repeticiones):
+    from actividad_voz import DetectorVoz
+    from demo_voz_real import AnalizadorVozSimple
+    detector = DetectorVoz(16000)
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    silencio = [generar_perfil('silencio', semilla=i) for i in range(len(ventanas))]
+    return [
+        medir('vad_ventana', detector.procesar, ventanas, repeticiones),
+        medir('analizar_silencio', analizador.analizar_audio, silencio, repeticiones)
+    ]
+
+
+def bench_remuestreo(ventanas, repeticiones, chunk=1024):
+    from remuestreo import RemuestreadorPolifasico
+    resultados = []
+    for rate in (48000, 44100):
+        remuestreador = RemuestreadorPolifasico(rate, 16000)
+        # Bloques de captura a la frecuencia nativa (int16, como los entrega PortAudio)
+        senal = np.concatenate([np.repeat(v, 3) for v in ventanas])
+        bloques = [senal[i:i + chunk] for i in range(0, len(senal) - chunk, chunk)][:200]
+        resultado = medir('remuestreo_bloque' if rate == 48000 else 'remuestreo_bloque_44k',
+                          remuestreador.procesar, bloques, repeticiones)
+        resultado['mac_por_bloque'] = remuestreador.costo_por_bloque(chunk)
+        resultados.append(resultado)
+    return resultados
+
+
+def bench_multicanal(ventanas, repeticiones, canales=8):
+    from caracteristicas import metricas_canales
+    from demo_voz_real import AnalizadorVozSimple
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    # Misma voz a distinta distancia de cada micrófono, con ruido propio
+    rng = np.random.default_rng(0)
+    ganancias = np.linspace(1.0, 0.2, canales)[:, None]
+    bloques = [np.clip(v[None, :] * ganancias + rng.normal(0, 150, (canales, len(v))),
+                       -32768, 32767).astype(np.int16) for v in ventanas]
+    mono = medir('analizar_audio', analizador.analizar_audio, ventanas, repeticiones)
+    resultados = [
+        medir('analizar_audio_8_canales', analizador.analizar_audio, bloques, repeticiones),
+        medir('metricas_8_canales', lambda b: metricas_canales(b, 16000), bloques, repeticiones)
+    ]
+    resultados[0]['costo_vs_mono'] = round(resultados[0]['p50_ms'] / mono['p50_ms'], 2)
+    return resultados
+
+
+def bench_api_analyzer(ventanas, repeticiones):
+    from voice_analyzer import EmotionalVoiceAnalyzer
+    analizador = EmotionalVoiceAnalyzer(duration=3)
+    features = [analizador.extract_features(v) for v in ventanas]
+    return [
+        medir('extract_features', analizador.extract_features, ventanas, repeticiones),
+        medir('classify_emotion', analizador.classify_emotion, features * 50, repeticiones)
+    ]
+
+
+def bench_stft(ventanas, repeticiones, salto_seg=0.5):
+    from voice_analyzer import EmotionalVoiceAnalyzer
+    analizador = EmotionalVoiceAnalyzer(duration=3)
+    frente = analizador.new_frontend()
+    senal = np.concatenate(ventanas).astype(np.float32) / 32768.0
+    salto = int(salto_seg * 16000)
+    saltos = [senal[i:i + salto] for i in range(0, len(senal) - salto + 1, salto)]
+    completas = [v.astype(np.float32) / 32768.0 for v in ventanas]
+    frente.agregar(completas[0])
+
+    def incremental(bloque):
+        frente.agregar(bloque)
+        return frente.ultimas(frente.tramas_para(len(completas[0])))
+
+    resultados = [
+        medir('stft_incremental', incremental, saltos, repeticiones),
+        medir('stft_ventana', frente.analizar, completas, repeticiones)
+    ]
+    resultados[0]['costo_vs_ventana'] = round(resultados[0]['p50_ms'] / resultados[1]['p50_ms'], 2)
+    return resultados
+
+
+def bench_metricas(ventanas, repeticiones):
+    import metrics
+    histograma = metrics.Histogram()
+
+    def span(_):
+        with histograma.time():
+            pass
+
+    return [medir('span_metricas', span, list(range(1000)), repeticiones)]
+
+
+def bench_historial(ventanas, repeticiones, horas=8, periodo=3.0):
+    from state_store import StateStore
+    almacen = StateStore('bench')
+    emociones = ['estable', 'tristeza', 'ansiedad', 'depresion']
+    inicio = time.time() - horas * 3600
+    estados = [{'emotion': emociones[i % 4], 'risk_level': 'normal', 'confidence': 0.8,
+                'features': {'volume': 0.05, 'pitch': 180.0 + i % 40, 'tempo': 120.0,
+                             'pause_duration': 0.4, 'speech_ratio': 0.7}}
+               for i in range(int(horas * 3600 / periodo))]
+    for i, estado in enumerate(estados):
+        almacen.append(estado, inicio + i * periodo)
+    fin = inicio + horas * 3600
+    resultado = medir('historial_8h', lambda _: almacen.history(inicio, fin), list(range(50)), repeticiones)
+    resultado['buckets'] = len(almacen.history(inicio, fin)['buckets'])
+    return [
+        medir('agregar_estado', almacen.append, estados[:1000], repeticiones),
+        resultado
+    ]
+
+
+def bench_difusion(ventanas, repeticiones, clientes=50):
+    from broadcast import StateBroadcaster
+
+    class SocketNulo:
+        def emit(self, evento, datos, to=None):
+            pass
+
+    difusor = StateBroadcaster(SocketNulo(), lambda cabina: f"cabin:{cabina}", tick=3600)
+    for i in range(clientes):
+        difusor.subscribe(f"cliente{i}", ['bench'], delta=True)
+    estados = [{'emotion': 'estable', 'risk_level': 'normal', 'confidence': 0.8,
+                'features': {'volume': round(0.01 * i, 3), 'pitch': 150.0, 'tempo': 120.0}}
+               for i in range(len(ventanas))]
+
+    def difundir(estado):
+        seq = difusor.publish('bench', estado)
+        difusor.flush(force=True)
+        for i in range(clientes):
+            difusor.ack(f"cliente{i}", 'bench', seq)
+
+    resultado = medir('difusion_estado', difundir, estados, repeticiones)
+    difusor.stop()
+    return [resultado]
+
+
+def bench_arranque(ventanas, repeticiones):
+    from startup import measure_imports
+    ruta = os.path.join(DIRECTORIO, 'api flask.txt')
+    return [medir('arranque_servidor', lambda _: measure_imports(ruta), [None], repeticiones,
+                  calentamiento=1)]
+
+
+def cargar_servidor():
+    """
+    Importa 'api flask.txt' como módulo dentro de un directorio temporal
+    (el servidor crea data/, logs e índice en el directorio actual).
+    """
+    ruta = os.path.join(DIRECTORIO, 'api flask.txt')
+    os.chdir(tempfile.mkdtemp(prefix='bench_cabinas_'))
+    loader = importlib.machinery.SourceFileLoader('api_flask', ruta)
+    spec = importlib.util.spec_from_loader('api_flask', loader)
+    servidor = importlib.util.module_from_spec(spec)
+    loader.exec_module(servidor)
+    return servidor
+
+
+def bench_servidor(ventanas, repeticiones):
+    import logging
+    directorio_original = os.getcwd()
+    servidor = cargar_servidor()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        cabin_id = 'bench'
+        cliente = servidor.app.test_client()
+        cliente.post(f'/api/cabins/{cabin_id}/session/start', json={})
+        cabina = servidor.cabins.get(cabin_id)
+        cabina.stop_analysis()  # Los estados los produce el benchmark, no el micrófono
+
+        socket = servidor.socketio.test_client(servidor.app, flask_test_client=cliente)
+        socket.emit('join_cabin', {'cabin_id': cabin_id})
+        socket.get_received()
+
+        features = [f for f in (cabina.analyzer.extract_features(v) for v in ventanas) if f]
+
+        def estado_rest(_):
+            respuesta = cliente.get(f'/api/cabins/{cabin_id}/analysis/state')
+            assert respuesta.status_code == 200
+
+        def estado_socket(f):
+            # Volumen mínimo para no disparar el protocolo de emergencia
+            estado = servidor.classify_state(cabina, dict(f, volume_mean=max(f['volume_mean'], 0.05)))
+            servidor.emit_state(cabina, estado)
+            servidor.broadcaster.flush(force=True)
+            recibidos = socket.get_received()
+            assert any(r['name'] == 'state_update' for r in recibidos)
+
+        resultados = [
+            medir('socketio_estado', estado_socket, features, repeticiones),
+            medir('rest_estado', estado_rest, list(range(50)), repeticiones)
+        ]
+        socket.disconnect()
+        cliente.post(f'/api/cabins/{cabin_id}/session/end')
+        servidor.journal_writer.flush(5)
+        return resultados
+    finally:
+        os.chdir(directorio_original)
+
+
+BENCHMARKS = {
+    'analizar_audio': bench_demo,
+    '_clasificar_emocion': bench_demo,
+    'clasificar_lote': bench_clasificador,
+    'metricas_ventana': bench_caracteristicas,
+    'vad_ventana': bench_vad,
+    'remuestreo_bloque': bench_remuestreo,
+    'remuestreo_bloque_44k': bench_remuestreo,
+    'analizar_silencio': bench_vad,
+    'analizar_audio_8_canales': bench_multicanal,
+    'metricas_8_canales': bench_multicanal,
+    'extract_features': bench_api_analyzer,
+    'classify_emotion': bench_api_analyzer,
+    'stft_incremental': bench_stft,
+    'stft_ventana': bench_stft,
+    'socketio_estado': bench_servidor,
+    'rest_estado': bench_servidor,
+    'span_metricas': bench_metricas,
+    'agregar_estado': bench_historial,
+    'historial_8h': bench_historial,
+    'difusion_estado': bench_difusion,
+    'arranque_servidor': bench_arranque,
+}
+
+
+def correr(solo=None, ventanas=24, repeticiones=3, semilla=0):
+    """Corre los grupos de benchmarks necesarios y regresa {nombre: resultado}."""
+    audio = ventanas_de_prueba(ventanas, semilla=semilla)
+    grupos = []
+    for nombre, grupo in BENCHMARKS.items():
+        if (not solo or nombre in solo) and grupo not in grupos:
+            grupos.append(grupo)
+
+    resultados = {}
+    for grupo in grupos:
+        for r in grupo(audio, repeticiones):
+            if not solo or r['nombre'] in solo:
+                resultados[r['nombre']] = r
+    return resultados
+
+
+# ============================================================================
+# BASE Y REGRESIONES
+# ============================================================================
+
+def cargar_base(ruta):
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_base(ruta, resultados):
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'maquina': platform.machine(),
+            'resultados': resultados
+        }, f, ensure_ascii=False, indent=2)
+
+
+def comparar(resultados, base, umbral):
+    """Lista de regresiones (texto) respecto a la base."""
+    regresiones = []
+    for nombre, actual in resultados.items():
+        previo = base['resultados'].get(nombre)
+        if not previo:
+            continue
+        latencia = actual['p50_ms'] - previo['p50_ms']
+        if latencia > LATENCIA_MIN_MS and actual['p50_ms'] > previo['p50_ms'] * (1 + umbral):
+            regresiones.append(f"{nombre}: p50 {previo['p50_ms']} → {actual['p50_ms']} ms")
+        memoria = actual['memoria_pico_kb'] - previo['memoria_pico_kb']
+        if memoria > MEMORIA_MIN_KB and actual['memoria_pico_kb'] > previo['memoria_pico_kb'] * (1 + umbral):
+            regresiones.append(f"{nombre}: memoria {previo['memoria_pico_kb']} → "
+                               f"{actual['memoria_pico_kb']} KB")
+    return regresiones
+
+
+def imprimir(resultados, base=None):
+    print(f"\n{'benchmark':<22}{'p50 ms':>10}{'p99 ms':>10}{'/s':>12}{'pico KB':>10}{'vs base':>10}")
+    print('-' * 74)
+    for nombre, r in resultados.items():
+        cambio = ''
+        previo = base and base['resultados'].get(nombre)
+        if previo and previo['p50_ms']:
+            cambio = f"{(r['p50_ms'] / previo['p50_ms'] - 1) * 100:+.0f}%"
+        print(f"{nombre:<22}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['por_segundo']:>12.1f}"
+              f"{r['memoria_pico_kb']:>10.1f}{cambio:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas de análisis y de la API")
+    parser.add_argument('--solo', action='append', choices=list(BENCHMARKS),
+                        help="Correr solo este benchmark (repetible)")
+    parser.add_argument('--ventanas', type=int, default=24, help="Ventanas sintéticas de 3 s")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--base', default=BASE_POR_DEFECTO, help="Archivo de resultados base")
+    parser.add_argument('--guardar-base', action='store_true', help="Guardar esta corrida como base")
+    parser.add_argument('--umbral', type=float, default=UMBRAL_POR_DEFECTO,
+                        help="Empeoramiento relativo tolerado (0.25 = 25%%)")
+    parser.add_argument('--json', help="Guardar también los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    resultados = correr(args.solo, args.ventanas, args.repeticiones, args.semilla)
+    base = None if args.guardar_base else cargar_base(args.base)
+    imprimir(resultados, base)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+    if args.guardar_base:
+        guardar_base(args.base, resultados)
+        print(f"\n✓ Base guardada en {args.base}")
+        return 0
+
+    if base is None:
+        print(f"\n⚠️ Sin base en {args.base}; usa --guardar-base para crearla")
+        return 0
+
+    regresiones = comparar(resultados, base, args.umbral)
+    if regresiones:
+        print(f"\n✗ Regresiones (umbral {args.umbral:.0%}):")
+        for texto in regresiones:
+            print(f"  - {texto}")
+        return 1
+    print(f"\n✓ Sin regresiones respecto a la base ({base['fecha']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+DIFUSIÓN DE ESTADOS POR WEBSOCKET
+Los estados de cada cabina no se emiten en cuanto salen del pipeline: se
+guarda el último por cabina y un hilo los envía por ticks, así lo que llega
+más rápido de lo que un cliente pidió se coalesce (solo viaja lo más
+reciente). Hay dos tipos de suscriptor:
+  - sala de la cabina (conexión por defecto / 'join_cabin'): estado completo
+    en JSON con 'state_update', una sola emisión por sala y tick.
+  - suscripción propia ('subscribe'): tasa por cliente, un 'state_updates'
+    por tick con todas sus cabinas, deltas por campo contra el último estado
+    que el cliente confirmó ('state_ack') y codificación msgpack opcional.
+Las alertas de emergencia no pasan por aquí: salen directo del despachador.
+"""
+
+import logging
+import threading
+import time
+
+import metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # Solo se necesita para la codificación binaria
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 0.05    # Periodo del hilo de envío
+ROOM_RATE = 10.0       # Estados por segundo por sala
+MAX_CLIENT_RATE = 20.0
+MAX_UNACKED = 32       # Estados enviados que se recuerdan esperando confirmación
+
+EMIT_SECONDS = metrics.histogram('socketio_emit_seconds', 'Duración de socketio.emit', event='state_update')
+CLIENT_EMIT_SECONDS = metrics.histogram('socketio_emit_seconds', 'Duración de socketio.emit',
+                                        event='state_updates')
+COALESCED = metrics.counter('broadcast_states_coalesced_total',
+                            'Estados reemplazados por uno más nuevo antes de enviarse')
+
+_MISSING = object()
+
+
+def diff_state(old, new, prefix=''):
+    """
+    Cambios por campo para pasar de `old` a `new`. Los dicts anidados se
+    comparan campo por campo con rutas 'a.b'. Regresa (cambiados, borrados).
+    """
+    changed, removed = {}, []
+    for key, value in new.items():
+        path = prefix + key
+        previous = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            sub_changed, sub_removed = diff_state(previous, value, path + '.')
+            changed.update(sub_changed)
+            removed.extend(sub_removed)
+        elif previous is _MISSING or previous != value:
+            changed[path] = value
+    removed.extend(prefix + key for key in old if key not in new)
+    return changed, removed
+
+
+def apply_delta(state, changed, removed):
+    """Aplica un delta de diff_state sobre una copia de `state` (lado cliente)."""
+    result = _copy(state)
+    for path in removed:
+        *parents, key = path.split('.')
+        target = result
+        for part in parents:
+            target = target.get(part, {})
+        target.pop(key, None)
+    for path, value in changed.items():
+        *parents, key = path.split('.')
+        target = result
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[key] = value
+    return result
+
+
+def _copy(state):
+    return {k: _copy(v) if isinstance(v, dict) else v for k, v in state.items()}
+
+
+class _Cursor:
+    """Lo que un cliente ya recibió y confirmó de una cabina."""
+
+    __slots__ = ('sent_seq', 'acked_seq', 'acked_state', 'unacked')
+
+    def __init__(self):
+        self.sent_seq = 0
+        self.acked_seq = 0
+        self.acked_state = None
+        self.unacked = {}
+
+
+class _Client:
+    def __init__(self, sid, rate, encoding, delta):
+        self.sid = sid
+        self.interval = 1.0 / rate
+        self.encoding = encoding
+        self.delta = delta
+        self.next_due = 0.0
+        self.cursors = {}
+
+    def options(self):
+        return {'rate': round(1.0 / self.interval, 2), 'encoding': self.encoding,
+                'delta': self.delta, 'cabin_ids': sorted(self.cursors)}
+
+
+class StateBroadcaster:
+    """Último estado por cabina y envío coalescido por sala y por cliente."""
+
+    def __init__(self, socketio, room_for, tick=TICK_SECONDS, room_rate=ROOM_RATE):
+        self.socketio = socketio
+        self.room_for = room_for
+        self.tick = tick
+        self.room_interval = 1.0 / room_rate
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Un envío a la vez: conserva el orden
+        self._latest = {}      # cabin_id -> (seq, estado)
+        self._room_sent = {}   # cabin_id -> seq enviado a la sala
+        self._room_due = {}    # cabin_id -> siguiente envío permitido
+        self._clients = {}     # sid -> _Client
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='state-broadcaster', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Publicación y suscripciones
+    # ------------------------------------------------------------------
+
+    def publish(self, cabin_id, state, urgent=False):
+        """Registra el estado más reciente de la cabina. `urgent` lo envía ya."""
+        with self._lock:
+            previous = self._latest.get(cabin_id)
+            seq = previous[0] + 1 if previous else 1
+            if previous and previous[0] > self._room_sent.get(cabin_id, 0):
+                COALESCED.inc()
+            self._latest[cabin_id] = (seq, state)
+        if urgent:
+            self.flush(force=True)
+        return seq
+
+    def subscribe(self, sid, cabin_ids, rate=None, encoding='json', delta=False):
+        """
+        Suscribe al cliente a varias cabinas con sus opciones de envío.
+        Regresa las opciones efectivas (msgpack cae a JSON si no está instalado).
+        """
+        rate = min(max(float(rate or ROOM_RATE), 0.1), MAX_CLIENT_RATE)
+        if encoding != 'msgpack' or msgpack is None:
+            encoding = 'json'
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                client = self._clients[sid] = _Client(sid, rate, encoding, bool(delta))
+            else:
+                client.interval, client.encoding, client.delta = 1.0 / rate, encoding, bool(delta)
+            for cabin_id in cabin_ids:
+                client.cursors.setdefault(cabin_id, _Cursor())
+            return client.options()
+
+    def unsubscribe(self, sid, cabin_ids=None):
+        """Quita cabinas de la suscripción (todas si `cabin_ids` es None)."""
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                return
+            for cabin_id in list(client.cursors) if cabin_ids is None else cabin_ids:
+                client.cursors.pop(cabin_id, None)
+            if not client.cursors:
+                del self._clients[sid]
+
+    def ack(self, sid, cabin_id, seq):
+        """El cliente confirma que aplicó el estado `seq`: será la base de los deltas."""
+        with self._lock:
+            client = self._clients.get(sid)
+            cursor = client and client.cursors.get(cabin_id)
+            if cursor is None or seq not in cursor.unacked:
+                return
+            cursor.acked_seq, cursor.acked_state = seq, cursor.unacked[seq]
+            cursor.unacked = {s: v for s, v in cursor.unacked.items() if s > seq}
+
+    def forget_cabin(self, cabin_id):
+        """Olvida el último estado de una cabina que cerró."""
+        with self._lock:
+            for table in (self._latest, self._room_sent, self._room_due):
+                table.pop(cabin_id, None)
+            # La numeración vuelve a empezar si la cabina abre otra sesión
+            for client in self._clients.values():
+                if cabin_id in client.cursors:
+                    client.cursors[cabin_id] = _Cursor()
+
+    # ------------------------------------------------------------------
+    # Envío
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error al difundir estados: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def flush(self, force=False):
+        """Envía lo pendiente cuya tasa ya lo permite (todo si `force`)."""
+        with self._flush_lock:
+            self._flush(force)
+
+    def _flush(self, force):
+        now = time.monotonic()
+        room_batch, client_batch = [], []
+        with self._lock:
+            for cabin_id, (seq, state) in self._latest.items():
+                if self._room_sent.get(cabin_id, 0) >= seq:
+                    continue
+                if force or now >= self._room_due.get(cabin_id, 0.0):
+                    self._room_sent[cabin_id] = seq
+                    self._room_due[cabin_id] = now + self.room_interval
+                    room_batch.append((cabin_id, state))
+
+            for client in self._clients.values():
+                if not force and now < client.next_due:
+                    continue
+                updates = [self._update(client, cabin_id, cursor)
+                           for cabin_id, cursor in client.cursors.items()
+                           if self._latest.get(cabin_id, (0,))[0] > cursor.sent_seq]
+                if updates:
+                    client.next_due = now + client.interval
+                    client_batch.append((client.sid, client.encoding, updates))
+
+        for cabin_id, state in room_batch:
+            with EMIT_SECONDS.time():
+                self.socketio.emit('state_update', state, to=self.room_for(cabin_id))
+        for sid, encoding, updates in client_batch:
+            payload = {'updates': updates}
+            if encoding == 'msgpack':
+                payload = msgpack.packb(payload, use_bin_type=True)
+            with CLIENT_EMIT_SECONDS.time():
+                self.socketio.emit('state_updates', payload, to=sid)
+
+    def _update(self, client, cabin_id, cursor):
+        """Entrada de un cliente para una cabina: delta si hay base confirmada."""
+        seq, state = self._latest[cabin_id]
+        cursor.sent_seq = seq
+        if client.delta and cursor.acked_state is not None:
+            changed, removed = diff_state(cursor.acked_state, state)
+            entry = {'cabin_id': cabin_id, 'seq': seq, 'base': cursor.acked_seq,
+                     'set': changed, 'unset': removed}
+        else:
+            entry = {'cabin_id': cabin_id, 'seq': seq, 'state': state}
+        if client.delta:
+            if len(cursor.unacked) >= MAX_UNACKED:
+                del cursor.unacked[min(cursor.unacked)]  # Ya no se podrá confirmar
+            cursor.unacked[seq] = state
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'cabins': len(self._latest), 'clients': len(self._clients)}
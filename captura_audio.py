@@ -0,0 +1,200 @@
+"""
+CAPTURA CONTINUA DE AUDIO - CABINAS ANTI-SUICIDIO
+Stream de micrófono por callback que escribe en un buffer circular int16
+preasignado, y ventanas deslizantes (ej. 3 s cada 0.5 s) para el análisis.
+Así no se pierde voz entre tomas y cada resultado llega en menos de 1 s.
+El micrófono se abre a su frecuencia y número de canales nativos; el
+callback remuestrea a la frecuencia de análisis y, salvo que se pidan los
+canales por separado (cabinas con varios micrófonos), mezcla a mono.
+"""
+
+import threading
+import numpy as np
+
+from remuestreo import RemuestreadorPolifasico, a_int16
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+
+class BufferCircular:
+    """
+    Buffer circular de muestras int16 con memoria fija.
+    Las posiciones se manejan como índices absolutos (muestras escritas
+    desde el inicio), así el lector sabe exactamente qué tramo pide.
+    Con varios canales cada posición es un cuadro (muestras x canales).
+    """
+
+    def __init__(self, capacidad, canales=1):
+        self.capacidad = int(capacidad)
+        self.canales = canales
+        forma = (self.capacidad,) + ((canales,) if canales > 1 else ())
+        self._datos = np.zeros(forma, dtype=np.int16)
+        self._escritas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_escritas(self):
+        """Total de muestras escritas desde que se creó el buffer."""
+        return self._escritas
+
+    @property
+    def inicio_disponible(self):
+        """Índice absoluto de la muestra más antigua que sigue en el buffer."""
+        return max(0, self._escritas - self.capacidad)
+
+    def escribir(self, muestras):
+        """Copia un bloque de muestras al buffer (sin asignar memoria nueva)."""
+        n = len(muestras)
+        if n == 0:
+            return
+        with self._lock:
+            if n >= self.capacidad:
+                # El bloque no cabe: solo importan las últimas muestras
+                self._escritas += n - self.capacidad
+                muestras = muestras[-self.capacidad:]
+                n = self.capacidad
+
+            pos = self._escritas % self.capacidad
+            primero = min(n, self.capacidad - pos)
+            self._datos[pos:pos + primero] = muestras[:primero]
+            if primero < n:
+                self._datos[:n - primero] = muestras[primero:]
+            self._escritas += n
+
+    def leer(self, inicio, n):
+        """Copia n muestras a partir del índice absoluto `inicio`."""
+        with self._lock:
+            if inicio < self._escritas - self.capacidad or inicio + n > self._escritas:
+                raise ValueError(f"Tramo [{inicio}, {inicio + n}) fuera del buffer")
+
+            pos = inicio % self.capacidad
+            primero = min(n, self.capacidad - pos)
+            salida = np.empty((n,) + self._datos.shape[1:], dtype=np.int16)
+            salida[:primero] = self._datos[pos:pos + primero]
+            if primero < n:
+                salida[primero:] = self._datos[:n - primero]
+            return salida
+
+    def ultimas(self, n):
+        """Copia las últimas n muestras escritas."""
+        return self.leer(self._escritas - n, n)
+
+
+class CapturaContinua:
+    """
+    Captura persistente del micrófono con stream por callback.
+    El callback solo copia al buffer circular; el análisis consume ventanas
+    deslizantes desde otro hilo con `ventanas()`. Con `mezclar=False` y
+    varios canales las ventanas son bloques (canales x muestras).
+    """
+
+    def __init__(self, audio, rate=16000, chunk=1024, ventana_seg=3.0,
+                 salto_seg=0.5, segundos_buffer=10.0, dispositivo=None,
+                 rate_dispositivo=None, canales=1, mezclar=True):
+        if pyaudio is None:
+            raise RuntimeError("pyaudio no está instalado")
+
+        self.audio = audio
+        self.rate = rate
+        self.dispositivo = dispositivo
+        self.rate_dispositivo = int(rate_dispositivo or rate)
+        self.canales = canales
+        self.mezclar = mezclar or canales == 1
+        canales_buffer = 1 if self.mezclar else canales
+        # Mismo tiempo por bloque que `chunk` a la frecuencia de análisis
+        self.chunk = max(1, chunk * self.rate_dispositivo // rate)
+        self.remuestreador = RemuestreadorPolifasico(self.rate_dispositivo, rate, canales_buffer)
+        self.muestras_ventana = int(ventana_seg * rate)
+        self.muestras_salto = max(1, int(salto_seg * rate))
+
+        capacidad = max(int(segundos_buffer * rate), 2 * self.muestras_ventana)
+        self.buffer = BufferCircular(capacidad, canales_buffer)
+
+        self.stream = None
+        self.activa = False
+        self.desbordes = 0
+        self.ventanas_perdidas = 0
+        self._nuevos_datos = threading.Condition()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """Callback de PortAudio: mezcla, remuestrea, copia al buffer y avisa al lector."""
+        muestras = np.frombuffer(in_data, dtype=np.int16)
+        if self.canales > 1:
+            muestras = muestras.reshape(-1, self.canales)
+            if self.mezclar:
+                muestras = muestras.mean(axis=1, dtype=np.float32)
+        if not self.remuestreador.directo:
+            muestras = a_int16(self.remuestreador.procesar(muestras))
+        elif muestras.dtype != np.int16:
+            muestras = a_int16(muestras)
+        self.buffer.escribir(muestras)
+        if status:
+            self.desbordes += 1
+        with self._nuevos_datos:
+            self._nuevos_datos.notify_all()
+        return (None, pyaudio.paContinue)
+
+    def iniciar(self):
+        """Abre el stream y empieza a llenar el buffer."""
+        if self.activa:
+            return self
+        self.remuestreador.reiniciar()
+        self.stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=self.canales,
+            rate=self.rate_dispositivo,
+            input=True,
+            input_device_index=self.dispositivo,
+            frames_per_buffer=self.chunk,
+            stream_callback=self._callback
+        )
+        self.activa = True
+        self.stream.start_stream()
+        return self
+
+    def detener(self):
+        """Detiene y cierra el stream."""
+        self.activa = False
+        with self._nuevos_datos:
+            self._nuevos_datos.notify_all()
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def ventanas(self, timeout=1.0):
+        """
+        Generador de ventanas deslizantes (arrays int16; (canales x muestras)
+        si los canales no se mezclan).
+        Entrega una ventana cada `salto_seg`; si el consumidor se atrasa más
+        que el buffer, salta a la ventana más reciente y cuenta las perdidas.
+        """
+        siguiente_fin = self.buffer.total_escritas + self.muestras_ventana
+
+        while self.activa:
+            with self._nuevos_datos:
+                while self.activa and self.buffer.total_escritas < siguiente_fin:
+                    self._nuevos_datos.wait(timeout)
+            if not self.activa:
+                break
+
+            inicio = siguiente_fin - self.muestras_ventana
+            if inicio < self.buffer.inicio_disponible:
+                # El análisis se atrasó: saltar a la última ventana completa
+                total = self.buffer.total_escritas
+                saltos = (total - siguiente_fin) // self.muestras_salto
+                self.ventanas_perdidas += int(saltos)
+                siguiente_fin += saltos * self.muestras_salto
+                inicio = siguiente_fin - self.muestras_ventana
+
+            yield self.buffer.leer(inicio, self.muestras_ventana).T
+            siguiente_fin += self.muestras_salto
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.detener()
@@ -0,0 +1,257 @@
+"""
+MOTOR DE CARACTERÍSTICAS POR TRAMAS
+Divide la señal en tramas cortas (vistas con strides, sin copiar) y calcula
+RMS, ZCR, energía y voz/silencio de todas las tramas en una sola pasada
+float32. Las métricas globales de la ventana salen de estos arreglos.
+Un bloque de varios micrófonos (canales × muestras) pasa por las mismas
+operaciones sobre el último eje: todos los canales a la vez, sin bucles.
+"""
+
+import numpy as np
+
+TRAMA_SEGUNDOS = 0.02       # 20 ms por trama
+PAUSA_MIN_SEGUNDOS = 0.15   # Silencios más cortos no cuentan como pausa
+FACTOR_SILENCIO = 0.3       # Umbral relativo al volumen promedio
+FUSIONES = ('snr', 'energia', 'mezcla')   # Cómo se reduce un bloque multicanal
+
+
+def enmarcar(senal, tam_trama, salto=None):
+    """
+    Devuelve una vista (num_tramas x tam_trama) de la señal sin copiarla.
+    Las muestras finales que no completan una trama se descartan.
+    Con (canales x muestras) la vista es (canales x num_tramas x tam_trama).
+    """
+    salto = salto or tam_trama
+    largo = senal.shape[-1]
+    if largo < tam_trama:
+        return senal[..., :0].reshape(senal.shape[:-1] + (0, tam_trama))
+    num_tramas = 1 + (largo - tam_trama) // salto
+    paso = senal.strides[-1]
+    return np.lib.stride_tricks.as_strided(
+        senal,
+        shape=senal.shape[:-1] + (num_tramas, tam_trama),
+        strides=senal.strides[:-1] + (salto * paso, paso),
+        writeable=False
+    )
+
+
+def caracteristicas_tramas(audio_data, rate, trama_seg=TRAMA_SEGUNDOS,
+                           factor_silencio=FACTOR_SILENCIO):
+    """
+    Calcula las características de cada trama.
+    Regresa un dict de arreglos float32 (uno por característica) más la
+    máscara booleana `sonora` y el tamaño de trama en muestras. Con un
+    bloque (canales x muestras) cada arreglo es (canales x tramas).
+    """
+    tam = max(1, int(rate * trama_seg))
+
+    # Única copia de la señal: float32 de trabajo
+    x = np.asarray(audio_data, dtype=np.float32).copy()
+    tramas = enmarcar(x, tam)
+    n = tramas.shape[-2]
+
+    # Cruces por cero: cambio de signo entre muestras consecutivas,
+    # alineado para que cada cruce pertenezca a una sola trama
+    signo = np.signbit(x)
+    cambios = np.empty(x.shape, dtype=np.bool_)
+    np.not_equal(signo[..., 1:], signo[..., :-1], out=cambios[..., :-1])
+    cambios[..., -1:] = False
+    cruces = enmarcar(cambios, tam).sum(axis=-1, dtype=np.int32)
+
+    suma = tramas.sum(axis=-1)
+    energia = np.einsum('...j,...j->...', tramas, tramas) / tam
+
+    # A partir de aquí se reutiliza el mismo buffer para el valor absoluto
+    np.abs(x, out=x)
+    media_abs = tramas.sum(axis=-1) / tam
+    pico = tramas.max(axis=-1) if n else np.zeros(tramas.shape[:-1], dtype=np.float32)
+
+    # Umbral de silencio relativo al volumen promedio de cada canal
+    volumen_promedio = media_abs.mean(axis=-1, keepdims=True) if n else 0.0
+    sonora = media_abs > volumen_promedio * factor_silencio
+
+    return {
+        'tam_trama': tam,
+        'media': suma / tam,
+        'media_abs': media_abs,
+        'pico': pico,
+        'rms': np.sqrt(energia),
+        'energia': energia,
+        'zcr': cruces.astype(np.float32) / tam,
+        'cruces': cruces,
+        'sonora': sonora
+    }
+
+
+def detectar_pausas(sonora, seg_por_trama, pausa_min_seg=PAUSA_MIN_SEGUNDOS):
+    """
+    Encuentra los tramos de tramas silenciosas consecutivas.
+    Regresa un arreglo con la duración en segundos de cada pausa.
+    """
+    silencio = np.concatenate(([0], (~sonora).view(np.int8), [0]))
+    bordes = np.diff(silencio)
+    inicios = np.flatnonzero(bordes == 1)
+    fines = np.flatnonzero(bordes == -1)
+    duraciones = (fines - inicios) * seg_por_trama
+    return duraciones[duraciones >= pausa_min_seg]
+
+
+def metricas_ventana(audio_data, rate, trama_seg=TRAMA_SEGUNDOS,
+                     pausa_min_seg=PAUSA_MIN_SEGUNDOS):
+    """
+    Métricas globales de la ventana derivadas de los arreglos por trama.
+    Regresa también los arreglos por trama en la llave 'tramas'.
+    """
+    t = caracteristicas_tramas(audio_data, rate, trama_seg)
+    tam = t['tam_trama']
+    n = len(t['rms'])
+    if n == 0:
+        return {
+            'volumen': 0.0, 'volumen_max': 0.0, 'variabilidad': 0.0,
+            'frecuencia': 0.0, 'energia': 0.0, 'pausas': 0,
+            'duracion_pausas': 0.0, 'pausa_promedio': 0.0,
+            'ratio_habla': 0.0, 'tramas': t
+        }
+
+    media = float(t['media'].mean(dtype=np.float64))
+    energia = float(t['energia'].mean(dtype=np.float64))
+    cruces = int(t['cruces'].sum())
+    pausas = detectar_pausas(t['sonora'], tam / rate, pausa_min_seg)
+
+    return {
+        'volumen': float(t['media_abs'].mean(dtype=np.float64)),
+        'volumen_max': float(t['pico'].max()),
+        'variabilidad': float(np.sqrt(max(energia - media ** 2, 0.0))),
+        'frecuencia': cruces / (n * tam) * rate / 2,
+        'energia': energia,
+        'pausas': int(len(pausas)),
+        'duracion_pausas': float(pausas.sum()),
+        'pausa_promedio': float(pausas.mean()) if len(pausas) else 0.0,
+        'ratio_habla': float(t['sonora'].mean()),
+        'tramas': t
+    }
+
+
+# ============================================================================
+# MULTICANAL (canales x muestras)
+# ============================================================================
+
+def pausas_por_canal(sonora, seg_por_trama, pausa_min_seg=PAUSA_MIN_SEGUNDOS):
+    """
+    Pausas de cada canal de una máscara (canales x tramas), sin recorrer los
+    canales. Regresa (número de pausas, duración total en s) por canal.
+    """
+    canales = sonora.shape[0]
+    silencio = np.zeros((canales, sonora.shape[1] + 2), dtype=np.int8)
+    silencio[:, 1:-1] = ~sonora
+    bordes = np.diff(silencio, axis=1)
+    # nonzero recorre fila por fila: inicios y fines quedan emparejados
+    canal, inicios = np.nonzero(bordes == 1)
+    _, fines = np.nonzero(bordes == -1)
+    duraciones = (fines - inicios) * seg_por_trama
+    validas = duraciones >= pausa_min_seg
+    conteo = np.bincount(canal[validas], minlength=canales)
+    total = np.bincount(canal[validas], weights=duraciones[validas], minlength=canales)
+    return conteo, total
+
+
+def _calidad(energia):
+    """
+    SNR (dB) y peso de voz de cada canal a partir de la energía por trama
+    (canales x tramas): el ruido es el percentil 10 y la voz el 90.
+    """
+    ruido, voz = np.percentile(energia, [10, 90], axis=-1)
+    snr_db = 10.0 * np.log10((voz + 1e-10) / (ruido + 1e-10))
+    peso = np.maximum(energia.mean(axis=-1) - ruido, 0.0)
+    return snr_db, peso
+
+
+def _pesos(peso):
+    total = peso.sum()
+    return peso / total if total > 0 else np.full(len(peso), 1.0 / len(peso))
+
+
+def metricas_canales(audio_data, rate, trama_seg=TRAMA_SEGUNDOS,
+                     pausa_min_seg=PAUSA_MIN_SEGUNDOS):
+    """
+    Las métricas de metricas_ventana para cada canal de un bloque
+    (canales x muestras), calculadas todas en la misma pasada. Cada llave es
+    un arreglo por canal; 'snr_db' y 'peso' sirven para elegir o fusionar.
+    """
+    t = caracteristicas_tramas(audio_data, rate, trama_seg)
+    tam = t['tam_trama']
+    canales, n = t['rms'].shape
+    if n == 0:
+        ceros = np.zeros(canales)
+        return {
+            'volumen': ceros, 'volumen_max': ceros, 'variabilidad': ceros,
+            'frecuencia': ceros, 'energia': ceros, 'pausas': ceros.astype(np.int64),
+            'duracion_pausas': ceros, 'pausa_promedio': ceros, 'ratio_habla': ceros,
+            'snr_db': ceros, 'peso': ceros, 'tramas': t
+        }
+
+    media = t['media'].mean(axis=1, dtype=np.float64)
+    energia = t['energia'].mean(axis=1, dtype=np.float64)
+    conteo, total = pausas_por_canal(t['sonora'], tam / rate, pausa_min_seg)
+    snr_db, peso = _calidad(t['energia'])
+
+    return {
+        'volumen': t['media_abs'].mean(axis=1, dtype=np.float64),
+        'volumen_max': t['pico'].max(axis=1),
+        'variabilidad': np.sqrt(np.maximum(energia - media ** 2, 0.0)),
+        'frecuencia': t['cruces'].sum(axis=1) / (n * tam) * rate / 2,
+        'energia': energia,
+        'pausas': conteo,
+        'duracion_pausas': total,
+        'pausa_promedio': np.divide(total, conteo, out=np.zeros_like(total), where=conteo > 0),
+        'ratio_habla': t['sonora'].mean(axis=1),
+        'snr_db': snr_db,
+        'peso': peso,
+        'tramas': t
+    }
+
+
+def fusionar_metricas(por_canal, metodo='snr'):
+    """
+    Reduce las métricas por canal a las de una sola voz (mismas llaves que
+    metricas_ventana, más 'canal'): 'snr' toma el micrófono con mejor SNR,
+    'energia' y 'mezcla' promedian, ponderando por la energía de voz o no.
+    """
+    llaves = [k for k in por_canal if k not in ('tramas', 'snr_db', 'peso')]
+    if metodo == 'snr':
+        canal = int(np.argmax(por_canal['snr_db']))
+        fusion = {k: float(por_canal[k][canal]) for k in llaves}
+    elif metodo in ('energia', 'mezcla'):
+        canal = None
+        pesos = _pesos(por_canal['peso']) if metodo == 'energia' else _pesos(np.ones(len(por_canal['peso'])))
+        fusion = {k: float(pesos @ por_canal[k]) for k in llaves}
+    else:
+        raise ValueError(f"Fusión de canales desconocida: {metodo!r} (opciones: {', '.join(FUSIONES)})")
+    fusion['pausas'] = int(round(fusion['pausas']))
+    fusion['canal'] = canal
+    return fusion
+
+
+def fusionar_canales(audio_data, rate, metodo='snr', trama_seg=TRAMA_SEGUNDOS):
+    """
+    Reduce un bloque (canales x muestras) a una sola señal antes de un
+    análisis caro (ej. tono): 'snr' elige el canal de mejor SNR, 'energia'
+    promedia ponderando por la energía de voz de cada canal y 'mezcla' es el
+    promedio simple. Una señal 1-D se regresa tal cual.
+    """
+    x = np.asarray(audio_data)
+    if x.ndim == 1:
+        return x
+    if metodo == 'mezcla':
+        return x.mean(axis=0, dtype=np.float32)
+    if metodo not in FUSIONES:
+        raise ValueError(f"Fusión de canales desconocida: {metodo!r} (opciones: {', '.join(FUSIONES)})")
+
+    tam = max(1, int(rate * trama_seg))
+    tramas = enmarcar(x.astype(np.float32, copy=False), tam)
+    if tramas.shape[-2] == 0:
+        return x.mean(axis=0, dtype=np.float32)
+    snr_db, peso = _calidad(np.einsum('...j,...j->...', tramas, tramas) / tam)
+    if metodo == 'snr':
+        return x[int(np.argmax(snr_db))]
+    return np.einsum('c,cn->n', _pesos(peso).astype(np.float32), x.astype(np.float32, copy=False))
@@ -0,0 +1,185 @@
+"""
+CLASIFICADOR POR TABLA DE REGLAS (vectorizado)
+Las reglas del demo son una tabla de umbrales con prioridad: decide la
+primera regla cuyas condiciones se cumplen. La tabla se compila a matrices
+de límites (inferior < x < superior) por regla y característica, así una
+matriz (ventanas × características) se clasifica con una sola comparación
+de NumPy; una ventana suelta recorre los mismos límites sin NumPy.
+Incluye un suavizador en línea con histéresis para que el riesgo no cambie
+de nivel con cada ventana.
+"""
+
+from collections import deque
+
+import numpy as np
+
+# 'duracion_pausas': segundos de pausa (silencios >= 0.15 s) en la ventana;
+# el número de pausas de una ventana de 3 s (0 a 3) no distingue nada
+CARACTERISTICAS = ('volumen', 'variabilidad', 'frecuencia', 'duracion_pausas')
+NIVELES_RIESGO = ['normal', 'medio', 'alto', 'critico']
+TAM_BLOQUE = 65536   # Filas por bloque en lote (acota la memoria temporal)
+
+# Umbrales configurables (atributos del analizador con el mismo nombre)
+UMBRALES = {
+    'umbral_volumen_bajo': 1000,
+    'umbral_volumen_alto': 8000,
+    'umbral_variabilidad_alta': 2000
+}
+
+# Voz de referencia con la que se afinaron los umbrales: (media, desviación)
+# por característica. La línea base de cada sesión (linea_base.py) lleva los
+# valores de la persona a esta escala antes de aplicar la tabla.
+REFERENCIA = {
+    'volumen': (3000.0, 1500.0),
+    'variabilidad': (1500.0, 700.0),
+    'frecuencia': (400.0, 200.0),
+    'duracion_pausas': (0.3, 0.3)
+}
+
+# (emoción, riesgo, explicación, condiciones) en orden de prioridad.
+# Condición: (característica, '<' | '<=' | '>' | '>=', número o nombre de umbral)
+# Varias reglas con la misma salida equivalen a un "o". Umbrales para una
+# ventana de 3 s (calibrados con los perfiles de voz_sintetica.py).
+REGLAS = (
+    # CRISIS va primero: la regla de depresión o la de tristeza la taparían
+    ('crisis', 'critico', 'Señales críticas: voz muy débil con pausas largas',
+     (('volumen', '<', 100), ('duracion_pausas', '>=', 1.2))),
+    ('crisis', 'critico', 'Señales críticas: voz casi inaudible',
+     (('volumen', '<', 50),)),
+
+    # DEPRESIÓN: Volumen muy bajo y poca variabilidad, o volumen bajo con
+    # pausas largas (más de la mitad de la ventana en silencio)
+    ('depresion', 'alto', 'Voz muy baja y monótona',
+     (('volumen', '<', 350), ('variabilidad', '<', 1000))),
+    ('depresion', 'alto', 'Voz baja y con muchas pausas',
+     (('volumen', '<', 'umbral_volumen_bajo'), ('variabilidad', '<', 1000), ('duracion_pausas', '>=', 1.5))),
+
+    # ANSIEDAD: Volumen alto, mucha variabilidad
+    ('ansiedad', 'medio', 'Voz intensa y con variabilidad alta',
+     (('volumen', '>', 'umbral_volumen_alto'), ('variabilidad', '>', 'umbral_variabilidad_alta'))),
+
+    # TRISTEZA: Volumen bajo/medio, frecuencia baja
+    ('tristeza', 'medio', 'Voz apagada y tono bajo',
+     (('volumen', '<', 3000), ('frecuencia', '<', 150))),
+)
+
+# ESTABLE: Todo en rangos normales
+POR_DEFECTO = ('estable', 'normal', 'Parámetros de voz en rango normal')
+
+
+class TablaCompilada:
+    """Reglas con los umbrales ya resueltos, listas para evaluar."""
+
+    def __init__(self, reglas=REGLAS, umbrales=None, por_defecto=POR_DEFECTO,
+                 caracteristicas=CARACTERISTICAS):
+        umbrales = dict(UMBRALES, **(umbrales or {}))
+        self.caracteristicas = tuple(caracteristicas)
+        columna = {nombre: i for i, nombre in enumerate(self.caracteristicas)}
+
+        self.inferior = np.full((len(reglas), len(columna)), -np.inf)
+        self.superior = np.full((len(reglas), len(columna)), np.inf)
+        for r, (_, _, _, condiciones) in enumerate(reglas):
+            for nombre, op, umbral in condiciones:
+                valor = float(umbrales[umbral] if isinstance(umbral, str) else umbral)
+                c = columna[nombre]
+                # Los límites son abiertos: <= y >= se corren al flotante vecino
+                if op == '<':
+                    self.superior[r, c] = min(self.superior[r, c], valor)
+                elif op == '<=':
+                    self.superior[r, c] = min(self.superior[r, c], np.nextafter(valor, np.inf))
+                elif op == '>':
+                    self.inferior[r, c] = max(self.inferior[r, c], valor)
+                elif op == '>=':
+                    self.inferior[r, c] = max(self.inferior[r, c], np.nextafter(valor, -np.inf))
+                else:
+                    raise ValueError(f"Operador no soportado: {op!r}")
+
+        # Salida de cada regla; la última posición es la regla por defecto
+        self.salidas = [tuple(regla[:3]) for regla in reglas] + [tuple(por_defecto)]
+
+        # Ruta escalar: solo los límites finitos de cada regla
+        self._condiciones = [
+            [(c, float(lo), float(hi)) for c, (lo, hi) in enumerate(zip(inf, sup))
+             if lo != -np.inf or hi != np.inf]
+            for inf, sup in zip(self.inferior, self.superior)
+        ]
+
+    def clasificar(self, valores):
+        """Una ventana (valores en el orden de `caracteristicas`). Regresa (emoción, riesgo, explicación)."""
+        for salida, condiciones in zip(self.salidas, self._condiciones):
+            if all(lo < valores[c] < hi for c, lo, hi in condiciones):
+                return salida
+        return self.salidas[-1]
+
+    def reglas_lote(self, matriz):
+        """Índice de la regla que decide cada fila de una matriz (N × características)."""
+        matriz = np.asarray(matriz, dtype=np.float64).reshape(-1, len(self.caracteristicas))
+        decision = np.empty(len(matriz), dtype=np.intp)
+        for i in range(0, len(matriz), TAM_BLOQUE):
+            x = matriz[i:i + TAM_BLOQUE, None, :]
+            cumple = ((x > self.inferior) & (x < self.superior)).all(axis=2)
+            primera = cumple.argmax(axis=1)
+            primera[~cumple.any(axis=1)] = len(self.salidas) - 1
+            decision[i:i + TAM_BLOQUE] = primera
+        return decision
+
+    def clasificar_lote(self, matriz):
+        """Regresa (emociones, riesgos, explicaciones) como arreglos, uno por fila."""
+        decision = self.reglas_lote(matriz)
+        return tuple(np.array(columna, dtype=object)[decision] for columna in zip(*self.salidas))
+
+
+# ============================================================================
+# SUAVIZADO EN LÍNEA (histéresis)
+# ============================================================================
+
+class SuavizadorRiesgo:
+    """
+    Histéresis sobre el riesgo de ventanas consecutivas. Subir de nivel pide
+    `confirmar` de las últimas `ventana` ventanas en ese nivel o más (los
+    niveles en `inmediatos` suben al instante: una crisis nunca espera);
+    bajar pide `bajada` ventanas seguidas por debajo del nivel mostrado.
+    """
+
+    def __init__(self, niveles=NIVELES_RIESGO, confirmar=2, ventana=3, bajada=3, inmediatos=('critico',)):
+        self.rango = {nivel: i for i, nivel in enumerate(niveles)}
+        self.confirmar = confirmar
+        self.ventana = ventana
+        self.bajada = bajada
+        self.inmediatos = set(inmediatos)
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._recientes = deque(maxlen=self.ventana)
+        self._mostrado = None   # (rango, estado)
+        self._abajo = 0
+
+    def actualizar(self, riesgo, estado):
+        """Registra una ventana con su riesgo y regresa el estado a mostrar."""
+        rango = self.rango.get(riesgo, 0)
+        self._recientes.append(rango)
+        if self._mostrado is None:
+            self._mostrado = (rango, estado)
+            return estado
+
+        actual = self._mostrado[0]
+        if rango > actual:
+            self._abajo = 0
+            confirmadas = sum(r >= rango for r in self._recientes)
+            if riesgo in self.inmediatos or confirmadas >= self.confirmar:
+                self._mostrado = (rango, estado)
+        elif rango < actual:
+            self._abajo += 1
+            if self._abajo >= self.bajada:
+                self._mostrado = (rango, estado)
+                self._abajo = 0
+        else:
+            self._abajo = 0
+            self._mostrado = (rango, estado)
+        return self._mostrado[1]
+
+
+def suavizar(riesgos, **opciones):
+    """Aplica el suavizador a una secuencia de riesgos (ej. las ventanas de un archivo)."""
+    suavizador = SuavizadorRiesgo(**opciones)
+    return [suavizador.actualizar(riesgo, riesgo) for riesgo in riesgos]
@@ -6,11 +6,23 @@ Autor: Miguel Rodríguez León
 """
 
 import numpy as np
-import pyaudio
 import time
 from datetime import datetime
 import threading
 
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None  # Solo se necesita para grabar del micrófono
+
+from captura_audio import CapturaContinua
+from remuestreo import RemuestreadorPolifasico, a_int16
+from caracteristicas import fusionar_metricas, metricas_canales, metricas_ventana
+from actividad_voz import DetectorVoz, potencia_db
+from espectro import FrenteSTFT, centroide, energia
+from clasificador import REFERENCIA, UMBRALES, SuavizadorRiesgo, TablaCompilada
+from linea_base import RIESGOS_GRAVES, LineaBase
+
 # Colores para consola
 class Colors:
     HEADER = '\033[95m'
@@ -27,21 +39,53 @@ class AnalizadorVozSimple:
     Detecta emociones basándose en características de audio.
     """
     
-    def __init__(self):
+    def __init__(self, usar_microfono=True):
         # Configuración de audio
         self.CHUNK = 1024  # Tamaño del buffer
-        self.FORMAT = pyaudio.paInt16
-        self.CHANNELS = 1
-        self.RATE = 16000  # Frecuencia de muestreo (más baja para laptops)
+        self.FORMAT = pyaudio.paInt16 if pyaudio else None
+        self.CHANNELS = 1  # Informativo: se usan los canales nativos del micrófono
+        self.RATE = 16000  # Frecuencia de análisis (el micrófono se abre a la suya y se remuestrea)
         self.RECORD_SECONDS = 3  # Grabar 3 segundos
         
-        # Inicializar PyAudio
-        self.audio = pyaudio.PyAudio()
+        # Monitoreo continuo: ventana de análisis y salto entre ventanas
+        self.VENTANA_SEGUNDOS = 3
+        self.SALTO_SEGUNDOS = 0.5
+        
+        # Cabinas con varios micrófonos: 'snr' (mejor canal), 'energia'
+        # (promedio ponderado de las métricas) o 'mezcla' (mono al capturar)
+        self.FUSION_CANALES = 'snr'
+        
+        # Inicializar PyAudio (no hace falta para analizar archivos)
+        if usar_microfono:
+            if pyaudio is None:
+                raise RuntimeError("pyaudio no está instalado")
+            self.audio = pyaudio.PyAudio()
+        else:
+            self.audio = None
+        
+        # Micrófono elegido (None = el predeterminado) y los detectados por listar_microfonos
+        self.dispositivo = None
+        self.microfonos = {}
+        
+        # Umbrales de detección (la tabla de reglas se recompila si cambian)
+        self.umbral_volumen_bajo = UMBRALES['umbral_volumen_bajo']
+        self.umbral_volumen_alto = UMBRALES['umbral_volumen_alto']
+        self.umbral_variabilidad_alta = UMBRALES['umbral_variabilidad_alta']
+        self._tabla_compilada = (None, None)
         
-        # Umbrales de detección
-        self.umbral_volumen_bajo = 1000
-        self.umbral_volumen_alto = 8000
-        self.umbral_variabilidad_alta = 2000
+        # STFT compartida (25 ms, salto de 10 ms): en monitoreo continuo solo
+        # se transforma el audio nuevo de cada ventana, no los 3 s completos
+        self.stft = FrenteSTFT(self.RATE, tam_trama=int(0.025 * self.RATE), salto=int(0.01 * self.RATE),
+                               ventana='hann')
+        
+        # Compuerta de voz: las ventanas en silencio no se clasifican (sus
+        # tramas son las de la STFT)
+        self.vad = DetectorVoz(self.RATE, trama_seg=self.stft.plan.salto / self.RATE)
+        
+        # Línea base de la voz de la persona: con suficientes ventanas se
+        # clasifica lo inusual para ella, no contra umbrales absolutos
+        self.PERSONALIZAR = True
+        self.linea_base = LineaBase(REFERENCIA)
         
         print(Colors.GREEN + "✓ Analizador de voz inicializado" + Colors.END)
     
@@ -52,34 +96,77 @@ class AnalizadorVozSimple:
         numdevices = info.get('deviceCount')
         
         micros = []
+        self.microfonos = {}
         for i in range(0, numdevices):
             device_info = self.audio.get_device_info_by_host_api_device_index(0, i)
             if device_info.get('maxInputChannels') > 0:
                 micros.append(i)
-                print(f"  [{i}] {device_info.get('name')}")
+                # Formato nativo: se abre así y se remuestrea a self.RATE
+                self.microfonos[i] = {
+                    'nombre': device_info.get('name'),
+                    'indice': device_info.get('index', i),
+                    'rate': int(device_info.get('defaultSampleRate') or self.RATE),
+                    'canales': int(device_info.get('maxInputChannels'))
+                }
+                marca = ' ←' if i == self.dispositivo else ''
+                print(f"  [{i}] {device_info.get('name')} "
+                      f"({self.microfonos[i]['rate']} Hz, {self.microfonos[i]['canales']} canal(es)){marca}")
         
         return micros
     
+    def _formato_dispositivo(self, dispositivo=None):
+        """
+        (índice de PortAudio, frecuencia nativa, canales) del micrófono a
+        abrir: el indicado, el elegido en el menú o el predeterminado.
+        """
+        dispositivo = self.dispositivo if dispositivo is None else dispositivo
+        if dispositivo is not None:
+            if dispositivo not in self.microfonos:
+                self.listar_microfonos()
+            micro = self.microfonos.get(dispositivo)
+            if micro is None:
+                raise ValueError(f"Micrófono {dispositivo} no encontrado")
+            return micro['indice'], micro['rate'], micro['canales']
+        info = self.audio.get_default_input_device_info()
+        return None, int(info.get('defaultSampleRate') or self.RATE), int(info.get('maxInputChannels') or 1)
+    
     def grabar_audio(self):
         """Graba audio del micrófono."""
         print(Colors.YELLOW + "\n🎤 Grabando... HABLA AHORA" + Colors.END)
         print("   (Di algo como: 'Hola, me siento bien' o 'Estoy muy nervioso')")
         
-        # Abrir stream de audio
+        # Abrir stream de audio en el formato nativo del micrófono
+        indice, rate, canales = self._formato_dispositivo()
+        chunk = max(1, self.CHUNK * rate // self.RATE)
         stream = self.audio.open(
             format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
+            channels=canales,
+            rate=rate,
             input=True,
-            frames_per_buffer=self.CHUNK
+            input_device_index=indice,
+            frames_per_buffer=chunk
         )
+        # Varios micrófonos: se conservan los canales salvo en modo 'mezcla'
+        multicanal = canales > 1 and self.FUSION_CANALES != 'mezcla'
+        remuestreador = RemuestreadorPolifasico(rate, self.RATE, canales if multicanal else 1)
         
-        frames = []
+        num_bloques = int(self.RATE / self.CHUNK * self.RECORD_SECONDS)
+        audio_data = np.empty((num_bloques * self.CHUNK,) + ((canales,) if multicanal else ()),
+                              dtype=np.int16)
+        escritas = 0
         
         # Grabar durante 3 segundos con indicador visual
-        for i in range(0, int(self.RATE / self.CHUNK * self.RECORD_SECONDS)):
-            data = stream.read(self.CHUNK, exception_on_overflow=False)
-            frames.append(data)
+        for i in range(0, num_bloques):
+            data = stream.read(chunk, exception_on_overflow=False)
+            bloque = np.frombuffer(data, dtype=np.int16)
+            if canales > 1:
+                bloque = bloque.reshape(-1, canales)
+                if not multicanal:
+                    bloque = bloque.mean(axis=1, dtype=np.float32)
+            bloque = a_int16(remuestreador.procesar(bloque))
+            n = min(len(bloque), len(audio_data) - escritas)
+            audio_data[escritas:escritas + n] = bloque[:n]
+            escritas += n
             
             # Indicador visual de grabación
             if i % 4 == 0:
@@ -91,77 +178,183 @@ class AnalizadorVozSimple:
         stream.stop_stream()
         stream.close()
         
-        # Convertir a numpy array
-        audio_data = np.frombuffer(b''.join(frames), dtype=np.int16)
-        
-        return audio_data
+        # (canales × muestras) con varios micrófonos; 1-D con uno
+        return audio_data[:escritas].T
     
-    def analizar_audio(self, audio_data):
+    def iniciar_captura_continua(self, dispositivo=None):
+        """Abre un stream persistente que alimenta el buffer circular."""
+        indice, rate, canales = self._formato_dispositivo(dispositivo)
+        captura = CapturaContinua(
+            self.audio,
+            rate=self.RATE,
+            chunk=self.CHUNK,
+            ventana_seg=self.VENTANA_SEGUNDOS,
+            salto_seg=self.SALTO_SEGUNDOS,
+            dispositivo=indice,
+            rate_dispositivo=rate,
+            canales=canales,
+            mezclar=self.FUSION_CANALES == 'mezcla'
+        )
+        return captura.iniciar()
+    
+    def analisis_continuo(self, captura, suavizar=True):
+        """
+        Analiza ventanas deslizantes del stream continuo (generador).
+        Con `suavizar` el riesgo mostrado pasa por histéresis; la emoción y
+        el riesgo de la ventana quedan en 'emocion_ventana' / 'riesgo_ventana'.
+        """
+        suavizador = SuavizadorRiesgo() if suavizar else None
+        self.stft.reiniciar()  # Stream nuevo: la primera ventana se transforma completa
+        perdidas = captura.ventanas_perdidas
+        for ventana in captura.ventanas():
+            # Si la captura saltó ventanas, lo que queda en el anillo STFT es
+            # de antes del hueco: la ventana se analiza completa, sin traslape
+            avance = self.SALTO_SEGUNDOS if captura.ventanas_perdidas == perdidas else None
+            perdidas = captura.ventanas_perdidas
+            resultado = self.analizar_audio(ventana, avance_seg=avance)
+            if suavizador:
+                resultado['emocion_ventana'] = resultado['emocion']
+                resultado['riesgo_ventana'] = resultado['riesgo']
+                resultado['emocion'], resultado['riesgo'], resultado['explicacion'] = suavizador.actualizar(
+                    resultado['riesgo'], (resultado['emocion'], resultado['riesgo'], resultado['explicacion']))
+            yield resultado
+    
+    def analizar_audio(self, audio_data, avance_seg=None):
         """
         Analiza el audio grabado y detecta emoción.
         Usa análisis simplificado sin librerías complejas.
+        Acepta un arreglo 1-D o un bloque (canales × muestras) de varios
+        micrófonos, que se reduce a una sola voz antes de clasificar.
         """
         
-        # 1. VOLUMEN (intensidad del audio)
-        volumen_promedio = np.mean(np.abs(audio_data))
-        volumen_max = np.max(np.abs(audio_data))
-        
-        # 2. VARIABILIDAD (cuánto cambia el volumen)
-        variabilidad = np.std(audio_data)
-        
-        # 3. CRUCES POR CERO (indica frecuencia aproximada)
-        cruces_cero = np.sum(np.diff(np.sign(audio_data)) != 0)
-        frecuencia_aprox = (cruces_cero / len(audio_data)) * self.RATE / 2
-        
-        # 4. ENERGÍA
-        energia = np.sum(audio_data.astype(float) ** 2) / len(audio_data)
+        # Sin voz (cabina vacía o en silencio): no se extraen métricas.
+        # Con un solo micrófono la energía del VAD sale de la STFT; un bloque
+        # de varios micrófonos usa la trama más fuerte de todos los canales
+        audio_data = np.asarray(audio_data)
+        if audio_data.ndim > 1:
+            espectros = None
+            actividad = self.vad.procesar(audio_data, avance_seg)
+        else:
+            espectros = self._espectros(audio_data, avance_seg)
+            potencia = energia(espectros['potencia'], self.stft.plan) / self.stft.plan.tam_trama
+            actividad = self.vad.procesar_db(potencia_db(potencia), avance_seg)
+        if not actividad['voz']:
+            return self._resultado_sin_voz(actividad)
+        
+        # Todas las métricas salen de los arreglos por trama (una sola pasada,
+        # todos los canales a la vez); luego se elige o fusiona el canal
+        if audio_data.ndim > 1:
+            por_canal = metricas_canales(audio_data, self.RATE)
+            m = fusionar_metricas(por_canal, self.FUSION_CANALES)
+            # Espectro solo del canal elegido (o el de más voz si se promedia)
+            canal = m['canal'] if m['canal'] is not None else int(np.argmax(por_canal['peso']))
+            espectros = self.stft.analizar(self._a_float(audio_data[canal]))
+        else:
+            m = metricas_ventana(audio_data, self.RATE)
+        potencia = espectros['potencia']
+        centroide_hz = float(centroide(potencia.sum(axis=0, keepdims=True), self.stft.plan)[0]) if len(potencia) else 0.0
         
-        # 5. PAUSAS (detectar silencios)
-        umbral_silencio = volumen_promedio * 0.3
-        es_silencio = np.abs(audio_data) < umbral_silencio
-        num_silencios = np.sum(np.diff(es_silencio.astype(int)) != 0) / 2
+        volumen_promedio = m['volumen']      # 1. VOLUMEN (intensidad del audio)
+        variabilidad = m['variabilidad']     # 2. VARIABILIDAD (cuánto cambia el volumen)
+        frecuencia_aprox = m['frecuencia']   # 3. CRUCES POR CERO (frecuencia aproximada)
+        num_silencios = m['pausas']          # 4. PAUSAS reales (silencios >= 0.15 s)
+        duracion_pausas = m['duracion_pausas']  # ... y cuánto duran en total (lo que se clasifica)
         
         # CLASIFICACIÓN DE EMOCIÓN
-        emocion, riesgo, explicacion = self._clasificar_emocion(
-            volumen_promedio, variabilidad, frecuencia_aprox, num_silencios
-        )
+        valores = (volumen_promedio, variabilidad, frecuencia_aprox, duracion_pausas)
+        emocion, riesgo, explicacion = self._clasificar_emocion(*valores)
+        personalizado = self.PERSONALIZAR and self.linea_base.lista
+        if personalizado:
+            # Contra la voz de la persona; una crisis o depresión en valores absolutos se respeta
+            emocion_z, riesgo_z, explicacion_z = self._clasificar_emocion(*self.linea_base.normalizar(valores))
+            if riesgo not in RIESGOS_GRAVES:
+                emocion, riesgo, explicacion = emocion_z, riesgo_z, explicacion_z
+        if self.PERSONALIZAR and riesgo not in RIESGOS_GRAVES:
+            # Crisis y depresión no entran a la base: no se vuelven "normales"
+            self.linea_base.actualizar(valores)
         
         return {
             'emocion': emocion,
             'riesgo': riesgo,
             'confianza': 0.85,  # Simplificado
             'explicacion': explicacion,
+            'personalizado': personalizado,
             'metricas': {
                 'volumen': volumen_promedio,
-                'volumen_max': volumen_max,
+                'volumen_max': m['volumen_max'],
                 'variabilidad': variabilidad,
                 'frecuencia': frecuencia_aprox,
-                'energia': energia,
-                'pausas': num_silencios
+                'energia': m['energia'],
+                'pausas': num_silencios,
+                'duracion_pausas': duracion_pausas,
+                'ratio_habla': m['ratio_habla'],
+                'centroide': centroide_hz
+            },
+            'canal': m.get('canal')
+        }
+    
+    def _a_float(self, audio):
+        """int16 (o float) → float32 en [-1, 1], como lo espera la STFT."""
+        audio = np.asarray(audio)
+        if audio.dtype == np.int16:
+            return audio.astype(np.float32) / 32768.0
+        return audio.astype(np.float32, copy=False)
+    
+    def _espectros(self, audio, avance_seg=None):
+        """
+        Tramas STFT de la ventana. Sin `avance_seg` se transforma la ventana
+        completa; con ventanas traslapadas solo los últimos `avance_seg`
+        segundos (el resto ya está en el anillo del frente).
+        """
+        x = self._a_float(audio)
+        if self.stft.tramas_para(len(x)) > self.stft.max_tramas:
+            return self.stft.analizar(x)  # Ventana más larga que el anillo
+        if avance_seg is None or self.stft.total == 0:
+            self.stft.reiniciar()
+            self.stft.agregar(x)
+        else:
+            self.stft.agregar(x[-int(avance_seg * self.RATE):])
+        return self.stft.ultimas(self.stft.tramas_para(len(x)))
+    
+    def _resultado_sin_voz(self, actividad):
+        """Resultado barato para una ventana que el VAD descartó."""
+        return {
+            'emocion': 'sin_voz',
+            'riesgo': 'normal',
+            'confianza': 0.85,  # Simplificado
+            'explicacion': f"Sin voz detectada (ruido de fondo {actividad['piso_db']} dB)",
+            'metricas': {
+                'volumen': 0.0,
+                'volumen_max': 0.0,
+                'variabilidad': 0.0,
+                'frecuencia': 0.0,
+                'energia': 0.0,
+                'pausas': 0,
+                'duracion_pausas': 0.0,
+                'ratio_habla': actividad['ratio_voz'],
+                'centroide': 0.0
             }
         }
     
-    def _clasificar_emocion(self, volumen, variabilidad, frecuencia, pausas):
-        """Clasifica la emoción basándose en las métricas."""
-        
-        # DEPRESIÓN: Volumen muy bajo, poca variabilidad, muchas pausas
-        if volumen < self.umbral_volumen_bajo and variabilidad < 1000 and pausas > 5:
-            return 'depresion', 'alto', 'Voz muy baja y con muchas pausas'
-        
-        # ANSIEDAD: Volumen alto, mucha variabilidad, frecuencia alta
-        if volumen > self.umbral_volumen_alto and variabilidad > self.umbral_variabilidad_alta:
-            return 'ansiedad', 'medio', 'Voz intensa y con variabilidad alta'
-        
-        # TRISTEZA: Volumen bajo/medio, frecuencia baja
-        if volumen < 3000 and frecuencia < 150:
-            return 'tristeza', 'medio', 'Voz apagada y tono bajo'
-        
-        # CRISIS: Volumen MUY bajo + muchas pausas
-        if volumen < 800 and pausas > 8:
-            return 'crisis', 'critico', 'Señales críticas: voz muy débil con pausas largas'
-        
-        # ESTABLE: Todo en rangos normales
-        return 'estable', 'normal', 'Parámetros de voz en rango normal'
+    def _tabla(self):
+        """Tabla de reglas compilada con los umbrales actuales del analizador."""
+        umbrales = {nombre: getattr(self, nombre) for nombre in UMBRALES}
+        clave, tabla = self._tabla_compilada
+        if clave != umbrales:
+            tabla = TablaCompilada(umbrales=umbrales)
+            self._tabla_compilada = (umbrales, tabla)
+        return tabla
+    
+    def _clasificar_emocion(self, volumen, variabilidad, frecuencia, duracion_pausas):
+        """Clasifica la emoción basándose en las métricas (tabla de reglas de clasificador.py)."""
+        return self._tabla().clasificar((volumen, variabilidad, frecuencia, duracion_pausas))
+    
+    def clasificar_lote(self, matriz):
+        """
+        Clasifica muchas ventanas en una sola llamada. `matriz` es
+        (ventanas × CARACTERISTICAS); regresa (emociones, riesgos, explicaciones).
+        """
+        return self._tabla().clasificar_lote(matriz)
     
     def mostrar_resultado(self, resultado):
         """Muestra el resultado del análisis."""
@@ -197,11 +390,22 @@ class AnalizadorVozSimple:
         print(f"   Variabilidad: {m['variabilidad']:.0f}")
         print(f"   Frecuencia aproximada: {m['frecuencia']:.0f} Hz")
         print(f"   Energía: {m['energia']:.0f}")
-        print(f"   Pausas detectadas: {m['pausas']:.0f}")
+        print(f"   Pausas detectadas: {m['pausas']:.0f} ({m['duracion_pausas']:.2f} s en total)")
+        print(f"   Ratio de habla: {m['ratio_habla']*100:.0f}%")
+        print(f"   Centroide espectral: {m['centroide']:.0f} Hz")
         
         # Protocolo de respuesta
         self._mostrar_protocolo(resultado)
     
+    def mostrar_resultado_breve(self, resultado):
+        """Muestra una línea por ventana durante el monitoreo continuo."""
+        colores = {'critico': Colors.RED, 'alto': Colors.YELLOW, 'medio': Colors.BLUE}
+        color = colores.get(resultado['riesgo'], Colors.GREEN)
+        m = resultado['metricas']
+        print(f"   [{datetime.now().strftime('%H:%M:%S')}] "
+              f"{color}{resultado['emocion'].upper():<10} {resultado['riesgo'].upper():<8}{Colors.END} "
+              f"vol={m['volumen']:.0f} frec={m['frecuencia']:.0f}Hz pausas={m['pausas']:.0f}")
+    
     def _mostrar_protocolo(self, resultado):
         """Muestra el protocolo de respuesta según el estado."""
         
@@ -262,7 +466,8 @@ class AnalizadorVozSimple:
     
     def cerrar(self):
         """Cierra el analizador."""
-        self.audio.terminate()
+        if self.audio:
+            self.audio.terminate()
         print(Colors.GREEN + "\n✓ Analizador cerrado" + Colors.END)
 
 
@@ -286,8 +491,9 @@ def menu_principal():
     print("  1. Analizar mi voz AHORA (demo individual)")
     print("  2. Sesión completa (5 análisis seguidos)")
     print("  3. Probar emergencia (habla muy bajito)")
-    print("  4. Ver mis micrófonos")
-    print("  5. Salir")
+    print("  4. Ver / elegir micrófono")
+    print("  5. Monitoreo continuo (ventanas deslizantes)")
+    print("  6. Salir")
     print()
 
 
@@ -320,7 +526,7 @@ def main():
         menu_principal()
         
         try:
-            opcion = input("Selecciona una opción (1-5): ").strip()
+            opcion = input("Selecciona una opción (1-6): ").strip()
             
             if opcion == '1':
                 # Análisis individual
@@ -383,7 +589,7 @@ def main():
                 print("Para simular una emergencia:")
                 print("  • Habla MUY bajito (casi susurrando)")
                 print("  • Haz pausas largas entre palabras")
-                print("  • O simplemente quédate en silencio")
+                print("  (el silencio total se reporta como 'sin voz')")
                 print()
                 input("Presiona ENTER cuando estés listo...")
                 
@@ -394,11 +600,42 @@ def main():
                 input("\nPresiona ENTER para continuar...")
                 
             elif opcion == '4':
-                # Listar micrófonos
-                analizador.listar_microfonos()
-                input("\nPresiona ENTER para continuar...")
+                # Listar y elegir micrófono
+                micros = analizador.listar_microfonos()
+                eleccion = input("\nNúmero de micrófono a usar (ENTER = sin cambio): ").strip()
+                if eleccion.isdigit() and int(eleccion) in micros:
+                    analizador.dispositivo = int(eleccion)
+                    print(Colors.GREEN + f"✓ Usando [{eleccion}] {analizador.microfonos[int(eleccion)]['nombre']}" + Colors.END)
+                elif eleccion:
+                    print(Colors.RED + "✗ Micrófono no válido" + Colors.END)
                 
             elif opcion == '5':
+                # Monitoreo continuo sin huecos entre ventanas
+                print(Colors.HEADER + "\n▶ MONITOREO CONTINUO\n" + Colors.END)
+                print(f"Ventana de {analizador.VENTANA_SEGUNDOS}s, "
+                      f"un resultado cada {analizador.SALTO_SEGUNDOS}s.")
+                print("Presiona Ctrl+C para volver al menú.")
+                print()
+                
+                captura = analizador.iniciar_captura_continua()
+                riesgo_anterior = None
+                try:
+                    for resultado in analizador.analisis_continuo(captura):
+                        if resultado['riesgo'] != riesgo_anterior and resultado['riesgo'] != 'normal':
+                            analizador.mostrar_resultado(resultado)
+                        else:
+                            analizador.mostrar_resultado_breve(resultado)
+                        riesgo_anterior = resultado['riesgo']
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    captura.detener()
+                
+                if captura.ventanas_perdidas:
+                    print(Colors.YELLOW + f"\n⚠️  Ventanas omitidas por retraso: {captura.ventanas_perdidas}" + Colors.END)
+                print(Colors.GREEN + "\n✓ Monitoreo detenido" + Colors.END)
+                
+            elif opcion == '6':
                 # Salir
                 print(Colors.GREEN + "\n✓ Gracias por probar el sistema" + Colors.END)
                 print(Colors.BOLD + "\nCabinas Anti-suicidio" + Colors.END)
@@ -0,0 +1,206 @@
+"""
+FRENTE STFT COMPARTIDO
+Una sola transformada por salto para todas las características espectrales.
+Cada trama (tam_trama muestras, avance de `salto`) se transforma una vez con
+rfft sobre float32 (nfft y ventana fijos, en caché) y se guarda su espectro
+de potencia; de ahí salen:
+  - energía por trama (Parseval) → VAD
+  - autocorrelación (irfft de la potencia) → tono por YIN
+  - flujo espectral → envolvente de inicios y tempo
+  - centroide, planitud y MFCC → características espectrales nuevas
+En streaming (`FrenteSTFT.agregar`) solo se transforman las tramas que
+completa el audio nuevo y el resto se lee del anillo: con ventanas
+traslapadas (3 s cada 0.5 s) cada análisis transforma 0.5 s, no 3 s.
+"""
+
+import numpy as np
+
+from caracteristicas import enmarcar
+
+MAX_TRAMAS = 512   # Tramas que conserva el anillo (~5 s con salto de 10 ms)
+N_MEL = 26
+N_MFCC = 13
+
+
+class PlanSTFT:
+    """
+    Lo que no cambia entre tramas: nfft, ventana, frecuencias y bancos de
+    filtros, calculados una sola vez. Con `bordes` > 0 guarda además las
+    sumas acumuladas de energía en los extremos de cada trama (lo que YIN
+    necesita para las energías desplazadas hasta ese retardo).
+    """
+
+    def __init__(self, rate, tam_trama, salto, nfft=None, ventana='rect', bordes=0):
+        self.rate = rate
+        self.tam_trama = tam_trama
+        self.salto = salto
+        self.nfft = nfft or 1 << (tam_trama - 1).bit_length()
+        if self.nfft < tam_trama:
+            raise ValueError(f"nfft ({self.nfft}) menor que la trama ({tam_trama})")
+        if ventana not in ('rect', 'hann'):
+            raise ValueError(f"Ventana no soportada: {ventana!r}")
+        # Rectangular por defecto: la autocorrelación de YIN no lleva ventana
+        self.ventana = np.hanning(tam_trama + 1)[:-1].astype(np.float32) if ventana == 'hann' else None
+        self.bordes = bordes
+        self.bins = self.nfft // 2 + 1
+        self.frecuencias = np.fft.rfftfreq(self.nfft, 1.0 / rate).astype(np.float32)
+
+        # Parseval: energía de la trama = potencia ponderada / nfft. Con
+        # ventana se divide entre mean(w²) (0.375 en Hann): sin eso la
+        # energía, y el VAD que la usa, queda ~4.3 dB abajo de la del tiempo
+        self.pesos_energia = np.full(self.bins, 2.0 / self.nfft, dtype=np.float32)
+        self.pesos_energia[0] = 1.0 / self.nfft
+        if self.nfft % 2 == 0:
+            self.pesos_energia[-1] = 1.0 / self.nfft
+        if self.ventana is not None:
+            self.pesos_energia /= np.mean(self.ventana.astype(np.float64) ** 2)
+        self._mel = {}
+
+    def transformar(self, tramas):
+        """Espectro de potencia (tramas x bins) float32 de un arreglo de tramas."""
+        x = tramas if self.ventana is None else tramas * self.ventana
+        espectro = np.fft.rfft(x, n=self.nfft, axis=-1)
+        return (espectro.real ** 2 + espectro.imag ** 2).astype(np.float32)
+
+    def energia_bordes(self, tramas):
+        """
+        Energía acumulada en los extremos: inicio[t, k] = suma de x² de las
+        primeras k muestras (k = 0..bordes) y fin[t, k] = de las primeras
+        tam_trama - bordes + k.
+        """
+        n, b = len(tramas), self.bordes
+        acumulada = np.cumsum(tramas * tramas, axis=1, dtype=np.float32)
+        inicio = np.zeros((n, b + 1), dtype=np.float32)
+        inicio[:, 1:] = acumulada[:, :b]
+        return inicio, acumulada[:, self.tam_trama - b - 1:]
+
+    def banco_mel(self, n_mel=N_MEL, fmin=60.0, fmax=None):
+        """Filtros triangulares en escala mel (n_mel x bins), en caché."""
+        clave = ('mel', n_mel, fmin, fmax)
+        if clave not in self._mel:
+            fmax = fmax or self.rate / 2
+            a_mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+            puntos = 700.0 * (10 ** (np.linspace(a_mel(fmin), a_mel(fmax), n_mel + 2) / 2595.0) - 1.0)
+            izq, centro, der = puntos[:-2, None], puntos[1:-1, None], puntos[2:, None]
+            f = self.frecuencias[None, :]
+            subida = (f - izq) / np.maximum(centro - izq, 1e-9)
+            bajada = (der - f) / np.maximum(der - centro, 1e-9)
+            self._mel[clave] = np.maximum(0.0, np.minimum(subida, bajada)).astype(np.float32)
+        return self._mel[clave]
+
+    def dct(self, n_mel=N_MEL, n_coef=N_MFCC):
+        """Matriz DCT-II ortonormal (n_coef x n_mel), en caché."""
+        clave = ('dct', n_mel, n_coef)
+        if clave not in self._mel:
+            k = np.arange(n_coef)[:, None]
+            m = np.arange(n_mel)[None, :]
+            matriz = np.cos(np.pi * k * (2 * m + 1) / (2 * n_mel)) * np.sqrt(2.0 / n_mel)
+            matriz[0] /= np.sqrt(2.0)
+            self._mel[clave] = matriz.astype(np.float32)
+        return self._mel[clave]
+
+    def espectros(self, tramas):
+        """Dict de la trama: 'potencia' y, con bordes, 'inicio' / 'fin'."""
+        resultado = {'potencia': self.transformar(tramas)}
+        if self.bordes:
+            resultado['inicio'], resultado['fin'] = self.energia_bordes(tramas)
+        return resultado
+
+
+class FrenteSTFT:
+    """
+    STFT con estado para un stream (una instancia por cabina o analizador).
+    `agregar` transforma las tramas nuevas y las guarda en un anillo;
+    `ultimas` las entrega a quien las necesite sin volver a transformar.
+    `analizar` procesa una señal completa sin tocar el estado.
+    """
+
+    def __init__(self, rate=16000, tam_trama=400, salto=160, nfft=None, ventana='rect',
+                 bordes=0, max_tramas=MAX_TRAMAS):
+        self.plan = PlanSTFT(rate, tam_trama, salto, nfft, ventana, bordes)
+        self.max_tramas = max_tramas
+        self._anillo = {'potencia': np.zeros((max_tramas, self.plan.bins), dtype=np.float32)}
+        if bordes:
+            self._anillo['inicio'] = np.zeros((max_tramas, bordes + 1), dtype=np.float32)
+            self._anillo['fin'] = np.zeros((max_tramas, bordes + 1), dtype=np.float32)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el audio pendiente y las tramas guardadas (ej. tras un salto en el stream)."""
+        self._cola = np.zeros(0, dtype=np.float32)
+        self.total = 0   # Tramas transformadas desde el inicio
+
+    @property
+    def disponibles(self):
+        return min(self.total, self.max_tramas)
+
+    def tramas_para(self, muestras):
+        """Tramas completas en una señal de `muestras` de largo."""
+        if muestras < self.plan.tam_trama:
+            return 0
+        return 1 + (muestras - self.plan.tam_trama) // self.plan.salto
+
+    def analizar(self, x):
+        """Todas las tramas de una señal 1-D (una sola llamada a rfft), sin estado."""
+        tramas = enmarcar(np.asarray(x, dtype=np.float32), self.plan.tam_trama, self.plan.salto)
+        return self.plan.espectros(tramas)
+
+    def agregar(self, muestras):
+        """Transforma solo las tramas que completa el audio nuevo. Regresa cuántas son."""
+        datos = np.concatenate([self._cola, np.asarray(muestras, dtype=np.float32).reshape(-1)])
+        tramas = enmarcar(datos, self.plan.tam_trama, self.plan.salto)
+        n = len(tramas)
+        if n:
+            nuevas = self.plan.espectros(tramas[-self.max_tramas:])
+            posiciones = (self.total + n - len(nuevas['potencia']) + np.arange(len(nuevas['potencia']))) % self.max_tramas
+            for clave, valores in nuevas.items():
+                self._anillo[clave][posiciones] = valores
+            self.total += n
+        # Lo que queda pendiente empieza donde empezaría la siguiente trama
+        self._cola = datos[n * self.plan.salto:].copy()
+        return n
+
+    def ultimas(self, n):
+        """Copia de las últimas `n` tramas (o las disponibles), de la más vieja a la más nueva."""
+        n = min(n, self.disponibles)
+        posiciones = (self.total - n + np.arange(n)) % self.max_tramas
+        return {clave: valores[posiciones] for clave, valores in self._anillo.items()}
+
+
+# ============================================================================
+# CARACTERÍSTICAS A PARTIR DE LA POTENCIA
+# ============================================================================
+
+def energia(potencia, plan):
+    """Suma de x² de cada trama (Parseval, compensada por la ventana), sin volver al tiempo."""
+    return potencia @ plan.pesos_energia
+
+
+def autocorrelacion(potencia, plan, max_retardo):
+    """r(τ) de cada trama para τ = 0..max_retardo (sin aliasing si nfft >= trama + max_retardo)."""
+    return np.fft.irfft(potencia, n=plan.nfft, axis=-1)[:, :max_retardo + 1]
+
+
+def flujo(potencia):
+    """Flujo espectral: subida de la log-potencia entre tramas consecutivas (envolvente de inicios)."""
+    if len(potencia) < 2:
+        return np.zeros(0, dtype=np.float32)
+    log = np.log1p(potencia)
+    return np.maximum(np.diff(log, axis=0), 0.0).sum(axis=1)
+
+
+def centroide(potencia, plan):
+    """Centroide espectral (Hz) de cada trama."""
+    return (potencia @ plan.frecuencias) / np.maximum(potencia.sum(axis=1), 1e-12)
+
+
+def planitud(potencia):
+    """Planitud espectral (0 = tonal, 1 = ruido) de cada trama."""
+    log_media = np.log(potencia + 1e-12).mean(axis=1)
+    return np.exp(log_media) / np.maximum(potencia.mean(axis=1), 1e-12)
+
+
+def mfcc(potencia, plan, n_coef=N_MFCC, n_mel=N_MEL):
+    """Coeficientes cepstrales en escala mel (tramas x n_coef)."""
+    mel = potencia @ plan.banco_mel(n_mel).T
+    return np.log(mel + 1e-10) @ plan.dct(n_mel, n_coef).T
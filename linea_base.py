@@ -0,0 +1,140 @@
+"""
+LÍNEA BASE DE LA VOZ POR SESIÓN
+Los umbrales del clasificador son absolutos: una persona de voz baja o tono
+grave cae siempre en "tristeza" o "depresión". Aquí se lleva, por sesión,
+la media y la varianza de cada característica con una actualización
+incremental O(1) por ventana (Welford al inicio, exponencial después de
+`memoria` ventanas para seguir cambios lentos), sin volver a recorrer el
+historial. Con la línea base lista, cada valor se expresa como z-score
+contra la voz de la persona y se lleva a la escala de la voz de referencia
+con la que se afinaron los umbrales:
+
+    x' = media_ref + desviacion_ref * (x - media) / desviacion
+
+así la misma tabla de reglas clasifica "lo inusual para esta persona".
+El estado completo son tres números por característica (como_dict).
+
+Para que un estado sostenido (ej. una depresión toda la sesión) no se vuelva
+"la voz normal" de la persona: las ventanas de riesgo alto o crítico
+(RIESGOS_GRAVES) se clasifican con los valores absolutos y no actualizan la
+base (lo aplica quien llama), y la
+normalización mueve cada valor a lo más MAX_DESPLAZAMIENTO desviaciones de
+referencia.
+"""
+
+import math
+
+MEMORIA_VENTANAS = 300   # ~15 min con ventanas de 3 s: después, promedio exponencial
+MIN_VENTANAS = 10        # Ventanas antes de personalizar (antes se usan los valores crudos)
+PISO_DESVIACION = 0.1    # Desviación mínima, relativa a la de referencia (voz muy constante)
+MAX_DESPLAZAMIENTO = 1.0  # Cuánto puede mover la normalización un valor (desviaciones de referencia)
+RIESGOS_GRAVES = ('alto', 'critico')   # Se respetan en valores absolutos y no entran a la base
+
+
+class LineaBase:
+    """
+    Media y varianza en línea de cada característica de `referencia`
+    ({nombre: (media, desviación)} de la voz de referencia). En las
+    características de `opcionales` un 0 significa "no medido" (ej. tono
+    sin tramas sonoras): no actualiza ni se normaliza.
+    """
+
+    def __init__(self, referencia, memoria=MEMORIA_VENTANAS, min_ventanas=MIN_VENTANAS,
+                 opcionales=(), max_desplazamiento=MAX_DESPLAZAMIENTO):
+        self.referencia = dict(referencia)
+        self.nombres = tuple(self.referencia)
+        self.memoria = memoria
+        self.min_ventanas = min_ventanas
+        self.opcionales = set(opcionales)
+        self.max_desplazamiento = max_desplazamiento
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida la voz aprendida (ej. al empezar otra sesión o archivo)."""
+        k = len(self.nombres)
+        self.n = [0] * k
+        self.media = [0.0] * k
+        self.varianza = [0.0] * k
+        self.actualizaciones = 0
+
+    @property
+    def lista(self):
+        """True cuando todas las características obligatorias tienen suficientes ventanas."""
+        return all(n >= self.min_ventanas for nombre, n in zip(self.nombres, self.n)
+                   if nombre not in self.opcionales)
+
+    def _vector(self, valores):
+        """Acepta un dict por nombre o una secuencia en el orden de `nombres`."""
+        if hasattr(valores, 'get'):
+            return [valores.get(nombre) for nombre in self.nombres]
+        return list(valores)
+
+    def _medido(self, i, x):
+        return x is not None and not (self.nombres[i] in self.opcionales and x == 0)
+
+    def actualizar(self, valores):
+        """
+        Agrega una ventana: O(1) por característica, sin guardar el historial.
+        Quien llama omite las ventanas de RIESGOS_GRAVES.
+        """
+        for i, x in enumerate(self._vector(valores)):
+            if not self._medido(i, x):
+                continue
+            self.n[i] += 1
+            # 1/n es Welford exacto; el piso 1/memoria lo vuelve exponencial
+            a = max(1.0 / self.n[i], 1.0 / self.memoria)
+            delta = float(x) - self.media[i]
+            self.media[i] += a * delta
+            self.varianza[i] = (1.0 - a) * (self.varianza[i] + a * delta * delta)
+        self.actualizaciones += 1
+
+    def _desviacion(self, i):
+        piso = PISO_DESVIACION * self.referencia[self.nombres[i]][1]
+        return max(math.sqrt(self.varianza[i]), piso, 1e-12)
+
+    def z(self, valores):
+        """z-score de cada característica contra la línea base (None si aún no hay base)."""
+        return [(float(x) - self.media[i]) / self._desviacion(i)
+                if self._medido(i, x) and self.n[i] >= self.min_ventanas else None
+                for i, x in enumerate(self._vector(valores))]
+
+    def normalizar(self, valores):
+        """
+        Lleva los valores a la escala de la voz de referencia. Regresa el mismo
+        tipo que recibe (dict con el resto de las llaves intacto, o tupla);
+        lo que aún no tiene base queda crudo. Cada valor se mueve a lo más
+        `max_desplazamiento` desviaciones de referencia de su valor crudo.
+        """
+        crudos = self._vector(valores)
+        escalados = {}
+        for nombre, x, z in zip(self.nombres, crudos, self.z(valores)):
+            if z is None:
+                continue
+            media_ref, desviacion_ref = self.referencia[nombre]
+            limite = self.max_desplazamiento * desviacion_ref
+            x = float(x)
+            escalados[nombre] = min(max(media_ref + desviacion_ref * z, x - limite), x + limite)
+        if hasattr(valores, 'get'):
+            return {**valores, **escalados}
+        return tuple(escalados.get(nombre, x) for nombre, x in zip(self.nombres, valores))
+
+    def como_dict(self):
+        """Estado compacto para guardar con la sesión."""
+        return {
+            'n': list(self.n),
+            'media': [round(m, 6) for m in self.media],
+            'varianza': [round(v, 6) for v in self.varianza],
+            'caracteristicas': list(self.nombres)
+        }
+
+    def cargar(self, datos):
+        """Restaura un estado de como_dict (las características que ya no existen se ignoran)."""
+        self.reiniciar()
+        posicion = {nombre: i for i, nombre in enumerate(datos.get('caracteristicas', self.nombres))}
+        for i, nombre in enumerate(self.nombres):
+            j = posicion.get(nombre)
+            if j is not None:
+                self.n[i] = int(datos['n'][j])
+                self.media[i] = float(datos['media'][j])
+                self.varianza[i] = float(datos['varianza'][j])
+        return self
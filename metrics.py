@@ -0,0 +1,307 @@
+"""
+MÉTRICAS DE OPERACIÓN (instrumentación de rutas calientes)
+Contadores e histogramas con reloj monotónico para cada etapa del análisis
+(captura, características, clasificación, add_state, emisión por socket.io,
+escrituras a disco). Cada hilo escribe solo en su propio shard, así medir no
+toma candados; los shards se suman únicamente al exportar en formato de
+texto de Prometheus (/metrics). Incluye un perfilador por muestreo opcional
+que junta pilas de todos los hilos en formato "folded" (flamegraph).
+"""
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _StackCounter
+
+# Límites de los buckets de latencia (segundos)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_MAX_DEPTH = 64   # Cuadros por pila que guarda el perfilador
+
+
+class _Shards:
+    """
+    Un shard por hilo, creado la primera vez que ese hilo escribe.
+    Los de hilos terminados se acumulan en `retired` al leer, para que los
+    pipelines que se crean y destruyen por sesión no hagan crecer la lista.
+    """
+
+    def __init__(self, factory, merge):
+        self._factory = factory
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self.retired = factory()
+
+    def get(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._factory()
+            with self._lock:
+                self._live.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self):
+        """Shards actuales (el acumulado de hilos terminados va primero)."""
+        with self._lock:
+            alive = []
+            for thread, shard in self._live:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self.retired, shard)
+            self._live = alive
+            return [self.retired] + [shard for _, shard in alive]
+
+
+def _merge_lists(into, shard):
+    for i, value in enumerate(shard):
+        into[i] += value
+
+
+class Counter:
+    """Contador monotónico."""
+
+    kind = 'counter'
+
+    def __init__(self):
+        self._shards = _Shards(lambda: [0], _merge_lists)
+
+    def inc(self, amount=1):
+        self._shards.get()[0] += amount
+
+    @property
+    def value(self):
+        return sum(shard[0] for shard in self._shards.collect())
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos. El shard es una lista plana:
+    [conteo por bucket..., conteo +Inf, suma].
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        size = len(self.buckets) + 2
+        self._shards = _Shards(lambda: [0] * size, _merge_lists)
+
+    def observe(self, value):
+        shard = self._shards.get()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def time(self):
+        """Context manager que observa la duración del bloque."""
+        return _Span(self)
+
+    def totals(self):
+        """Regresa (conteos por bucket, suma) sumando todos los shards."""
+        merged = [0] * (len(self.buckets) + 2)
+        for shard in self._shards.collect():
+            _merge_lists(merged, shard)
+        return merged[:-1], merged[-1]
+
+    @property
+    def count(self):
+        return sum(self.totals()[0])
+
+    def samples(self, name, labels):
+        counts, total = self.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            yield name + '_bucket', labels + (('le', _format_value(bound)),), cumulative
+        yield name + '_sum', labels, total
+        yield name + '_count', labels, cumulative
+
+
+class Gauge:
+    """Valor instantáneo que se calcula al exportar (función sin argumentos)."""
+
+    kind = 'gauge'
+
+    def __init__(self, func):
+        self.func = func
+
+    def samples(self, name, labels):
+        yield name, labels, self.func()
+
+
+class _Span:
+    """Mide un bloque con el reloj monotónico de alta resolución."""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+# ============================================================================
+# REGISTRO Y EXPORTACIÓN
+# ============================================================================
+
+def _format_value(value):
+    return value if isinstance(value, str) else repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Registry:
+    """
+    Familias de métricas por nombre; cada combinación de etiquetas es una
+    serie. Pedir dos veces la misma serie regresa el mismo objeto.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def _series(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help_text, {})
+            elif family[0] != kind:
+                raise ValueError(f"La métrica {name} ya existe como {family[0]}")
+            series = family[2].get(key)
+            if series is None:
+                series = family[2][key] = factory()
+            return series
+
+    def counter(self, name, help_text, **labels):
+        return self._series('counter', name, help_text, labels, Counter)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, **labels):
+        return self._series('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name, help_text, func, **labels):
+        return self._series('gauge', name, help_text, labels, lambda: Gauge(func))
+
+    def render(self):
+        """Todas las series en formato de texto de Prometheus 0.0.4."""
+        with self._lock:
+            families = sorted((name, kind, help_text, list(series.items()))
+                              for name, (kind, help_text, series) in self._families.items())
+
+        lines = []
+        for name, kind, help_text, series in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                try:
+                    samples = list(metric.samples(name, labels))
+                except Exception:
+                    continue  # Un gauge que falla no tumba la exportación
+                for sample_name, sample_labels, value in samples:
+                    if sample_labels:
+                        text = ','.join(f'{k}="{_escape(v)}"' for k, v in sample_labels)
+                        sample_name = f"{sample_name}{{{text}}}"
+                    lines.append(f"{sample_name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, **labels):
+    return REGISTRY.counter(name, help_text, **labels)
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS, **labels):
+    return REGISTRY.histogram(name, help_text, buckets, **labels)
+
+
+def gauge(name, help_text, func, **labels):
+    return REGISTRY.gauge(name, help_text, func, **labels)
+
+
+# Contadores de ventanas compartidos por el pipeline y el servidor
+WINDOWS_PROCESSED = counter('analysis_windows_processed_total', 'Ventanas que llegaron al envío')
+WINDOWS_DROPPED = counter('analysis_windows_dropped_total', 'Ventanas descartadas por colas llenas')
+WINDOWS_SILENT = counter('analysis_windows_silent_total', 'Ventanas sin voz detectada')
+
+
+# ============================================================================
+# PERFILADOR POR MUESTREO (opcional)
+# ============================================================================
+
+class SamplingProfiler:
+    """
+    Toma las pilas de todos los hilos cada `interval` segundos desde un hilo
+    propio (sys._current_frames) y cuenta cuántas veces aparece cada una.
+    Solo cuesta mientras está activo; no toca las rutas medidas.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = _StackCounter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            batch = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                batch.append(';'.join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(batch)
+                self.samples += 1
+
+    def folded(self, clear=False):
+        """Pilas en formato "folded" (una por línea: pila;pila;pila conteo)."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+            if clear:
+                self._stacks.clear()
+                self.samples = 0
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
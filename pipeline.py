@@ -0,0 +1,240 @@
+"""
+PIPELINE DE ANÁLISIS POR ETAPAS
+captura → características → clasificación → envío, cada etapa en su propio
+hilo y conectadas por colas acotadas. Si una etapa se atrasa, su cola
+descarta el elemento más viejo: la captura nunca se detiene y el
+rendimiento queda limitado por la etapa más lenta, no por la suma.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Empty(Exception):
+    """La cola no tuvo elementos dentro del tiempo de espera."""
+
+
+class DropOldestQueue:
+    """Cola acotada que, al llenarse, descarta el elemento más viejo."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """
+        Agrega un elemento sin bloquear. Regresa True si tuvo que descartar
+        el más viejo (el descartado puede ser None, no sirve para saberlo).
+        """
+        full = False
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                full = True
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if full and isinstance(dropped, Future):
+            dropped.cancel()
+        return full
+
+    def get(self, timeout=None):
+        """Saca el elemento más viejo; lanza Empty si vence el tiempo."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                raise Empty
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Contadores de una etapa (se escriben solo desde su hilo)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.histogram = metrics.histogram(
+            'pipeline_stage_seconds', 'Duración de cada etapa del pipeline de análisis', stage=name)
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def as_dict(self, queue=None):
+        data = {
+            'processed': self.processed,
+            'errors': self.errors,
+            'last_ms': round(self.last_seconds * 1000, 2),
+            'avg_ms': round(self.busy_seconds * 1000 / self.processed, 2) if self.processed else 0.0
+        }
+        if queue is not None:
+            data['queued'] = len(queue)
+            data['dropped'] = queue.dropped
+        return data
+
+
+class AnalysisPipeline:
+    """
+    Conecta una fuente con una serie de etapas.
+
+    source: función bloqueante que produce un elemento (ej. grabar 3 s).
+    stages: lista de (nombre, función, executor o None). Con executor, la
+            etapa envía el trabajo al pool y pasa el Future a la siguiente,
+            que lo resuelve en orden; así varias ventanas avanzan en paralelo.
+    sink:   función que recibe el resultado de la última etapa.
+    """
+
+    def __init__(self, name, source, stages, sink, queue_size=4):
+        self.name = name
+        self.source = source
+        self.stages = stages
+        self.sink = sink
+        self.queue_size = queue_size
+
+        self.stop_event = threading.Event()
+        self.queues = [DropOldestQueue(queue_size) for _ in range(len(stages) + 1)]
+        self.stats = [StageStats('capture')] + [StageStats(s[0]) for s in stages] + [StageStats('sink')]
+        self.threads = []
+
+    # ------------------------------------------------------------------
+
+    def _run_source(self):
+        stats = self.stats[0]
+        out = self.queues[0]
+        while not self.stop_event.is_set():
+            start = time.monotonic()
+            try:
+                item = self.source()
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error en captura ({self.name}): {e}")
+                self.stop_event.wait(1)
+                continue
+            if self.stop_event.is_set():
+                break
+            self._put(out, item)
+            self._account(stats, start)
+
+    def _run_stage(self, index):
+        name, func, executor = self.stages[index]
+        stats = self.stats[index + 1]
+        inbox = self.queues[index]
+        out = self.queues[index + 1]
+        while not self.stop_event.is_set():
+            try:
+                item = self._resolve(inbox.get(timeout=0.5))
+            except Empty:
+                continue
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error antes de la etapa {name} ({self.name}): {e}")
+                continue
+
+            start = time.monotonic()
+            try:
+                if executor:
+                    # El histograma mide el trabajo en el pool, no el envío
+                    self._put(out, executor.submit(self._timed, stats.histogram, func, item))
+                else:
+                    self._put(out, func(item))
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error en etapa {name} ({self.name}): {e}")
+                continue
+            self._account(stats, start, observe=executor is None)
+
+    def _run_sink(self):
+        stats = self.stats[-1]
+        inbox = self.queues[-1]
+        while not self.stop_event.is_set():
+            try:
+                item = self._resolve(inbox.get(timeout=0.5))
+            except Empty:
+                continue
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error en etapa previa al envío ({self.name}): {e}")
+                continue
+
+            start = time.monotonic()
+            try:
+                self.sink(item)
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error al enviar ({self.name}): {e}")
+                continue
+            self._account(stats, start)
+            metrics.WINDOWS_PROCESSED.inc()
+
+    @staticmethod
+    def _resolve(item):
+        return item.result() if isinstance(item, Future) else item
+
+    @staticmethod
+    def _put(queue, item):
+        if queue.put(item):
+            metrics.WINDOWS_DROPPED.inc()
+
+    @staticmethod
+    def _timed(histogram, func, item):
+        with histogram.time():
+            return func(item)
+
+    @staticmethod
+    def _account(stats, start, observe=True):
+        elapsed = time.monotonic() - start
+        stats.processed += 1
+        stats.busy_seconds += elapsed
+        stats.last_seconds = elapsed
+        if observe:
+            stats.histogram.observe(elapsed)
+
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arranca un hilo por etapa."""
+        targets = [('capture', self._run_source, ())]
+        targets += [(s[0], self._run_stage, (i,)) for i, s in enumerate(self.stages)]
+        targets.append(('sink', self._run_sink, ()))
+
+        for stage_name, target, args in targets:
+            thread = threading.Thread(target=target, args=args, daemon=True,
+                                      name=f"{self.name}-{stage_name}")
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        """Detiene todas las etapas y espera a que terminen."""
+        self.stop_event.set()
+        for queue in self.queues:
+            with queue._cond:
+                queue._cond.notify_all()
+        current = threading.current_thread()
+        for thread in self.threads:
+            if thread is not current:
+                thread.join(timeout)
+        self.threads = []
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set() and any(t.is_alive() for t in self.threads)
+
+    def status(self):
+        """Contadores por etapa: procesados, errores, latencia y descartes."""
+        result = {'capture': self.stats[0].as_dict()}
+        for i, stats in enumerate(self.stats[1:]):
+            result[stats.name] = stats.as_dict(self.queues[i])
+        return result
@@ -0,0 +1,420 @@
+"""
+PRUEBA DE CARGA - CABINAS ANTI-SUICIDIO
+Simula N cabinas contra la API con audio que sí pasa por el pipeline real
+(VAD, características, clasificación, difusión), tomado de las fuentes de
+audio_sources.py (voz sintética o reproducción de un WAV). Cada cabina:
+  - inicia su sesión (POST /api/cabins/<id>/session/start con 'audio_source')
+  - escucha sus estados por socket.io ('join_cabin' → 'state_update')
+  - consulta su estado (GET .../analysis/state) y escribe al chat
+    (POST .../chat) periódicamente
+  - cierra la sesión al final (POST .../session/end)
+
+Reporta, por número de cabinas: si el servidor las sostiene (ventanas
+analizadas contra las esperadas a tiempo real), núcleos de CPU usados y
+cabinas por núcleo, latencias de cola (p50/p95/p99) por ruta y de extremo a
+extremo por socket.io, y crecimiento de memoria del proceso del servidor.
+
+Con --lanzar arranca el servidor en un proceso propio (así se mide su CPU y
+memoria) con la fuente en AUDIO_SOURCE. Contra un servidor ya corriendo, cada
+cabina pide su fuente al iniciar la sesión: el servidor debe tener
+ALLOW_TEST_SOURCES=1, y las rutas wav: son relativas a su TEST_AUDIO_DIR. Contra un servidor ya corriendo, --pid mide su proceso si está en
+la misma máquina. El propio generador también consume CPU: para dimensionar
+con precisión, fijar el servidor a sus núcleos (taskset) o correr el
+generador en otra máquina.
+
+Uso:
+    python prueba_carga.py --lanzar --cabinas 8 --duracion 120
+    python prueba_carga.py --lanzar --cabinas 4,8,16,32 --duracion 90 -o carga.json
+    python prueba_carga.py --url http://cabinas:5000 --fuente wav:voz.wav --cabinas 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import socketio
+except ImportError:
+    socketio = None  # Sin cliente socket.io solo se miden las rutas REST
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # En Linux basta /proc
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+VENTANA_SEGUNDOS = 3     # Ventana del analizador del servidor (duration=3)
+SOSTENIDO = 0.9          # Fracción mínima de ventanas esperadas para considerar la carga sostenida
+MUESTREO_SEGUNDOS = 1.0  # Periodo del monitor de CPU y memoria
+MENSAJES_CHAT = [
+    'Hola, ¿me escuchas?',
+    'Hoy fue un día difícil',
+    'No sé muy bien cómo me siento',
+    'Gracias por escucharme'
+]
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+class Latencias:
+    """Latencias por nombre de ruta o evento, desde varios hilos."""
+
+    def __init__(self):
+        self._muestras = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre, segundos):
+        with self._lock:
+            self._muestras.setdefault(nombre, []).append(segundos)
+
+    def resumen(self):
+        with self._lock:
+            muestras = {nombre: np.array(valores) * 1000 for nombre, valores in self._muestras.items()}
+        return {
+            nombre: {
+                'n': int(len(ms)),
+                'p50_ms': round(float(np.percentile(ms, 50)), 2),
+                'p95_ms': round(float(np.percentile(ms, 95)), 2),
+                'p99_ms': round(float(np.percentile(ms, 99)), 2),
+                'max_ms': round(float(ms.max()), 2)
+            }
+            for nombre, ms in sorted(muestras.items()) if len(ms)
+        }
+
+
+class ClienteApi:
+    """Peticiones JSON con urllib; cada una registra su latencia con el nombre de la ruta."""
+
+    def __init__(self, url, latencias, timeout=10.0):
+        self.url = url.rstrip('/')
+        self.latencias = latencias
+        self.timeout = timeout
+        self.errores = 0
+        self._lock = threading.Lock()
+
+    def pedir(self, metodo, ruta, nombre, datos=None):
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+        peticion = urllib.request.Request(self.url + ruta, data=cuerpo, method=metodo,
+                                          headers={'Content-Type': 'application/json'})
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+                return json.loads(respuesta.read() or b'{}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            with self._lock:
+                self.errores += 1
+            return {'status': 'error', 'message': str(e)}
+        finally:
+            self.latencias.agregar(f"{metodo} {nombre}", time.perf_counter() - inicio)
+
+
+def _leer_proceso(pid):
+    """(segundos de CPU, RSS en bytes) del proceso."""
+    if psutil is not None:
+        proceso = psutil.Process(pid)
+        cpu = proceso.cpu_times()
+        return cpu.user + cpu.system, proceso.memory_info().rss
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    rss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for linea in f:
+            if linea.startswith('VmRSS:'):
+                rss = int(linea.split()[1]) * 1024
+                break
+    return cpu, rss
+
+
+class MonitorProceso:
+    """Muestrea CPU y memoria del servidor en un hilo propio."""
+
+    def __init__(self, pid, periodo=MUESTREO_SEGUNDOS):
+        self.pid = pid
+        self.periodo = periodo
+        self.muestras = []   # (tiempo, segundos de CPU, RSS)
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, name='monitor-servidor', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _correr(self):
+        while not self._detener.is_set():
+            try:
+                cpu, rss = _leer_proceso(self.pid)
+            except (OSError, ValueError):
+                break  # El proceso terminó
+            self.muestras.append((time.monotonic(), cpu, rss))
+            self._detener.wait(self.periodo)
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+
+    def tramo(self, inicio, fin):
+        """CPU y memoria entre dos instantes (time.monotonic)."""
+        muestras = np.array([m for m in self.muestras if inicio <= m[0] <= fin])
+        if len(muestras) < 2:
+            return None
+        t, cpu, rss = muestras.T
+        pendiente = np.polyfit((t - t[0]) / 60.0, rss / 2 ** 20, 1)[0] if len(t) > 2 else 0.0
+        return {
+            'nucleos': round(float((cpu[-1] - cpu[0]) / (t[-1] - t[0])), 3),
+            'rss_inicio_mb': round(float(rss[0] / 2 ** 20), 1),
+            'rss_fin_mb': round(float(rss[-1] / 2 ** 20), 1),
+            'memoria_mb_por_min': round(float(pendiente), 3)
+        }
+
+
+# ============================================================================
+# CABINA SIMULADA
+# ============================================================================
+
+class CabinaSimulada(threading.Thread):
+    """Una cabina: sesión, socket.io y tráfico REST hasta que se pide detener."""
+
+    def __init__(self, cabin_id, api, fuente, latencias, estado_cada=2.0, chat_cada=15.0):
+        super().__init__(name=f"cabina-{cabin_id}", daemon=True)
+        self.cabin_id = cabin_id
+        self.api = api
+        self.fuente = fuente
+        self.latencias = latencias
+        self.estado_cada = estado_cada
+        self.chat_cada = chat_cada
+        self.detener = threading.Event()
+        self.estados_recibidos = 0
+        self.ventanas_analizadas = None
+        self.inicio = None
+        self.fin = None
+        self.error = None
+        self._socket = None
+
+    def _conectar_socket(self):
+        if socketio is None:
+            return
+        cliente = socketio.Client(reconnection=False)
+
+        @cliente.on('state_update')
+        def al_recibir(estado):
+            if estado.get('cabin_id') != self.cabin_id:
+                return
+            self.estados_recibidos += 1
+            if estado.get('timestamp'):
+                # Desde que la sesión registró el estado hasta que llega aquí
+                creado = datetime.fromisoformat(estado['timestamp']).timestamp()
+                self.latencias.agregar('socketio state_update', time.time() - creado)
+
+        cliente.connect(self.api.url)
+        cliente.emit('join_cabin', {'cabin_id': self.cabin_id})
+        self._socket = cliente
+
+    def run(self):
+        base = f"/api/cabins/{self.cabin_id}"
+        respuesta = self.api.pedir('POST', f"{base}/session/start", '/session/start',
+                                   {'audio_source': self.fuente} if self.fuente else {})
+        if respuesta.get('status') != 'success':
+            self.error = respuesta.get('message', 'no se pudo iniciar la sesión')
+            return
+        self.inicio = time.monotonic()
+        try:
+            self._conectar_socket()
+        except Exception as e:
+            self.error = f"socket.io: {e}"
+
+        siguiente_estado = siguiente_chat = time.monotonic()
+        mensajes = 0
+        while not self.detener.is_set():
+            ahora = time.monotonic()
+            if ahora >= siguiente_estado:
+                self.api.pedir('GET', f"{base}/analysis/state", '/analysis/state')
+                siguiente_estado = ahora + self.estado_cada
+            if self.chat_cada and ahora >= siguiente_chat:
+                self.api.pedir('POST', f"{base}/chat", '/chat',
+                               {'message': MENSAJES_CHAT[mensajes % len(MENSAJES_CHAT)]})
+                mensajes += 1
+                siguiente_chat = ahora + self.chat_cada
+            self.detener.wait(max(0.05, min(siguiente_estado, siguiente_chat) - time.monotonic()))
+
+        self.fin = time.monotonic()
+        respuesta = self.api.pedir('POST', f"{base}/session/end", '/session/end')
+        self.ventanas_analizadas = (respuesta.get('session_data') or {}).get('states_count')
+        if self._socket is not None:
+            self._socket.disconnect()
+
+
+# ============================================================================
+# CORRIDAS
+# ============================================================================
+
+def correr_paso(args, n, api, monitor):
+    """Corre `n` cabinas durante args.duracion segundos y resume lo medido."""
+    latencias = Latencias()
+    api.latencias = latencias
+    errores_previos = api.errores
+    # Con --lanzar la fuente ya va en AUDIO_SOURCE: no se pide por sesión
+    fuente = None if args.lanzar else args.fuente
+    cabinas = [CabinaSimulada(f"carga-{n}-{i}", api, fuente, latencias,
+                              args.estado_cada, args.chat_cada) for i in range(n)]
+    for cabina in cabinas:
+        cabina.start()
+        time.sleep(args.rampa)
+
+    # La medición empieza cuando todas llevan un rato corriendo
+    time.sleep(args.calentamiento)
+    inicio = time.monotonic()
+    time.sleep(args.duracion)
+    fin = time.monotonic()
+
+    for cabina in cabinas:
+        cabina.detener.set()
+    for cabina in cabinas:
+        cabina.join(timeout=30)
+
+    proporciones = []
+    for cabina in cabinas:
+        if cabina.ventanas_analizadas is not None and cabina.inicio is not None:
+            esperadas = (cabina.fin - cabina.inicio) / VENTANA_SEGUNDOS
+            proporciones.append(min(cabina.ventanas_analizadas / max(esperadas, 1.0), 1.0))
+    errores = [f"{c.cabin_id}: {c.error}" for c in cabinas if c.error]
+
+    resultado = {
+        'cabinas': n,
+        'fuente': args.fuente,
+        'duracion_s': args.duracion,
+        'cabinas_con_datos': len(proporciones),
+        'ventanas_vs_esperadas_min': round(min(proporciones), 3) if proporciones else None,
+        'ventanas_vs_esperadas_media': round(float(np.mean(proporciones)), 3) if proporciones else None,
+        'estados_socketio': sum(c.estados_recibidos for c in cabinas),
+        'errores_http': api.errores - errores_previos,
+        'errores': errores[:10],
+        'latencias': latencias.resumen()
+    }
+    resultado['sostenido'] = bool(proporciones and len(proporciones) == n and min(proporciones) >= SOSTENIDO
+                                  and not errores)
+    proceso = monitor.tramo(inicio, fin) if monitor else None
+    if proceso:
+        resultado['servidor'] = proceso
+        if proceso['nucleos'] > 0:
+            resultado['cabinas_por_nucleo'] = round(n / proceso['nucleos'], 2)
+    return resultado
+
+
+def lanzar_servidor(args, max_cabinas):
+    """Arranca 'api flask.txt' en un directorio temporal con las fuentes de prueba."""
+    import tempfile
+    entorno = dict(os.environ,
+                   AUDIO_SOURCE=args.fuente,
+                   AUDIO_SOURCE_REALTIME='1',
+                   CABIN_SIMULATION='0',
+                   ANALYZER_POOL_SIZE=str(max_cabinas),
+                   MAX_CABINS=str(max(max_cabinas, 64)),
+                   PORT=str(args.puerto),
+                   PYTHONPATH=DIRECTORIO + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    # Las rutas de la fuente son relativas al directorio desde el que se lanza
+    if args.fuente.startswith('wav:'):
+        entorno['AUDIO_SOURCE'] = 'wav:' + os.path.abspath(args.fuente[4:])
+    proceso = subprocess.Popen([sys.executable, os.path.join(DIRECTORIO, 'api flask.txt')],
+                               cwd=tempfile.mkdtemp(prefix='carga_cabinas_'), env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.puerto}"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {proceso.returncode})")
+        try:
+            with urllib.request.urlopen(url + '/', timeout=1):
+                return proceso, url
+        except OSError:
+            time.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError("El servidor no respondió en 60 s")
+
+
+def imprimir(resultados):
+    print(f"\n{'cabinas':>8} {'sostenido':>10} {'ventanas':>9} {'núcleos':>8} {'cab/núcleo':>11} "
+          f"{'p99 estado':>11} {'p99 socket':>11} {'MB/min':>8}")
+    for r in resultados:
+        servidor = r.get('servidor') or {}
+
+        def p99(nombre):
+            return r['latencias'].get(nombre, {}).get('p99_ms', '-')
+
+        print(f"{r['cabinas']:>8} {'sí' if r['sostenido'] else 'no':>10} "
+              f"{r['ventanas_vs_esperadas_min'] if r['ventanas_vs_esperadas_min'] is not None else '-':>9} "
+              f"{servidor.get('nucleos', '-'):>8} {r.get('cabinas_por_nucleo', '-'):>11} "
+              f"{p99('GET /analysis/state'):>11} {p99('socketio state_update'):>11} "
+              f"{servidor.get('memoria_mb_por_min', '-'):>8}")
+        for error in r['errores']:
+            print(f"         ⚠️ {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga: N cabinas simuladas contra la API")
+    parser.add_argument('--cabinas', default='4', help="Número de cabinas, o una lista de pasos: 4,8,16")
+    parser.add_argument('--duracion', type=float, default=60.0, help="Segundos medidos por paso")
+    parser.add_argument('--calentamiento', type=float, default=10.0, help="Segundos antes de medir")
+    parser.add_argument('--rampa', type=float, default=0.2, help="Segundos entre el arranque de cada cabina")
+    parser.add_argument('--fuente', default='synthetic', help="Fuente de audio por sesión (audio_sources.py)")
+    parser.add_argument('--estado-cada', type=float, default=2.0, help="Segundos entre GET de estado por cabina")
+    parser.add_argument('--chat-cada', type=float, default=15.0, help="Segundos entre mensajes de chat (0 = sin chat)")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--pid', type=int, help="Proceso del servidor a medir (misma máquina)")
+    parser.add_argument('--lanzar', action='store_true', help="Arrancar el servidor en un proceso propio")
+    parser.add_argument('--puerto', type=int, default=5055, help="Puerto del servidor con --lanzar")
+    parser.add_argument('-o', '--salida', help="Guardar los resultados en este JSON")
+    args = parser.parse_args(argv)
+
+    pasos = [int(n) for n in args.cabinas.split(',') if n.strip()]
+    if socketio is None:
+        print("⚠️ python-socketio no está instalado: no se mide la latencia de socket.io")
+
+    servidor = None
+    url, pid = args.url, args.pid
+    if args.lanzar:
+        servidor, url = lanzar_servidor(args, max(pasos))
+        pid = servidor.pid
+    monitor = MonitorProceso(pid).iniciar() if pid else None
+    api = ClienteApi(url, Latencias())
+
+    resultados = []
+    try:
+        for n in pasos:
+            print(f"▶ {n} cabinas ({args.fuente}) durante {args.duracion:.0f} s...")
+            resultados.append(correr_paso(args, n, api, monitor))
+    finally:
+        if monitor:
+            monitor.detener()
+        if servidor:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+
+    imprimir(resultados)
+    sostenidos = [r for r in resultados if r['sostenido']]
+    if sostenidos:
+        mejor = max(sostenidos, key=lambda r: r['cabinas'])
+        extra = f" ({mejor['cabinas_por_nucleo']} por núcleo)" if 'cabinas_por_nucleo' in mejor else ''
+        print(f"\n✓ Máximo sostenido: {mejor['cabinas']} cabinas{extra}")
+    else:
+        print("\n✗ Ningún paso fue sostenido")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0 if sostenidos else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
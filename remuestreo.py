@@ -0,0 +1,113 @@
+"""
+REMUESTREO POLIFÁSICO EN STREAMING
+Convierte el audio del micrófono (abierto a su frecuencia nativa, ej. 44.1 o
+48 kHz) a la frecuencia de análisis (16 kHz) bloque por bloque. La razón se
+reduce a L/M (48000 → 16000 = 1/3; 44100 → 16000 = 160/441) y el filtro
+pasa-bajas (sinc con ventana Kaiser) se parte en L fases: cada muestra de
+salida es un producto punto de `taps_por_fase` coeficientes con las últimas
+entradas, sin calcular las muestras intermedias que se descartarían. Entre
+bloques solo se guarda el historial de entradas y la fase de la siguiente
+salida, así el resultado no depende de cómo llegan partidos los bloques.
+
+Costo por bloque: salidas × taps_por_fase multiplicaciones en float32
+(`costo_por_bloque`). Con los valores por defecto, un bloque de 1024 muestras
+a 48 kHz da 341 salidas × 48 taps ≈ 16 k MAC; a 44.1 kHz, 372 × 45 ≈ 17 k.
+Ver `python benchmarks.py --solo remuestreo_bloque` para el tiempo medido.
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+TAPS_POR_CERO = 8        # Cruces por cero del sinc a cada lado (calidad del filtro)
+BETA_KAISER = 8.0        # ~80 dB de atenuación en la banda de rechazo
+CORTE_RELATIVO = 0.9     # Corte respecto a la mitad de la frecuencia menor
+
+
+def razon(rate_entrada, rate_salida):
+    """Regresa (L, M) reducidos: salida = entrada × L / M."""
+    fraccion = Fraction(int(round(rate_salida)), int(round(rate_entrada)))
+    return fraccion.numerator, fraccion.denominator
+
+
+def disenar_filtro(arriba, abajo, taps_por_cero=TAPS_POR_CERO, beta=BETA_KAISER):
+    """
+    Banco polifásico (arriba × taps_por_fase) del pasa-bajas a la frecuencia
+    sobremuestreada. La fila p son los coeficientes de la fase p.
+    """
+    factor = max(arriba, abajo)
+    taps_por_fase = int(np.ceil(2 * taps_por_cero * factor / arriba))
+    largo = taps_por_fase * arriba
+    corte = 0.5 * CORTE_RELATIVO / factor          # ciclos por muestra sobremuestreada
+    n = np.arange(largo) - (largo - 1) / 2.0
+    h = 2 * corte * np.sinc(2 * corte * n) * np.kaiser(largo, beta) * arriba
+    # h[p + k·L] pertenece a la fase p, tap k
+    return h.reshape(taps_por_fase, arriba).T.astype(np.float32).copy()
+
+
+class RemuestreadorPolifasico:
+    """
+    Remuestreador con estado para un stream. `procesar` recibe bloques de
+    (muestras,) o (muestras, canales), int16 o float, y regresa float32 a
+    `rate_salida` (en int16 la escala se conserva: mismas unidades).
+    """
+
+    def __init__(self, rate_entrada, rate_salida=16000, canales=1, taps_por_cero=TAPS_POR_CERO):
+        self.rate_entrada = rate_entrada
+        self.rate_salida = rate_salida
+        self.canales = canales
+        self.arriba, self.abajo = razon(rate_entrada, rate_salida)
+        self.directo = self.arriba == self.abajo
+        if not self.directo:
+            self.banco = disenar_filtro(self.arriba, self.abajo, taps_por_cero)
+            self.taps_por_fase = self.banco.shape[1]
+            self._taps = np.arange(self.taps_por_fase)
+        else:
+            self.taps_por_fase = 0
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el historial (ej. al reabrir el stream)."""
+        forma = (max(self.taps_por_fase - 1, 0),) + ((self.canales,) if self.canales > 1 else ())
+        self._historial = np.zeros(forma, dtype=np.float32)
+        self._posicion = 0   # Siguiente salida, en 1/L de muestra desde el inicio del bloque
+
+    def salidas_para(self, n):
+        """Muestras de salida que producirá un bloque de `n` entradas (desde el estado actual)."""
+        if self.directo:
+            return n
+        return max(0, -(-(n * self.arriba - self._posicion) // self.abajo))
+
+    def costo_por_bloque(self, n):
+        """Multiplicaciones-suma de un bloque de `n` entradas."""
+        return self.salidas_para(n) * self.taps_por_fase * self.canales
+
+    def procesar(self, bloque):
+        """Remuestrea un bloque y regresa las salidas que ya se pueden calcular."""
+        bloque = np.asarray(bloque, dtype=np.float32)
+        if self.directo:
+            return bloque
+        n = len(bloque)
+        cuantas = self.salidas_para(n)
+
+        datos = np.concatenate([self._historial, bloque])
+        if cuantas:
+            # Posición de cada salida en la entrada: base (muestra) y fase
+            posiciones = self._posicion + self.abajo * np.arange(cuantas, dtype=np.int64)
+            base, fase = np.divmod(posiciones, self.arriba)
+            indices = base[:, None] + (self.taps_por_fase - 1) - self._taps
+            if datos.ndim == 1:
+                salida = np.einsum('ij,ij->i', self.banco[fase], datos[indices])
+            else:
+                salida = np.einsum('ij,ijc->ic', self.banco[fase], datos[indices])
+        else:
+            salida = np.zeros((0,) + bloque.shape[1:], dtype=np.float32)
+
+        self._posicion += cuantas * self.abajo - n * self.arriba
+        self._historial = datos[len(datos) - len(self._historial):]
+        return salida
+
+
+def a_int16(audio):
+    """Redondea y satura muestras en escala int16."""
+    return np.clip(np.rint(audio), -32768, 32767).astype(np.int16)
@@ -0,0 +1,197 @@
+"""
+ROLLUPS MULTI-RESOLUCIÓN DEL HISTORIAL
+Cada sesión mantiene, además de los estados crudos, buckets agregados a
+resoluciones fijas (10 s, 1 min, 10 min). Cada bucket guarda conteos por
+emoción, el riesgo máximo y media/mínimo/máximo de cada característica, y se
+actualiza al agregar cada estado (O(1) por resolución). Los buckets viven en
+anillos indexados por número de bucket, así una consulta de 8 horas toca a
+lo más MAX_POINTS buckets sin importar lo larga que sea la sesión ni cuántos
+estados tenga. Los anillos se asignan con el primer estado y crecen
+duplicando hasta su capacidad según el tramo de tiempo que cubre la sesión:
+una sesión vacía no ocupa memoria y una corta ocupa lo que abarca.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+# (segundos por bucket, buckets que se conservan): 3 h, 24 h y 7 días
+RESOLUTIONS = ((10, 1080), (60, 1440), (600, 1008))
+MAX_POINTS = 500       # Buckets por respuesta
+EMOTION_COLUMNS = 8    # Columnas iniciales de conteo (crece si aparecen emociones nuevas)
+INITIAL_BUCKETS = 16   # Tamaño del anillo al primer estado
+
+
+class RollupSeries:
+    """
+    Anillo de buckets de una sola resolución. `capacity` es lo máximo que
+    conserva; `allocated` lo asignado hasta ahora (0 antes del primer estado).
+    """
+
+    def __init__(self, resolution, capacity, n_features):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.n_features = n_features
+        self._allocate(0, EMOTION_COLUMNS)
+
+    def _allocate(self, size, emotion_columns):
+        self.allocated = size
+        self.bucket = np.full(size, -1, dtype=np.int64)   # Número de bucket en cada posición
+        self.count = np.zeros(size, dtype=np.int32)
+        self.emotion_counts = np.zeros((size, emotion_columns), dtype=np.int32)
+        self.max_risk = np.full(size, -1, dtype=np.int8)
+        self.feature_n = np.zeros((size, self.n_features), dtype=np.int32)
+        self.feature_sum = np.zeros((size, self.n_features), dtype=np.float64)
+        self.feature_min = np.full((size, self.n_features), np.inf, dtype=np.float32)
+        self.feature_max = np.full((size, self.n_features), -np.inf, dtype=np.float32)
+
+    def _grow(self):
+        """Duplica el anillo (hasta `capacity`) reubicando los buckets guardados."""
+        old = (self.bucket, self.count, self.emotion_counts, self.max_risk,
+               self.feature_n, self.feature_sum, self.feature_min, self.feature_max)
+        self._allocate(min(max(2 * self.allocated, INITIAL_BUCKETS), self.capacity), old[2].shape[1])
+        used = np.flatnonzero(old[0] >= 0)
+        # Lo guardado abarca menos que el anillo viejo: no hay colisiones
+        slots = old[0][used] % self.allocated
+        for new, prev in zip((self.bucket, self.count, self.emotion_counts, self.max_risk,
+                              self.feature_n, self.feature_sum, self.feature_min, self.feature_max), old):
+            new[slots] = prev[used]
+
+    def _reset(self, slot, bucket):
+        self.bucket[slot] = bucket
+        self.count[slot] = 0
+        self.emotion_counts[slot] = 0
+        self.max_risk[slot] = -1
+        self.feature_n[slot] = 0
+        self.feature_sum[slot] = 0.0
+        self.feature_min[slot] = np.inf
+        self.feature_max[slot] = -np.inf
+
+    def add(self, timestamp, emotion, risk, features):
+        """Suma un estado a su bucket (`features` con NaN donde no hay valor)."""
+        bucket = int(timestamp // self.resolution)
+        while True:
+            if not self.allocated:
+                self._grow()
+            slot = bucket % self.allocated
+            held = self.bucket[slot]
+            if held < 0 or held == bucket:
+                break
+            if abs(held - bucket) < self.capacity and self.allocated < self.capacity:
+                self._grow()  # Con la capacidad completa ambos caben
+                continue
+            if held > bucket:
+                return  # Más viejo que lo que conserva el anillo
+            break
+        if self.bucket[slot] != bucket:
+            self._reset(slot, bucket)
+
+        if emotion >= self.emotion_counts.shape[1]:
+            extra = emotion + 1 - self.emotion_counts.shape[1]
+            self.emotion_counts = np.pad(self.emotion_counts, ((0, 0), (0, extra)))
+        self.count[slot] += 1
+        self.emotion_counts[slot, emotion] += 1
+        self.max_risk[slot] = max(self.max_risk[slot], risk)
+
+        valid = ~np.isnan(features)
+        self.feature_n[slot] += valid
+        self.feature_sum[slot] += np.where(valid, features, 0.0)
+        np.fmin(self.feature_min[slot], features, out=self.feature_min[slot])
+        np.fmax(self.feature_max[slot], features, out=self.feature_max[slot])
+
+    def span(self, start, end):
+        """
+        Buckets (primero, último) que responden [start, end]: a lo más
+        MAX_POINTS y los que conserva el anillo, contando hacia atrás desde `end`.
+        """
+        first = int(start // self.resolution)
+        last = int(end // self.resolution)
+        return max(first, last - min(self.capacity, MAX_POINTS) + 1), last
+
+    def slots(self, start, end):
+        """Posiciones con datos de los buckets en [start, end], en orden de tiempo."""
+        if not self.allocated:
+            return np.empty(0, dtype=np.int64)
+        first, last = self.span(start, end)
+        wanted = np.arange(first, last + 1, dtype=np.int64)
+        slots = wanted % self.allocated
+        return slots[self.bucket[slots] == wanted]
+
+    def oldest(self, latest):
+        """Inicio (epoch) de lo más viejo que puede conservar el anillo."""
+        return (int(latest // self.resolution) - self.capacity + 1) * self.resolution
+
+
+class Rollups:
+    """Las series de todas las resoluciones de una sesión."""
+
+    def __init__(self, n_features, resolutions=RESOLUTIONS):
+        self.series = [RollupSeries(res, cap, n_features) for res, cap in resolutions]
+        self.latest = None
+
+    @property
+    def resolutions(self):
+        return [s.resolution for s in self.series]
+
+    def add(self, timestamp, emotion, risk, features):
+        for series in self.series:
+            series.add(timestamp, emotion, risk, features)
+        self.latest = timestamp if self.latest is None else max(self.latest, timestamp)
+
+    def choose(self, start, end, resolution=None):
+        """
+        Serie a consultar: la de `resolution` si se pide, si no la más fina
+        que cubre `start` con a lo más MAX_POINTS buckets.
+        """
+        if resolution is not None:
+            for series in self.series:
+                if series.resolution == resolution:
+                    return series
+            raise ValueError(f"Resolución no soportada: {resolution} (opciones: {self.resolutions})")
+        latest = self.latest if self.latest is not None else end
+        for series in self.series:
+            if (end - start) / series.resolution <= MAX_POINTS and start >= series.oldest(latest):
+                return series
+        return self.series[-1]
+
+    def query(self, start, end, resolution, emotions, risk_levels, feature_names):
+        """
+        Buckets de [start, end] como dicts de la API (tablas de códigos del
+        almacén). Si el rango no cabe en MAX_POINTS buckets de la resolución
+        se responden los más recientes y 'from' es el inicio efectivo.
+        """
+        series = self.choose(start, end, resolution)
+        slots = series.slots(start, end)
+        start = max(start, float(series.span(start, end)[0] * series.resolution))
+
+        counts = series.emotion_counts[slots]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = series.feature_sum[slots] / series.feature_n[slots]
+        buckets = []
+        for row, slot in enumerate(slots):
+            features = {
+                name: {'mean': round(float(means[row, f]), 3),
+                       'min': round(float(series.feature_min[slot, f]), 3),
+                       'max': round(float(series.feature_max[slot, f]), 3)}
+                for f, name in enumerate(feature_names) if series.feature_n[slot, f]
+            }
+            bucket_start = float(series.bucket[slot] * series.resolution)
+            buckets.append({
+                'start': datetime.fromtimestamp(bucket_start).isoformat(),
+                'start_ts': bucket_start,
+                'count': int(series.count[slot]),
+                'emotions': {emotions[e]: int(c) for e, c in enumerate(counts[row][:len(emotions)]) if c},
+                'max_risk_level': risk_levels[series.max_risk[slot]] if series.max_risk[slot] >= 0 else None,
+                'features': features
+            })
+        return {
+            'resolution': series.resolution,
+            'from': start,
+            'to': end,
+            'buckets': buckets
+        }
+
+    def nbytes(self):
+        return sum(a.nbytes for s in self.series for a in (
+            s.bucket, s.count, s.emotion_counts, s.max_risk,
+            s.feature_n, s.feature_sum, s.feature_min, s.feature_max))
@@ -0,0 +1,364 @@
+"""
+ÍNDICE DE SESIONES E INCIDENTES (SQLite embebido)
+Se actualiza cuando se escriben sesiones, estados e incidentes, agrupando
+las escrituras en transacciones desde un hilo propio. Mantiene contadores
+incrementales en memoria (respaldados en la tabla `counters`), así
+/api/stats responde en tiempo constante sin listar directorios.
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = 'data/index.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id       TEXT PRIMARY KEY,
+    cabin_id         TEXT,
+    start_ts         REAL,
+    end_ts           REAL,
+    duration_seconds REAL,
+    states_count     INTEGER DEFAULT 0,
+    dominant_emotion TEXT,
+    max_risk         INTEGER DEFAULT 0,
+    emergency        INTEGER DEFAULT 0,
+    status           TEXT DEFAULT 'open'
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions(start_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_risk ON sessions(max_risk, start_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_emotion ON sessions(dominant_emotion, start_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_cabin ON sessions(cabin_id, start_ts);
+
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id TEXT PRIMARY KEY,
+    session_id  TEXT,
+    cabin_id    TEXT,
+    ts          REAL,
+    risk_level  TEXT,
+    status      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_session ON incidents(session_id);
+CREATE INDEX IF NOT EXISTS idx_incidents_status ON incidents(status, ts);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ['sessions_started', 'sessions_closed', 'incidents', 'incidents_active', 'states']
+
+
+def _ts(value):
+    """Acepta timestamp numérico o ISO y regresa segundos epoch."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _risk_levels():
+    # Diferido: state_store trae NumPy y el índice se crea al arrancar el servidor
+    from state_store import RISK_LEVELS
+    return RISK_LEVELS
+
+
+def _risk_code(level):
+    levels = _risk_levels()
+    return levels.index(level) if level in levels else 0
+
+
+class SessionIndex:
+    """Índice embebido con escritura por lotes en segundo plano."""
+
+    def __init__(self, path=INDEX_PATH, commit_interval=1.0):
+        self.path = path
+        self.commit_interval = commit_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._readers = threading.local()
+
+        # Contadores en memoria (fuente de /api/stats)
+        self._counter_lock = threading.Lock()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        for name, value in self._conn.execute('SELECT name, value FROM counters'):
+            self.counters[name] = value
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='session-index', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Eventos (no bloquean al que llama)
+    # ------------------------------------------------------------------
+
+    def _bump(self, **deltas):
+        # La tabla `counters` se actualiza con el siguiente lote
+        with self._counter_lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def session_started(self, session_id, cabin_id, start_time):
+        self._bump(sessions_started=1)
+        self._queue.put(('start', (session_id, cabin_id, _ts(start_time))))
+
+    def state_added(self, session_id, states_count, summary):
+        """Actualiza el avance de una sesión abierta (se coalescen por lote)."""
+        with self._counter_lock:
+            self.counters['states'] += 1
+        self._queue.put(('progress', (
+            session_id, states_count, summary.get('dominant_emotion'),
+            _risk_code(summary.get('max_risk_level'))
+        )))
+
+    def incident_recorded(self, incident):
+        self._bump(incidents=1, incidents_active=int(incident.get('status', 'active') == 'active'))
+        self._queue.put(('incident', (
+            incident['incident_id'], incident.get('session_id'), incident.get('cabin_id'),
+            _ts(incident.get('timestamp')),
+            (incident.get('state_data') or {}).get('risk_level'),
+            incident.get('status', 'active')
+        )))
+
+    def incident_status(self, incident_id, status, timeout=None):
+        """
+        Cambia el estado de un incidente (ej. 'resolved') y espera a que se
+        aplique. Regresa True si el incidente existe, False si no y None si
+        venció `timeout` (el cambio se aplica de todos modos).
+        """
+        done = threading.Event()
+        done.found = None
+        self._queue.put(('incident_status', (incident_id, status, done)))
+        done.wait(timeout)
+        return done.found
+
+    def session_closed(self, session_data):
+        """Cierra la sesión; el contador solo sube si seguía abierta en el índice."""
+        summary = session_data.get('summary') or {}
+        self._queue.put(('close', (
+            _ts(session_data.get('end_time')), session_data.get('duration_seconds'),
+            session_data.get('states_count', 0), summary.get('dominant_emotion'),
+            _risk_code(summary.get('max_risk_level')),
+            int(bool(session_data.get('emergency_triggered'))),
+            session_data['session_id']
+        )))
+
+    def flush(self, timeout=None):
+        """Espera a que lo encolado hasta ahora esté confirmado en la base."""
+        done = threading.Event()
+        self._queue.put(('sync', done))
+        return done.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.commit_interval
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or batch[-1][0] in ('sync', 'incident_status'):
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            except Exception as e:
+                logger.error(f"Error al actualizar el índice: {e}")
+            for op, payload in batch:
+                if op == 'sync':
+                    payload.set()
+                elif op == 'incident_status':
+                    payload[-1].set()
+
+    def _apply(self, batch):
+        progress = {}
+        with self._conn:
+            for op, payload in batch:
+                if op == 'start':
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO sessions (session_id, cabin_id, start_ts) VALUES (?, ?, ?)",
+                        payload)
+                elif op == 'progress':
+                    progress[payload[0]] = payload
+                elif op == 'incident':
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO incidents VALUES (?, ?, ?, ?, ?, ?)", payload)
+                    self._conn.execute(
+                        "UPDATE sessions SET emergency = 1 WHERE session_id = ?", (payload[1],))
+                elif op == 'incident_status':
+                    incident_id, status, done = payload
+                    done.found = self._update_incident_status(incident_id, status)
+                elif op == 'close':
+                    progress.pop(payload[-1], None)
+                    closed = self._conn.execute(
+                        "UPDATE sessions SET end_ts = ?, duration_seconds = ?, states_count = ?, "
+                        "dominant_emotion = ?, max_risk = ?, emergency = ?, status = 'closed' "
+                        "WHERE session_id = ? AND status = 'open'", payload).rowcount
+                    if closed:
+                        self._bump(sessions_closed=1)
+
+            # Solo el último avance de cada sesión en el lote
+            self._conn.executemany(
+                "UPDATE sessions SET states_count = ?, dominant_emotion = ?, max_risk = ? "
+                "WHERE session_id = ? AND status = 'open'",
+                [(count, emotion, risk, sid) for sid, count, emotion, risk in progress.values()])
+
+            with self._counter_lock:
+                counters = dict(self.counters)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", counters.items())
+
+    def _update_incident_status(self, incident_id, status):
+        """Regresa si el incidente existe."""
+        row = self._conn.execute(
+            "SELECT status FROM incidents WHERE incident_id = ?", (incident_id,)).fetchone()
+        if not row:
+            return False
+        if row[0] == status:
+            return True
+        self._conn.execute(
+            "UPDATE incidents SET status = ? WHERE incident_id = ?", (status, incident_id))
+        delta = (status == 'active') - (row[0] == 'active')
+        if delta:
+            with self._counter_lock:
+                self.counters['incidents_active'] += delta
+        return True
+
+    # ------------------------------------------------------------------
+    # Consultas (conexión de lectura por hilo)
+    # ------------------------------------------------------------------
+
+    def _reader(self):
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._readers.conn = conn
+        return conn
+
+    def stats(self):
+        """Contadores actuales (O(1), sin tocar disco)."""
+        with self._counter_lock:
+            return dict(self.counters)
+
+    def query_sessions(self, start=None, end=None, cabin_id=None, min_risk=None,
+                       emotion=None, incident=None, status=None, limit=100, offset=0):
+        """
+        Sesiones filtradas por rango de inicio, cabina, riesgo mínimo,
+        emoción dominante y estado de incidentes ('any', 'none' o un estado).
+        """
+        where, params = [], []
+        if start is not None:
+            where.append("s.start_ts >= ?")
+            params.append(_ts(start))
+        if end is not None:
+            where.append("s.start_ts < ?")
+            params.append(_ts(end))
+        if cabin_id:
+            where.append("s.cabin_id = ?")
+            params.append(cabin_id)
+        if min_risk is not None:
+            where.append("s.max_risk >= ?")
+            params.append(_risk_code(min_risk))
+        if emotion:
+            where.append("s.dominant_emotion = ?")
+            params.append(emotion)
+        if status:
+            where.append("s.status = ?")
+            params.append(status)
+        if incident == 'any':
+            where.append("s.emergency = 1")
+        elif incident == 'none':
+            where.append("s.emergency = 0")
+        elif incident:
+            where.append("EXISTS (SELECT 1 FROM incidents i WHERE i.session_id = s.session_id AND i.status = ?)")
+            params.append(incident)
+
+        sql = "SELECT s.* FROM sessions s"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.start_ts DESC LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
+
+        rows = self._reader().execute(sql, params).fetchall()
+        return [self._session_row(row) for row in rows]
+
+    def query_incidents(self, start=None, end=None, cabin_id=None, status=None, limit=100, offset=0):
+        where, params = [], []
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(_ts(start))
+        if end is not None:
+            where.append("ts < ?")
+            params.append(_ts(end))
+        if cabin_id:
+            where.append("cabin_id = ?")
+            params.append(cabin_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+
+        sql = "SELECT * FROM incidents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
+        return [dict(row) for row in self._reader().execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _session_row(row):
+        data = dict(row)
+        data['max_risk_level'] = _risk_levels()[data.pop('max_risk') or 0]
+        data['emergency'] = bool(data['emergency'])
+        return data
+
+    # ------------------------------------------------------------------
+    # Reconstrucción desde archivos (índice nuevo sobre datos existentes)
+    # ------------------------------------------------------------------
+
+    def rebuild_from_files(self, sessions_dir='data/sessions', incidents_dir='data/incidents'):
+        """Indexa los archivos JSON ya existentes. Se usa una sola vez."""
+        sessions = incidents = 0
+        for directory, kind in ((sessions_dir, 'session'), (incidents_dir, 'incident')):
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(directory, name), encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"No se pudo indexar {name}: {e}")
+                    continue
+                if kind == 'session':
+                    self.session_started(data['session_id'], data.get('cabin_id'), data.get('start_time'))
+                    self.session_closed(data)
+                    self._bump(states=data.get('states_count', 0))
+                    sessions += 1
+                else:
+                    self.incident_recorded(data)
+                    incidents += 1
+        self.flush()
+        logger.info(f"✓ Índice reconstruido: {sessions} sesiones, {incidents} incidentes")
+        return sessions, incidents
+
+    def is_empty(self):
+        return not any(self.stats().values())
@@ -0,0 +1,366 @@
+"""
+BITÁCORA DE SESIÓN (append-only, a prueba de caídas)
+Cada estado, mensaje de chat e incidente se escribe como una línea JSON
+compacta en data/journal/<session_id>.jsonl en cuanto ocurre. Un solo hilo
+escritor agrupa las escrituras, hace flush/fsync periódicos (inmediatos para
+incidentes) y, al cerrar la sesión, compacta la bitácora en el archivo final
+data/sessions/<session_id>.json. Mientras la sesión sigue abierta se compacta
+cada COMPACT_RECORDS registros o COMPACT_SECONDS segundos: lo escrito desde
+la compactación anterior pasa a un segmento nuevo
+data/journal/<session_id>.checkpoint.<generación>.json y la bitácora vuelve a
+empezar con la marca de esa generación. Cada compactación escribe solo lo
+nuevo (nunca reescribe la sesión entera), así que cuesta lo mismo a la hora
+uno que a la hora diez. Al reiniciar, las bitácoras que quedaron abiertas
+(más sus segmentos) permiten recuperar las sesiones.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR = 'data/journal'
+JOURNAL_SUFFIX = '.jsonl'
+CHECKPOINT_INFIX = '.checkpoint.'
+CHECKPOINT_SUFFIX = '.json'
+COMPACT_RECORDS = 2000   # Registros entre compactaciones de una sesión abierta
+COMPACT_SECONDS = 600    # ... o segundos, lo que pase primero
+
+_WRITE_HELP = 'Duración de escrituras a disco'
+WRITE_SECONDS = metrics.histogram('storage_write_seconds', _WRITE_HELP, op='journal_append')
+FSYNC_SECONDS = metrics.histogram('storage_write_seconds', _WRITE_HELP, op='journal_fsync')
+JSON_WRITE_SECONDS = metrics.histogram('storage_write_seconds', _WRITE_HELP, op='json_atomic')
+
+
+def dumps_compact(data):
+    """JSON en una línea, sin espacios."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_json_atomic(path, data):
+    """Escribe un JSON completo con fsync y rename atómico."""
+    tmp_path = f"{path}.tmp"
+    with JSON_WRITE_SECONDS.time():
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class JournalWriter:
+    """
+    Hilo escritor compartido por todas las sesiones.
+    Las operaciones se ejecutan en orden; las líneas pendientes se agrupan
+    en una sola escritura por archivo y el fsync se hace cada
+    `fsync_interval` segundos o de inmediato si algún registro es durable.
+    """
+
+    def __init__(self, fsync_interval=1.0, max_batch=512):
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._files = {}
+        self._dirty = set()
+        self._last_fsync = time.monotonic()
+        self.records_written = 0
+        self.fsyncs = 0
+        self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # API (no bloquea al que llama)
+    # ------------------------------------------------------------------
+
+    def append(self, path, line, durable=False):
+        """Encola una línea para el archivo `path`."""
+        self._queue.put(('append', path, line, durable))
+
+    def submit(self, job):
+        """Encola un trabajo (ej. compactación) que corre en el hilo escritor."""
+        self._queue.put(('job', job, None, True))
+
+    def close_file(self, path):
+        self._queue.put(('close', path, None, False))
+
+    def flush(self, timeout=None):
+        """Espera a que todo lo encolado hasta ahora esté en disco."""
+        done = threading.Event()
+        self._queue.put(('sync', done, None, True))
+        return done.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                self._sync_if_due(force=False)
+                continue
+
+            # Agrupar todo lo que ya esté en la cola
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Error en la bitácora: {e}")
+
+    def _process(self, batch):
+        pending = {}
+        durable = False
+        waiters = []
+
+        for op, target, line, is_durable in batch:
+            if op == 'append':
+                pending.setdefault(target, []).append(line)
+                durable = durable or is_durable
+                continue
+
+            # Cualquier otra operación respeta el orden: primero lo pendiente
+            self._write(pending)
+            pending = {}
+            if op == 'job':
+                self._sync_if_due(force=True)
+                try:
+                    target()
+                except Exception as e:
+                    logger.error(f"Error en trabajo de bitácora: {e}")
+            elif op == 'close':
+                self._close(target)
+            elif op == 'sync':
+                waiters.append(target)
+                durable = True
+
+        self._write(pending)
+        self._sync_if_due(force=durable)
+        for event in waiters:
+            event.set()
+
+    def _write(self, pending):
+        if not pending:
+            return
+        with WRITE_SECONDS.time():
+            self._write_lines(pending)
+
+    def _write_lines(self, pending):
+        for path, lines in pending.items():
+            f = self._files.get(path)
+            if f is None:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                f = self._files[path] = open(path, 'a', encoding='utf-8')
+            f.write('\n'.join(lines) + '\n')
+            self._dirty.add(path)
+            self.records_written += len(lines)
+
+    def _sync_if_due(self, force):
+        if not self._dirty:
+            return
+        if not force and time.monotonic() - self._last_fsync < self.fsync_interval:
+            return
+        with FSYNC_SECONDS.time():
+            for path in self._dirty:
+                f = self._files.get(path)
+                if f:
+                    f.flush()
+                    os.fsync(f.fileno())
+        self._dirty.clear()
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    def _close(self, path):
+        f = self._files.pop(path, None)
+        if f:
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self._dirty.discard(path)
+
+
+class SessionJournal:
+    """Bitácora de una sesión: registros tipados con timestamp."""
+
+    def __init__(self, session_id, writer, directory=JOURNAL_DIR,
+                 compact_records=COMPACT_RECORDS, compact_seconds=COMPACT_SECONDS):
+        self.session_id = session_id
+        self.writer = writer
+        self.path = os.path.join(directory, f"{session_id}{JOURNAL_SUFFIX}")
+        self.compact_records = compact_records
+        self.compact_seconds = compact_seconds
+        self._pending = 0
+        self._compacted_at = time.monotonic()
+
+    def record(self, kind, data=None, durable=False, timestamp=None):
+        """Agrega un registro ('start', 'state', 'chat', 'incident', 'end')."""
+        entry = {'k': kind, 'ts': time.time() if timestamp is None else timestamp}
+        if data is not None:
+            entry['d'] = data
+        self.writer.append(self.path, dumps_compact(entry), durable)
+
+        self._pending += 1
+        if kind != 'end' and (self._pending >= self.compact_records
+                              or time.monotonic() - self._compacted_at >= self.compact_seconds):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Pasa lo escrito desde la última compactación a un segmento nuevo, en
+        el hilo escritor. Solo se leen y escriben los registros de la bitácora
+        actual: el costo no crece con la duración de la sesión. Primero se
+        escribe el segmento y luego se reinicia la bitácora con la marca de
+        su generación; si se cae en medio, la marca vieja indica que la
+        bitácora ya está en el segmento (y repetir la compactación lo vuelve
+        a escribir igual).
+        """
+        self._pending = 0
+        self._compacted_at = time.monotonic()
+        path, session_id = self.path, self.session_id
+
+        def job():
+            self.writer._close(path)
+            records = read_journal(path)
+            generation = records[0]['d'] if records and records[0].get('k') == 'checkpoint' else 0
+            write_json_atomic(checkpoint_path(path, generation + 1), {
+                'session_id': session_id,
+                'generation': generation + 1,
+                'records': _fold(records[1:] if generation else records)
+            })
+            _reset_journal(path, generation + 1)
+
+        self.writer.submit(job)
+
+    def compact(self, final_path, build_document):
+        """
+        Genera el archivo final de la sesión en el hilo escritor y borra la
+        bitácora. `build_document` se llama allí, fuera del hilo de la petición.
+        """
+        path = self.path
+
+        def job():
+            write_json_atomic(final_path, build_document())
+            self.writer._close(path)
+            for done in [path] + list_checkpoints(path):
+                if os.path.exists(done):
+                    os.remove(done)
+            logger.info(f"✓ Bitácora compactada: {final_path}")
+
+        self.writer.submit(job)
+
+
+def read_journal(path, repair=False):
+    """
+    Lee los registros de una bitácora; se detiene en una línea incompleta
+    (escritura cortada por una caída). Con `repair` la recorta del archivo
+    para poder seguir agregando registros.
+    """
+    records = []
+    valid_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                valid_bytes += len(line)
+                continue
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Registro incompleto ignorado en {path}")
+                break
+            valid_bytes += len(line)
+
+    if repair and valid_bytes < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return records
+
+
+def checkpoint_path(journal_path, generation):
+    """Segmento de checkpoint `generation` (desde 1) de una bitácora."""
+    return journal_path[:-len(JOURNAL_SUFFIX)] + f"{CHECKPOINT_INFIX}{generation}{CHECKPOINT_SUFFIX}"
+
+
+def list_checkpoints(journal_path):
+    """Segmentos de una bitácora, en orden de generación."""
+    segments = []
+    while os.path.exists(checkpoint_path(journal_path, len(segments) + 1)):
+        segments.append(checkpoint_path(journal_path, len(segments) + 1))
+    return segments
+
+
+def read_session(path, repair=False):
+    """
+    Registros completos de una sesión: los de sus segmentos (si hay) más los
+    de la bitácora escritos después. Con `repair`, una bitácora que ya quedó
+    en el último segmento (caída durante la compactación) se reinicia.
+    """
+    records = read_journal(path, repair)
+    segments = list_checkpoints(path)
+    generation = len(segments)
+    if not generation:
+        return records
+    if repair and not (records and _is_marker(records[0], generation)):
+        _reset_journal(path, generation)
+    compacted = []
+    for segment in segments:
+        compacted += _read_checkpoint(segment)
+    return compacted + _strip_marker(records, generation)
+
+
+def _read_checkpoint(path):
+    """Registros de un segmento de checkpoint."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['records']
+
+
+def _is_marker(record, generation):
+    return record.get('k') == 'checkpoint' and record.get('d') == generation
+
+
+def _strip_marker(records, generation):
+    """
+    Registros de la bitácora que no están en el segmento de `generation`.
+    Sin la marca de esa generación, la bitácora ya había quedado en él.
+    """
+    if not generation:
+        return records
+    if records and _is_marker(records[0], generation):
+        return records[1:]
+    return []
+
+
+def _fold(records):
+    """Quita lo que ya no aporta: solo cuenta la última línea base del tramo."""
+    last_baseline = max((i for i, r in enumerate(records) if r.get('k') == 'baseline'), default=None)
+    return [r for i, r in enumerate(records) if r.get('k') != 'baseline' or i == last_baseline]
+
+
+def _reset_journal(path, generation):
+    """Deja la bitácora con solo la marca de la generación del último segmento."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(dumps_compact({'k': 'checkpoint', 'ts': time.time(), 'd': generation}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def list_journals(directory=JOURNAL_DIR):
+    """Bitácoras pendientes (sesiones abiertas o sin compactar)."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(JOURNAL_SUFFIX)
+    )
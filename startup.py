@@ -0,0 +1,251 @@
+"""
+ARRANQUE RÁPIDO DEL SERVIDOR
+El analizador de voz y la pila de audio se importan hasta que se usan, así el
+servidor abre el puerto en cuanto carga Flask. Un hilo opcional precalienta
+analizadores (importa el módulo, crea las instancias y analiza una ventana
+sintética para cebar las rutas de NumPy/FFT) antes de que conecte la primera
+cabina. `StartupReport` guarda los tiempos de cada fase del arranque y de
+cada importación diferida; 'serving' se marca cuando el puerto ya acepta
+conexiones (wait_for_port), no antes.
+
+Reporte de importación (para seguir regresiones de arranque):
+    python startup.py                         # servidor de 'api flask.txt'
+    python startup.py --modulo api_server.py --top 20 --max-ms 800
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_POOL_SIZE = 2
+
+
+class StartupReport:
+    """Milisegundos desde el origen hasta cada fase, y costo de cada importación diferida."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = {}
+        self.imports = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """Registra la primera vez que el arranque llega a `phase`."""
+        with self._lock:
+            self.phases.setdefault(phase, round((time.perf_counter() - self.origin) * 1000, 1))
+
+    def import_module(self, name):
+        """Importa un módulo (si no estaba cargado) y anota cuánto tardó."""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.setdefault(name, round((time.perf_counter() - start) * 1000, 1))
+        return module
+
+    def as_dict(self):
+        with self._lock:
+            return {'phases_ms': dict(self.phases), 'lazy_imports_ms': dict(self.imports)}
+
+
+REPORT = StartupReport()
+
+
+def wait_for_port(port, host='127.0.0.1', timeout=60.0, interval=0.01):
+    """Espera a que `port` acepte conexiones. Regresa False si vence `timeout`."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1.0):
+                return True
+        except OSError:
+            time.sleep(interval)
+    return False
+
+
+class AnalyzerPool:
+    """
+    Analizadores listos para asignar a las cabinas.
+    La clase se importa la primera vez que se pide; si el módulo no existe o
+    `enabled` es False el pool queda en modo simulación (available() es False).
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, module='voice_analyzer',
+                 class_name='EmotionalVoiceAnalyzer', enabled=True, report=REPORT, **options):
+        self.size = size
+        self.module = module
+        self.class_name = class_name
+        self.enabled = enabled
+        self.report = report
+        self.options = options
+        self.status = 'cold' if enabled else 'disabled'
+        self._class = None
+        self._idle = []
+        self._lock = threading.Lock()
+        self._warm_thread = None
+
+    def analyzer_class(self):
+        """Clase del analizador (importada bajo demanda) o None en simulación."""
+        if self._class is None and self.enabled:
+            with self._lock:
+                if self._class is None and self.enabled:
+                    try:
+                        module = self.report.import_module(self.module)
+                        self._class = getattr(module, self.class_name)
+                    except ImportError as e:
+                        logger.warning(f"⚠️ {self.module} no disponible ({e}). Usando modo simulación.")
+                        self.enabled = False
+                        self.status = 'unavailable'
+        return self._class
+
+    def available(self):
+        return self.analyzer_class() is not None
+
+    def _create(self, device=None):
+        return self.analyzer_class()(device=device, **self.options)
+
+    @staticmethod
+    def _prime(analyzer):
+        """Analiza una ventana sintética para cebar FFT, buffers y rutas de NumPy."""
+        from voz_sintetica import generar_perfil
+        audio = generar_perfil('estable', segundos=analyzer.duration, rate=analyzer.sample_rate)
+        features = analyzer.extract_features(audio)
+        if features:
+            analyzer.classify_emotion(features)
+
+    # ------------------------------------------------------------------
+
+    def warm_up(self, background=True):
+        """Llena el pool con analizadores cebados (en un hilo propio por defecto)."""
+        if not background:
+            self._warm()
+            return self
+        if self._warm_thread is None:
+            self._warm_thread = threading.Thread(target=self._warm, name='analyzer-warmup', daemon=True)
+            self._warm_thread.start()
+        return self
+
+    def _warm(self):
+        if not self.available():
+            return
+        self.status = 'warming'
+        try:
+            while True:
+                with self._lock:
+                    if len(self._idle) >= self.size:
+                        break
+                analyzer = self._create()
+                self._prime(analyzer)
+                with self._lock:
+                    self._idle.append(analyzer)
+            self.status = 'ready'
+            self.report.mark('analyzers_warm')
+        except Exception as e:
+            self.status = 'cold'
+            logger.error(f"Error al precalentar analizadores: {e}")
+
+    def acquire(self, device=None):
+        """Analizador para una cabina: uno del pool si hay, si no uno nuevo."""
+        if not self.available():
+            return None
+        with self._lock:
+            analyzer = self._idle.pop() if self._idle else None
+        if analyzer is None:
+            return self._create(device)
+        analyzer.device = device
+        return analyzer
+
+    def release(self, analyzer):
+        """Devuelve un analizador al pool al cerrar la cabina."""
+        if analyzer is None:
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(analyzer)
+
+    def as_dict(self):
+        with self._lock:
+            return {'status': self.status, 'idle': len(self._idle), 'size': self.size}
+
+
+# ============================================================================
+# REPORTE DE IMPORTACIÓN (-X importtime)
+# ============================================================================
+
+LOAD_SNIPPET = """
+import importlib.machinery, importlib.util, os, sys, time
+sys.path.insert(0, {directory!r})
+os.chdir({workdir!r})
+start = time.perf_counter()
+loader = importlib.machinery.SourceFileLoader('server', {path!r})
+spec = importlib.util.spec_from_loader('server', loader)
+loader.exec_module(importlib.util.module_from_spec(spec))
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure_imports(path):
+    """
+    Carga el módulo `path` en un proceso nuevo con -X importtime.
+    Regresa (ms totales de carga, [(módulo, ms propios, ms acumulados)]).
+    """
+    code = LOAD_SNIPPET.format(directory=DIRECTORY, workdir=tempfile.mkdtemp(prefix='startup_'),
+                               path=os.path.abspath(path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de importación del servidor")
+    parser.add_argument('--modulo', default=os.path.join(DIRECTORY, 'api flask.txt'),
+                        help="Archivo del servidor a cargar")
+    parser.add_argument('--top', type=int, default=15, help="Módulos más lentos a mostrar")
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="Falla (código 1) si la carga tarda más que esto")
+    parser.add_argument('--json', help="Guardar el reporte en este archivo")
+    args = parser.parse_args(argv)
+
+    total_ms, modules = measure_imports(args.modulo)
+    slowest = sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]
+
+    print(f"\n{'módulo':<40}{'propio ms':>12}{'acumulado ms':>15}")
+    print('-' * 67)
+    for name, own, cumulative in slowest:
+        print(f"{name[:39]:<40}{own:>12.1f}{cumulative:>15.1f}")
+    print(f"\nCarga total: {total_ms:.0f} ms ({len(modules)} módulos)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'total_ms': round(total_ms, 1),
+                       'modules': [{'module': n, 'own_ms': o, 'cumulative_ms': c} for n, o, c in modules]},
+                      f, ensure_ascii=False, indent=2)
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"✗ La carga supera el límite de {args.max_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
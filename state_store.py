@@ -0,0 +1,246 @@
+"""
+ALMACÉN COLUMNAR DE ESTADOS DE SESIÓN
+Guarda el historial de estados emocionales en arreglos NumPy (timestamp
+float64, emoción y riesgo como códigos, características float32) en lugar
+de una lista de dicts. Los conteos, distribuciones y riesgo máximo se
+mantienen al agregar cada estado, así el resumen es O(1). Los dicts solo se
+arman cuando la API serializa. Cada estado también alimenta los rollups
+multi-resolución (rollups.py) para consultar rangos largos.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from rollups import Rollups
+
+EMOTIONS = ['neutral', 'estable', 'tristeza', 'ansiedad', 'depresion', 'crisis']
+RISK_LEVELS = ['normal', 'medio', 'alto', 'critico']
+FEATURE_NAMES = ['volume', 'pitch', 'tempo', 'pause_duration', 'speech_ratio']
+
+MAX_CODES = 255  # Los códigos se guardan en uint8
+
+
+def _code(table, index, value):
+    """Código de `value` en la tabla; valores nuevos se agregan al final."""
+    code = index.get(value)
+    if code is None:
+        if len(table) >= MAX_CODES:
+            raise ValueError(f"Demasiados valores distintos: {value!r}")
+        code = len(table)
+        table.append(value)
+        index[value] = code
+    return code
+
+
+class StateStore:
+    """
+    Historial de estados de una sesión en columnas de memoria fija.
+    Crece duplicando su capacidad hasta `max_states`; a partir de ahí
+    sobrescribe los más viejos (los agregados siguen contando todo).
+    """
+
+    def __init__(self, cabin_id=None, capacity=1024, max_states=200_000):
+        self.cabin_id = cabin_id
+        self.max_states = max_states
+        self._lock = threading.Lock()
+
+        # Tablas de códigos (propias de cada almacén)
+        self.emotions = list(EMOTIONS)
+        self.risk_levels = list(RISK_LEVELS)
+        self.explanations = ['']
+        self._emotion_index = {e: i for i, e in enumerate(self.emotions)}
+        self._risk_index = {r: i for i, r in enumerate(self.risk_levels)}
+        self._explanation_index = {'': 0}
+
+        self._allocate(min(capacity, max_states))
+        self._start = 0   # Posición física del estado más viejo
+        self._count = 0   # Estados guardados actualmente
+
+        # Agregados incrementales (de toda la sesión)
+        self.total = 0
+        self.emotion_counts = np.zeros(MAX_CODES, dtype=np.int64)
+        self.risk_counts = np.zeros(MAX_CODES, dtype=np.int64)
+        self.max_risk = -1
+        self.rollups = Rollups(len(FEATURE_NAMES))
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.emotion_codes = np.empty(capacity, dtype=np.uint8)
+        self.risk_codes = np.empty(capacity, dtype=np.uint8)
+        self.explanation_codes = np.empty(capacity, dtype=np.uint8)
+        self.confidence = np.empty(capacity, dtype=np.float32)
+        self.features = np.empty((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+
+    def _grow(self):
+        """Duplica la capacidad conservando el orden de los estados."""
+        old = [self.timestamps, self.emotion_codes, self.risk_codes,
+               self.explanation_codes, self.confidence, self.features]
+        order = self._physical(np.arange(self._count))
+        self._allocate(min(self.capacity * 2, self.max_states))
+        new = [self.timestamps, self.emotion_codes, self.risk_codes,
+               self.explanation_codes, self.confidence, self.features]
+        for src, dst in zip(old, new):
+            dst[:self._count] = src[order]
+        self._start = 0
+
+    def _physical(self, logical):
+        return (self._start + logical) % self.capacity
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def append(self, state_data, timestamp=None):
+        """Agrega un estado (dict de la API) y actualiza los agregados."""
+        timestamp = time.time() if timestamp is None else timestamp
+        features = state_data.get('features') or {}
+
+        with self._lock:
+            emotion = _code(self.emotions, self._emotion_index, state_data.get('emotion', 'neutral'))
+            risk = _code(self.risk_levels, self._risk_index, state_data.get('risk_level', 'normal'))
+            explanation = self._explanation_code(state_data.get('explanation', ''))
+
+            if self._count == self.capacity and self.capacity < self.max_states:
+                self._grow()
+
+            if self._count < self.capacity:
+                pos = self._physical(self._count)
+                self._count += 1
+            else:
+                # Lleno: se sobrescribe el más viejo
+                pos = self._start
+                self._start = (self._start + 1) % self.capacity
+
+            self.timestamps[pos] = timestamp
+            self.emotion_codes[pos] = emotion
+            self.risk_codes[pos] = risk
+            self.explanation_codes[pos] = explanation
+            self.confidence[pos] = state_data.get('confidence', 0) or 0
+            self.features[pos] = [features.get(name, np.nan) for name in FEATURE_NAMES]
+
+            self.total += 1
+            self.emotion_counts[emotion] += 1
+            self.risk_counts[risk] += 1
+            if risk < len(RISK_LEVELS):
+                self.max_risk = max(self.max_risk, risk)
+            self.rollups.add(timestamp, emotion, risk if risk < len(RISK_LEVELS) else -1, self.features[pos])
+            return self.total - 1
+
+    def _explanation_code(self, text):
+        # Las explicaciones se repiten mucho; si hay demasiadas distintas
+        # las nuevas se guardan vacías en lugar de fallar
+        try:
+            return _code(self.explanations, self._explanation_index, text or '')
+        except ValueError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def _view(self, pos):
+        """Arma el dict de la API para la posición física `pos`."""
+        state = {
+            'emotion': self.emotions[self.emotion_codes[pos]],
+            'risk_level': self.risk_levels[self.risk_codes[pos]],
+            'confidence': round(float(self.confidence[pos]), 2),
+            'timestamp': datetime.fromtimestamp(self.timestamps[pos]).isoformat()
+        }
+        explanation = self.explanations[self.explanation_codes[pos]]
+        if explanation:
+            state['explanation'] = explanation
+        row = self.features[pos]
+        if not np.all(np.isnan(row)):
+            state['features'] = {
+                name: round(float(v), 3) for name, v in zip(FEATURE_NAMES, row) if not np.isnan(v)
+            }
+        if self.cabin_id is not None:
+            state['cabin_id'] = self.cabin_id
+        return state
+
+    def latest(self):
+        """Último estado como dict, o None si no hay datos."""
+        with self._lock:
+            if not self._count:
+                return None
+            return self._view(self._physical(self._count - 1))
+
+    def last(self, n):
+        """Los últimos n estados como dicts (del más viejo al más nuevo)."""
+        with self._lock:
+            n = min(n, self._count)
+            return [self._view(self._physical(i)) for i in range(self._count - n, self._count)]
+
+    def between(self, start, end, limit):
+        """
+        Estados crudos con timestamp en [start, end] (los `limit` más nuevos).
+        Búsqueda binaria sobre el anillo: no recorre la sesión completa.
+        """
+        with self._lock:
+            first = self._search(start, strict=False)
+            last = self._search(end, strict=True)
+            first = max(first, last - limit)
+            return [self._view(self._physical(i)) for i in range(first, last)]
+
+    def _search(self, timestamp, strict):
+        """Primer índice lógico con timestamp >= (o > si `strict`) el dado."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self.timestamps[self._physical(mid)]
+            if value < timestamp or (strict and value == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def history(self, start, end, resolution=None):
+        """Buckets agregados de [start, end] (ver rollups.py): tamaño acotado, tiempo constante."""
+        with self._lock:
+            return self.rollups.query(start, end, resolution, self.emotions,
+                                      self.risk_levels, FEATURE_NAMES)
+
+    def to_dicts(self):
+        """Todos los estados guardados como dicts (solo para serializar)."""
+        return self.last(self._count)
+
+    def column(self, name):
+        """Copia ordenada de una columna: 'timestamp', 'confidence' o una característica."""
+        with self._lock:
+            order = self._physical(np.arange(self._count))
+            if name == 'timestamp':
+                return self.timestamps[order]
+            if name == 'confidence':
+                return self.confidence[order]
+            return self.features[order, FEATURE_NAMES.index(name)]
+
+    def summary(self):
+        """Resumen de la sesión en tiempo constante a partir de los agregados."""
+        with self._lock:
+            if not self.total:
+                return {'status': 'no_data'}
+
+            emotions = {self.emotions[i]: int(c) for i, c in enumerate(self.emotion_counts[:len(self.emotions)]) if c}
+            risks = {self.risk_levels[i]: int(c) for i, c in enumerate(self.risk_counts[:len(self.risk_levels)]) if c}
+            return {
+                'dominant_emotion': self.emotions[int(np.argmax(self.emotion_counts))],
+                'emotion_distribution': emotions,
+                'max_risk_level': RISK_LEVELS[self.max_risk] if self.max_risk >= 0 else 'normal',
+                'risk_distribution': risks,
+                'total_analyses': self.total
+            }
+
+    def nbytes(self):
+        """Memoria ocupada por las columnas."""
+        return sum(a.nbytes for a in (self.timestamps, self.emotion_codes, self.risk_codes,
+                                      self.explanation_codes, self.confidence, self.features)) + self.rollups.nbytes()
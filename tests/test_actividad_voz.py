@@ -0,0 +1,54 @@
+"""
+Pruebas de la detección de actividad de voz (actividad_voz.py).
+"""
+
+import numpy as np
+import pytest
+
+from actividad_voz import DetectorVoz
+
+
+def _ventana(n, ruido_db=-60.0, voz=(), voz_db=-10.0):
+    db = np.full(n, ruido_db)
+    for inicio, fin in voz:
+        db[inicio:fin] = voz_db
+    return db
+
+
+def test_piso_de_ruido_baja_de_inmediato_y_sube_despacio():
+    detector = DetectorVoz(subida_db_por_seg=0.5)
+    assert detector.procesar_db(_ventana(50))['piso_db'] == -60.0
+
+    # Un ruido más fuerte solo sube el piso a 0.5 dB por segundo de audio nuevo
+    detector.procesar_db(_ventana(50, ruido_db=-30.0))
+    assert detector.piso_db == pytest.approx(-59.5)
+    detector.procesar_db(_ventana(50, ruido_db=-30.0), avance_seg=0.5)
+    assert detector.piso_db == pytest.approx(-59.25)
+    # ... y un ruido más bajo lo baja de golpe
+    assert detector.procesar_db(_ventana(50, ruido_db=-70.0))['piso_db'] == -70.0
+
+
+def test_ruido_que_sube_no_se_vuelve_voz():
+    detector = DetectorVoz()
+    detector.procesar_db(_ventana(150))
+    # 6 dB sobre el piso anterior: no alcanza el margen, nunca es voz
+    resultado = detector.procesar_db(_ventana(150, ruido_db=-54.0))
+    assert not resultado['voz'] and resultado['ratio_voz'] == 0.0
+
+
+@pytest.mark.parametrize('colgado_seg', [0.3, 3.0])
+def test_colgado_mantiene_la_voz_tras_la_ultima_trama(colgado_seg):
+    detector = DetectorVoz(colgado_seg=colgado_seg)
+    colgado = detector.tramas_colgado
+    # Con 3 s el colgado pasa de 127 tramas: una suma en int8 se desbordaba
+    resultado = detector.procesar_db(_ventana(400, voz=[(10, 200)]))
+    activas = min(400, 200 + colgado) - 10
+    assert resultado['voz']
+    assert resultado['ratio_voz'] == pytest.approx(activas / 400)
+
+
+def test_colgado_une_tramos_de_voz_cercanos():
+    detector = DetectorVoz(colgado_seg=0.1)   # 5 tramas
+    resultado = detector.procesar_db(_ventana(100, voz=[(0, 10), (14, 20), (40, 50)]))
+    # 0-24 (huecos de 4 cubiertos) y 40-54
+    assert resultado['ratio_voz'] == pytest.approx((25 + 15) / 100)
@@ -0,0 +1,55 @@
+"""
+Pruebas del despachador de alertas (alert_dispatcher.py).
+"""
+
+import time
+
+from alert_dispatcher import (AlertDispatcher, StubNotifier, PRIORITY_CRITICAL,
+                              PRIORITY_NORMAL)
+
+
+def _esperar(alerta, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while alerta.status == 'pending' and time.monotonic() < limite:
+        time.sleep(0.01)
+    return alerta.status
+
+
+def test_la_critica_se_adelanta_a_las_de_menor_prioridad():
+    stub = StubNotifier(delay=0.2)
+    despachador = AlertDispatcher([stub], workers=1)
+    primera = despachador.dispatch({'incident_id': 'ocupa'}, PRIORITY_NORMAL)
+    time.sleep(0.05)  # El único hilo ya está enviando la primera
+    normales = [despachador.dispatch({'incident_id': f'n{i}'}, PRIORITY_NORMAL) for i in range(3)]
+    critica = despachador.dispatch({'incident_id': 'critica'}, PRIORITY_CRITICAL)
+
+    for alerta in [primera, critica] + normales:
+        assert _esperar(alerta) == 'sent'
+    assert [i['incident_id'] for i in stub.sent] == ['ocupa', 'critica', 'n0', 'n1', 'n2']
+
+
+def test_reintenta_hasta_lograrlo():
+    stub = StubNotifier(failures=2)
+    despachador = AlertDispatcher([stub], workers=1)
+    alerta = despachador.dispatch({'incident_id': 'INC_1'})
+    assert _esperar(alerta) == 'sent'
+    assert alerta.attempts == 3
+    assert despachador.retries == 2 and despachador.sent == 1
+    assert stub.sent == [{'incident_id': 'INC_1'}]
+
+
+def test_se_rinde_al_vencer_el_limite():
+    despachador = AlertDispatcher([StubNotifier(failures=100)], workers=1, deadline=0.5)
+    alerta = despachador.dispatch({'incident_id': 'INC_1'})
+    assert _esperar(alerta) == 'expired'
+    assert despachador.failed == 1 and despachador.sent == 0
+    assert alerta.pending
+
+
+def test_una_muestra_de_latencia_por_etapa():
+    despachador = AlertDispatcher([StubNotifier(failures=2)], workers=1)
+    alerta = despachador.dispatch({'incident_id': 'INC_1'})
+    assert _esperar(alerta) == 'sent'
+    etapas = despachador.latency_stats()['stages']
+    assert set(etapas) == {'queued', 'dispatched', 'notified_stub', 'notified'}
+    assert all(etapa['count'] == 1 for etapa in etapas.values())
@@ -0,0 +1,27 @@
+"""
+Pruebas de la reanudación del análisis por lotes (analisis_lotes.py).
+"""
+
+import json
+
+from analisis_lotes import archivos_completados
+
+
+def _linea(fila):
+    return json.dumps(fila) + '\n'
+
+
+def test_reanudar_reintenta_los_archivos_con_error(tmp_path):
+    salida = tmp_path / 'r.jsonl'
+    bloques = [
+        _linea({'tipo': 'ventana', 'archivo': 'a.wav', 'indice': 0}),
+        _linea({'tipo': 'archivo', 'archivo': 'a.wav', 'ventanas': 1}),
+        _linea({'tipo': 'archivo', 'archivo': 'b.wav', 'error': 'no se pudo leer'}),
+        _linea({'tipo': 'ventana', 'archivo': 'c.wav', 'indice': 0}),
+        _linea({'tipo': 'archivo', 'archivo': 'c.wav', 'ventanas': 1}),
+    ]
+    # Bloque cortado al final (corrida interrumpida)
+    salida.write_text(''.join(bloques) + _linea({'tipo': 'ventana', 'archivo': 'd.wav'}) + '{"tipo"')
+
+    assert archivos_completados(str(salida)) == {'a.wav', 'c.wav'}
+    assert salida.read_text() == ''.join(bloques[:2] + bloques[3:])
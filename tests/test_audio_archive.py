@@ -0,0 +1,49 @@
+"""
+Pruebas del archivo de audio por sesión (audio_archive.py).
+"""
+
+import io
+import wave
+
+import numpy as np
+
+import audio_archive
+
+
+def test_iter_wav_por_bloques_igual_a_la_rebanada(tmp_path):
+    archivo = audio_archive.AudioArchive(str(tmp_path))
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        archivo.append('s1', rng.integers(-3000, 3000, (16000, 2)).astype(np.int16), 16000, timestamp=i)
+    archivo.close_session('s1')
+    archivo.flush(5)
+
+    sesion = audio_archive.open_session('s1', str(tmp_path))
+    for rango in [(0.0, None), (1.5, 3.2)]:
+        datos = b''.join(sesion.iter_wav(*rango, chunk_frames=1000))
+        assert len(datos) == sesion.wav_size(*rango)
+        with wave.open(io.BytesIO(datos)) as wf:
+            assert (wf.getnchannels(), wf.getframerate()) == (2, 16000)
+            muestras = np.frombuffer(wf.readframes(wf.getnframes()), np.int16).reshape(-1, 2)
+        np.testing.assert_array_equal(muestras, sesion.slice(*rango))
+
+
+def test_bytes_lleva_el_total_en_disco(tmp_path):
+    def en_disco():
+        return sum(p.stat().st_size for p in tmp_path.iterdir())
+
+    archivo = audio_archive.AudioArchive(str(tmp_path), max_bytes=10 ** 9)
+    for sesion in ('s1', 's2'):
+        for i in range(3):
+            archivo.append(sesion, np.zeros((16000, 2), dtype=np.int16), 16000, timestamp=i)
+    archivo.flush(5)
+    assert archivo.stats()['bytes'] == en_disco()
+
+    # Cerrar recorta la preasignación; la retención borra y descuenta
+    archivo.close_session('s1')
+    archivo.flush(5)
+    assert archivo.stats()['bytes'] == en_disco()
+    archivo.max_bytes = 1
+    archivo.close_session('s2')
+    archivo.flush(5)
+    assert archivo.stats()['bytes'] == en_disco() == 0
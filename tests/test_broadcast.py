@@ -0,0 +1,116 @@
+"""
+Pruebas de la difusión de estados por WebSocket (broadcast.py).
+"""
+
+import time
+
+import pytest
+
+from broadcast import COALESCED, StateBroadcaster, apply_delta
+
+
+class _SocketFalso:
+    """Registra las emisiones en lugar de enviarlas."""
+
+    def __init__(self):
+        self.emitidos = []
+
+    def emit(self, evento, datos, to=None):
+        self.emitidos.append((evento, datos, to))
+
+    def de(self, evento):
+        return [(datos, to) for e, datos, to in self.emitidos if e == evento]
+
+
+@pytest.fixture
+def socketio():
+    return _SocketFalso()
+
+
+@pytest.fixture
+def difusor(socketio):
+    # Tick muy largo: los envíos solo ocurren al llamar flush() en la prueba
+    difusor = StateBroadcaster(socketio, lambda cabin_id: f'sala-{cabin_id}', tick=3600, room_rate=10)
+    yield difusor
+    difusor.stop()
+
+
+def _estado(riesgo, volumen, **extra):
+    return {'risk_level': riesgo, 'features': {'volumen': volumen, 'pausas': 0.3}, **extra}
+
+
+def test_sala_limitada_por_tasa_y_coalescida(difusor, socketio):
+    coalescidos = COALESCED.value
+    difusor.publish('c1', _estado('bajo', 1))
+    difusor.flush()
+    assert socketio.de('state_update') == [(_estado('bajo', 1), 'sala-c1')]
+
+    # Dentro del intervalo de la sala no sale nada; solo viaja el más reciente
+    difusor.publish('c1', _estado('bajo', 2))
+    difusor.publish('c1', _estado('medio', 3))
+    difusor.publish('c2', _estado('bajo', 9))
+    difusor.flush()
+    assert socketio.de('state_update')[1:] == [(_estado('bajo', 9), 'sala-c2')]
+    assert COALESCED.value - coalescidos == 1
+
+    time.sleep(0.12)
+    difusor.flush()
+    assert socketio.de('state_update')[2:] == [(_estado('medio', 3), 'sala-c1')]
+    difusor.flush()
+    assert len(socketio.de('state_update')) == 3
+
+
+def test_delta_contra_el_estado_confirmado(difusor, socketio):
+    difusor.subscribe('cliente', ['c1'], rate=20, delta=True)
+    a = _estado('bajo', 1, chat=['hola'])
+    b = _estado('medio', 2, chat=['hola'])
+    c = _estado('medio', 3)
+
+    difusor.publish('c1', a)
+    difusor.flush()
+    primero = socketio.de('state_updates')[-1][0]['updates'][0]
+    assert primero == {'cabin_id': 'c1', 'seq': 1, 'state': a}
+
+    # Sin confirmación no hay base: el siguiente vuelve a ir completo
+    time.sleep(0.06)
+    difusor.publish('c1', b)
+    difusor.flush()
+    assert socketio.de('state_updates')[-1][0]['updates'][0]['state'] == b
+
+    # El cliente confirma solo el 1: el delta va contra `a`, no contra `b`
+    difusor.ack('cliente', 'c1', 1)
+    time.sleep(0.06)
+    difusor.publish('c1', c)
+    difusor.flush()
+    delta = socketio.de('state_updates')[-1][0]['updates'][0]
+    assert (delta['seq'], delta['base']) == (3, 1)
+    assert delta['set'] == {'risk_level': 'medio', 'features.volumen': 3}
+    assert delta['unset'] == ['chat']
+    assert apply_delta(a, delta['set'], delta['unset']) == c
+
+    # Confirmar un seq que ya no está pendiente no cambia la base
+    difusor.ack('cliente', 'c1', 1)
+    difusor.ack('cliente', 'c1', 3)
+    time.sleep(0.06)
+    difusor.publish('c1', _estado('medio', 4))
+    difusor.flush()
+    delta = socketio.de('state_updates')[-1][0]['updates'][0]
+    assert (delta['base'], delta['set']) == (3, {'features.volumen': 4})
+
+
+def test_urgente_sale_sin_esperar_la_tasa(difusor, socketio):
+    difusor.subscribe('cliente', ['c1'], rate=0.1)
+    difusor.publish('c1', _estado('bajo', 1))
+    difusor.flush()
+    assert len(socketio.de('state_update')) == len(socketio.de('state_updates')) == 1
+
+    difusor.publish('c1', _estado('medio', 2))
+    difusor.flush()
+    assert len(socketio.de('state_update')) == 1
+
+    # El crítico sale de inmediato a la sala y al cliente, sin llamar a flush
+    critico = _estado('critico', 5)
+    difusor.publish('c1', critico, urgent=True)
+    assert socketio.de('state_update')[-1] == (critico, 'sala-c1')
+    assert socketio.de('state_updates')[-1] == ({'updates': [{'cabin_id': 'c1', 'seq': 3, 'state': critico}]},
+                                               'cliente')
@@ -0,0 +1,63 @@
+"""
+Pruebas del clasificador por tabla de reglas (clasificador.py) con los
+perfiles deterministas de voz_sintetica.py.
+"""
+
+import numpy as np
+import pytest
+
+from clasificador import CARACTERISTICAS, NIVELES_RIESGO, REGLAS, TablaCompilada
+from demo_voz_real import AnalizadorVozSimple
+from voz_sintetica import generar_perfil
+
+SEMILLAS = range(20)
+
+
+@pytest.fixture(scope='module')
+def analizador():
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    analizador.PERSONALIZAR = False  # Umbrales absolutos: sin línea base
+    return analizador
+
+
+def _analizar(analizador, perfil, semilla):
+    analizador.vad.reiniciar()
+    return analizador.analizar_audio(generar_perfil(perfil, semilla=semilla))
+
+
+@pytest.mark.parametrize('perfil, riesgo', [('crisis', 'critico'), ('depresion', 'alto')])
+def test_perfil_sintetico_se_clasifica(analizador, perfil, riesgo):
+    resultado = _analizar(analizador, perfil, 0)
+    assert resultado['emocion'] == perfil
+    assert resultado['riesgo'] == riesgo
+
+
+@pytest.mark.parametrize('perfil', ['crisis', 'depresion'])
+def test_perfil_sintetico_nunca_es_estable(analizador, perfil):
+    resultados = [_analizar(analizador, perfil, semilla) for semilla in SEMILLAS]
+    aciertos = sum(r['emocion'] == perfil for r in resultados)
+    assert aciertos >= 0.75 * len(resultados)
+    # Lo que no acierta cae en la otra clase grave, nunca en riesgo normal o medio
+    alto = NIVELES_RIESGO.index('alto')
+    assert all(NIVELES_RIESGO.index(r['riesgo']) >= alto for r in resultados)
+
+
+def test_clasificar_y_clasificar_lote_coinciden():
+    tabla = TablaCompilada()
+    rng = np.random.default_rng(0)
+    escalas = np.array([10000.0, 10000.0, 4000.0, 3.0])
+    matriz = rng.uniform(0.0, 1.0, (5000, len(CARACTERISTICAS))) ** 3 * escalas
+
+    # Filas justo en los umbrales numéricos: los límites abiertos y los de
+    # <= / >= deben resolverse igual en las dos rutas
+    umbrales = sorted({(CARACTERISTICAS.index(nombre), float(valor))
+                       for *_, condiciones in REGLAS
+                       for nombre, _, valor in condiciones if not isinstance(valor, str)})
+    en_limite = np.repeat(matriz[:len(umbrales)], 3, axis=0)
+    for i, (c, valor) in enumerate(umbrales):
+        en_limite[3 * i:3 * i + 3, c] = [np.nextafter(valor, -np.inf), valor, np.nextafter(valor, np.inf)]
+    matriz = np.vstack([matriz, en_limite])
+
+    emociones, riesgos, explicaciones = tabla.clasificar_lote(matriz)
+    for fila, emocion, riesgo, explicacion in zip(matriz, emociones, riesgos, explicaciones):
+        assert tabla.clasificar(tuple(fila)) == (emocion, riesgo, explicacion)
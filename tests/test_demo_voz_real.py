@@ -0,0 +1,45 @@
+"""
+Pruebas del análisis continuo del demo (demo_voz_real.py).
+"""
+
+import numpy as np
+
+from demo_voz_real import AnalizadorVozSimple
+from voz_sintetica import generar_perfil
+
+
+class _CapturaFalsa:
+    """Ventanas deslizantes de una señal; las de `saltar` se pierden como en CapturaContinua."""
+
+    def __init__(self, senal, muestras_ventana, muestras_salto, saltar=()):
+        self.senal = senal
+        self.muestras_ventana = muestras_ventana
+        self.muestras_salto = muestras_salto
+        self.saltar = set(saltar)
+        self.ventanas_perdidas = 0
+
+    def ventanas(self):
+        fin = len(self.senal) - self.muestras_ventana + 1
+        for k, inicio in enumerate(range(0, fin, self.muestras_salto)):
+            if k in self.saltar:
+                self.ventanas_perdidas += 1
+                continue
+            yield self.senal[inicio:inicio + self.muestras_ventana]
+
+
+def test_espectros_tras_ventanas_perdidas_igual_a_la_transformada_completa():
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    rate = analizador.RATE
+    senal = generar_perfil('estable', segundos=6.0, rate=rate)
+    argumentos = (senal, int(analizador.VENTANA_SEGUNDOS * rate), int(analizador.SALTO_SEGUNDOS * rate))
+    esperadas = list(_CapturaFalsa(*argumentos, saltar={2, 3}).ventanas())
+
+    captura = _CapturaFalsa(*argumentos, saltar={2, 3})
+    for i, _ in enumerate(analizador.analisis_continuo(captura, suavizar=False)):
+        # Con y sin hueco, el anillo debe tener solo tramas de esta ventana
+        ventana = analizador._a_float(esperadas[i])
+        tramas = analizador.stft.tramas_para(len(ventana))
+        anillo = analizador.stft.ultimas(tramas)['potencia']
+        completo = analizador.stft.analizar(ventana)['potencia']
+        np.testing.assert_allclose(anillo, completo, rtol=1e-4, atol=1e-7)
+    assert captura.ventanas_perdidas == 2 and i == len(esperadas) - 1
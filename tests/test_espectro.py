@@ -0,0 +1,45 @@
+"""
+Pruebas del frente STFT compartido (espectro.py).
+"""
+
+import numpy as np
+import pytest
+
+from actividad_voz import DetectorVoz, potencia_db
+from espectro import FrenteSTFT, energia
+from voz_sintetica import generar_perfil
+
+
+@pytest.mark.parametrize('ventana', ['rect', 'hann'])
+def test_energia_parseval_igual_a_la_del_tiempo(ventana):
+    frente = FrenteSTFT(16000, tam_trama=400, salto=400, ventana=ventana)
+    x = generar_perfil('estable').astype(np.float32) / 32768.0
+    plan = frente.plan
+    espectral = energia(frente.analizar(x)['potencia'], plan) / plan.tam_trama
+    tiempo = (x[:len(espectral) * 400].reshape(-1, 400) ** 2).mean(axis=1)
+    if ventana == 'rect':
+        np.testing.assert_allclose(espectral, tiempo, rtol=1e-3, atol=1e-9)
+    else:
+        # Con ventana es una estimación: en promedio, sin sesgo en dB
+        diferencia = np.mean(potencia_db(espectral)) - np.mean(potencia_db(tiempo))
+        assert abs(diferencia) < 0.5
+
+
+def test_vad_con_hann_en_el_nivel_del_tiempo():
+    frente = FrenteSTFT(16000, tam_trama=400, salto=160, ventana='hann')
+    detector = DetectorVoz(16000, trama_seg=0.01)
+    x = generar_perfil('crisis').astype(np.float32) / 32768.0
+    db = potencia_db(energia(frente.analizar(x)['potencia'], frente.plan) / frente.plan.tam_trama)
+    assert abs(np.mean(db) - np.mean(detector.energia_db(x))) < 0.5
+
+
+def test_agregar_incremental_igual_a_analizar():
+    frente = FrenteSTFT(16000, tam_trama=666, salto=160, nfft=1024, bordes=266, max_tramas=400)
+    x = generar_perfil('estable', segundos=4.0).astype(np.float32) / 32768.0
+    completo = frente.analizar(x)
+    for inicio in range(0, len(x), 8000):
+        frente.agregar(x[inicio:inicio + 8000])
+    assert frente.total == len(completo['potencia'])
+    ultimas = frente.ultimas(300)
+    for clave, valores in ultimas.items():
+        np.testing.assert_allclose(valores, completo[clave][-300:], rtol=1e-4, atol=1e-4)
@@ -0,0 +1,48 @@
+"""
+Pruebas de la línea base de la voz por sesión (linea_base.py).
+"""
+
+from collections import Counter
+
+from demo_voz_real import AnalizadorVozSimple
+from linea_base import LineaBase
+from voice_analyzer import EmotionalVoiceAnalyzer
+from voz_sintetica import generar_perfil
+
+REFERENCIA = {'volumen': (3000.0, 1500.0), 'pausas': (0.3, 0.3)}
+
+
+def test_normalizar_mueve_a_lo_mas_una_desviacion():
+    base = LineaBase(REFERENCIA, min_ventanas=3)
+    for volumen in (100.0, 110.0, 90.0, 100.0):
+        base.actualizar({'volumen': volumen, 'pausas': 0.3})
+    normalizado = base.normalizar({'volumen': 100.0, 'pausas': 0.3, 'otra': 1})
+    # Sin límite iría a ~3000 (la media de referencia); se mueve solo 1500
+    assert normalizado['volumen'] == 1600.0
+    assert normalizado['otra'] == 1
+
+
+def test_depresion_sostenida_no_se_vuelve_estable_en_el_demo():
+    analizador = AnalizadorVozSimple(usar_microfono=False)
+    resultados = [analizador.analizar_audio(generar_perfil('depresion', semilla=s)) for s in range(40)]
+    emociones = Counter(r['emocion'] for r in resultados[20:])
+    assert emociones['estable'] == 0
+    assert emociones['depresion'] >= 15
+
+
+def test_depresion_sostenida_no_se_vuelve_estable_en_la_api():
+    analizador = EmotionalVoiceAnalyzer()
+    base = analizador.new_baseline()
+    sin_base, con_base = Counter(), Counter()
+    for semilla in range(40):
+        features = analizador.extract_features(generar_perfil('depresion', semilla=semilla))
+        emocion, riesgo, _, _ = analizador.classify_emotion(features, base)
+        if riesgo not in ('alto', 'critico'):
+            base.actualizar(features)
+        if semilla >= 20:
+            con_base[emocion] += 1
+            sin_base[analizador.classify_emotion(features)[0]] += 1
+    # La base solo puede bajar lo que ya era leve; depresión y crisis se respetan
+    graves = ('depresion', 'crisis')
+    assert sum(con_base[e] for e in graves) >= sum(sin_base[e] for e in graves)
+    assert con_base['estable'] <= sin_base['estable'] + 5
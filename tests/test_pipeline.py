@@ -0,0 +1,103 @@
+"""
+Pruebas del pipeline de análisis por etapas (pipeline.py).
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+import metrics
+from pipeline import AnalysisPipeline, DropOldestQueue, Empty
+
+
+def _fuente(elementos):
+    """Entrega los elementos y luego se queda esperando, como un micrófono sin datos."""
+    pendientes = list(elementos)
+    detenida = threading.Event()
+
+    def fuente():
+        if pendientes:
+            return pendientes.pop(0)
+        detenida.wait(0.05)
+        return None
+
+    return fuente
+
+
+def _esperar(condicion, limite=5.0):
+    fin = time.monotonic() + limite
+    while not condicion() and time.monotonic() < fin:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_cola_descarta_el_mas_viejo():
+    cola = DropOldestQueue(2)
+    assert not cola.put(1)
+    assert not cola.put(2)
+    assert cola.put(3)
+    assert cola.dropped == 1
+    assert [cola.get(0), cola.get(0)] == [2, 3]
+    with pytest.raises(Empty):
+        cola.get(0.01)
+
+
+def test_cola_cuenta_descartes_de_none_y_cancela_futures():
+    cola = DropOldestQueue(1)
+    futuro = Future()
+    cola.put(None)
+    # Descartar un None también cuenta: no sirve el valor descartado para saberlo
+    assert cola.put(futuro)
+    assert cola.put('siguiente')
+    assert cola.dropped == 2
+    assert futuro.cancelled()
+
+
+def test_futures_se_resuelven_en_orden_entre_etapas():
+    recibidos = []
+
+    def lenta_al_principio(i):
+        # Las primeras ventanas tardan más: terminan después que las siguientes
+        time.sleep(0.02 * (8 - i))
+        return i * 10
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pipeline = AnalysisPipeline(
+            'prueba', _fuente(range(8)),
+            [('features', lenta_al_principio, pool), ('doble', lambda x: x * 2, None)],
+            lambda x: recibidos.append(x) if x is not None else None,
+            queue_size=32
+        ).start()
+        try:
+            assert _esperar(lambda: len(recibidos) >= 8)
+        finally:
+            pipeline.stop()
+
+    assert recibidos[:8] == [i * 20 for i in range(8)]
+    assert pipeline.status()['features']['dropped'] == 0
+
+
+def test_envio_lento_descarta_y_cuenta():
+    antes = metrics.WINDOWS_DROPPED.value
+    recibidos = []
+
+    def envio_lento(x):
+        time.sleep(0.05)
+        recibidos.append(x)
+
+    pipeline = AnalysisPipeline('prueba', _fuente(range(50)), [('id', lambda x: x, None)],
+                                envio_lento, queue_size=1).start()
+    try:
+        assert _esperar(lambda: len(recibidos) >= 5)
+    finally:
+        pipeline.stop()
+
+    estado = pipeline.status()
+    descartados = estado['id']['dropped'] + estado['sink']['dropped']
+    assert descartados > 0
+    assert metrics.WINDOWS_DROPPED.value - antes == descartados
+    # Lo que llega sale en orden aunque falten ventanas
+    llegados = [x for x in recibidos if x is not None]
+    assert llegados == sorted(llegados)
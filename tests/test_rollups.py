@@ -0,0 +1,39 @@
+"""
+Pruebas de los rollups multi-resolución (rollups.py).
+"""
+
+import numpy as np
+
+from rollups import MAX_POINTS, Rollups
+
+EMOCIONES = ['neutral', 'estable']
+RIESGOS = ['normal', 'medio', 'alto', 'critico']
+INICIO = 1_700_000_400.0  # Múltiplo de todas las resoluciones
+
+
+def _llenar(rollups, segundos, paso=10):
+    for t in np.arange(INICIO, INICIO + segundos, paso):
+        rollups.add(t, 1, 0, np.array([1.0], dtype=np.float32))
+
+
+def test_sin_estados_no_ocupa_memoria():
+    assert Rollups(5).nbytes() == 0
+
+
+def test_crece_sin_perder_buckets():
+    rollups = Rollups(1)
+    _llenar(rollups, 3 * 3600)
+    consulta = rollups.query(INICIO, INICIO + 3 * 3600, 60, EMOCIONES, RIESGOS, ['x'])
+    assert len(consulta['buckets']) == 180
+    assert all(b['count'] == 6 for b in consulta['buckets'])
+    # Solo lo que abarca la sesión, no los anillos completos
+    assert rollups.nbytes() < Rollups(1).series[0].capacity * 100
+
+
+def test_resolucion_explicita_recortada_reporta_el_inicio_efectivo():
+    rollups = Rollups(1)
+    _llenar(rollups, 3 * 3600)
+    fin = INICIO + 3 * 3600 - 10
+    consulta = rollups.query(INICIO, fin, 10, EMOCIONES, RIESGOS, ['x'])
+    assert len(consulta['buckets']) == MAX_POINTS
+    assert consulta['from'] == consulta['buckets'][0]['start_ts'] > INICIO
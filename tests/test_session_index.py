@@ -0,0 +1,36 @@
+"""
+Pruebas del índice de sesiones e incidentes (session_index.py).
+"""
+
+import pytest
+
+from session_index import SessionIndex
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return SessionIndex(str(tmp_path / 'index.sqlite3'), commit_interval=0.01)
+
+
+def _cierre(session_id):
+    return {'session_id': session_id, 'end_time': 1_700_000_100.0, 'duration_seconds': 100.0,
+            'states_count': 3, 'summary': {'dominant_emotion': 'estable', 'max_risk_level': 'medio'}}
+
+
+def test_cerrar_dos_veces_cuenta_una(indice):
+    indice.session_started('s1', 'c1', 1_700_000_000.0)
+    indice.session_closed(_cierre('s1'))
+    assert indice.flush(5)
+    # Recuperación de una bitácora que ya terminaba en 'end'
+    indice.session_closed(_cierre('s1'))
+    assert indice.flush(5)
+    assert indice.stats()['sessions_closed'] == 1
+    assert indice.query_sessions(status='closed')[0]['session_id'] == 's1'
+
+
+def test_estado_de_incidente_desconocido(indice):
+    indice.incident_recorded({'incident_id': 'INC_1', 'session_id': 's1', 'cabin_id': 'c1',
+                              'timestamp': 1_700_000_000.0, 'status': 'active'})
+    assert indice.incident_status('INC_X', 'resolved', timeout=5) is False
+    assert indice.incident_status('INC_1', 'resolved', timeout=5) is True
+    assert indice.stats()['incidents_active'] == 0
@@ -0,0 +1,78 @@
+"""
+Pruebas de la bitácora de sesión (session_journal.py).
+"""
+
+import os
+import shutil
+
+import pytest
+
+from session_journal import (JournalWriter, SessionJournal, checkpoint_path, list_checkpoints,
+                             read_journal, read_session)
+
+
+@pytest.fixture
+def writer():
+    return JournalWriter(fsync_interval=0.05)
+
+
+def _escribir(journal, estados):
+    journal.record('start', {'session_id': journal.session_id})
+    for i in range(estados):
+        journal.record('state', {'i': i}, timestamp=float(i))
+        if i % 10 == 9:
+            journal.record('baseline', {'n': i})
+
+
+def test_compacta_por_cantidad_de_registros(tmp_path, writer):
+    journal = SessionJournal('s1', writer, str(tmp_path), compact_records=25)
+    _escribir(journal, 100)
+    assert writer.flush(5)
+
+    registros = read_session(journal.path)
+    assert [r['d']['i'] for r in registros if r['k'] == 'state'] == list(range(100))
+    assert registros[0]['k'] == 'start'
+    # Solo queda la línea base más reciente de lo compactado
+    assert [r['d']['n'] for r in registros if r['k'] == 'baseline'][-1] == 99
+    assert len(read_journal(journal.path)) < 25
+    assert list_checkpoints(journal.path)
+
+
+def test_cada_compactacion_escribe_solo_lo_nuevo(tmp_path, writer):
+    journal = SessionJournal('s1', writer, str(tmp_path), compact_records=25)
+    _escribir(journal, 200)
+    assert writer.flush(5)
+
+    segmentos = list_checkpoints(journal.path)
+    assert len(segmentos) > 5
+    # El último segmento pesa lo mismo que el segundo: no arrastra la sesión entera
+    assert os.path.getsize(segmentos[-1]) < 2 * os.path.getsize(segmentos[1])
+    registros = read_session(journal.path)
+    assert [r['d']['i'] for r in registros if r['k'] == 'state'] == list(range(200))
+
+
+def test_caida_durante_la_compactacion_no_duplica(tmp_path, writer):
+    journal = SessionJournal('s1', writer, str(tmp_path), compact_records=10 ** 6)
+    _escribir(journal, 30)
+    assert writer.flush(5)
+    sin_compactar = str(tmp_path / 'antes.jsonl')
+    shutil.copy(journal.path, sin_compactar)
+    journal.checkpoint()
+    assert writer.flush(5)
+
+    # Checkpoint escrito pero la bitácora sin reiniciar
+    shutil.copy(sin_compactar, journal.path)
+    registros = read_session(journal.path, repair=True)
+    assert [r['d']['i'] for r in registros if r['k'] == 'state'] == list(range(30))
+    assert read_journal(journal.path)[0]['k'] == 'checkpoint'
+
+
+def test_compactar_al_final_borra_bitacora_y_checkpoint(tmp_path, writer):
+    journal = SessionJournal('s1', writer, str(tmp_path), compact_records=25)
+    _escribir(journal, 60)
+    final = str(tmp_path / 's1.json')
+    journal.compact(final, lambda: {'session_id': 's1'})
+    assert writer.flush(5)
+    assert os.path.exists(final)
+    assert not os.path.exists(journal.path)
+    assert not os.path.exists(checkpoint_path(journal.path, 1))
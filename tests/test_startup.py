@@ -0,0 +1,20 @@
+"""
+Pruebas del arranque del servidor (startup.py).
+"""
+
+import socket
+
+from startup import wait_for_port
+
+
+def test_wait_for_port_espera_a_que_escuche():
+    servidor = socket.socket()
+    servidor.bind(('127.0.0.1', 0))
+    puerto = servidor.getsockname()[1]
+    # Enlazado pero sin escuchar: todavía no acepta conexiones
+    assert not wait_for_port(puerto, timeout=0.2)
+    servidor.listen()
+    try:
+        assert wait_for_port(puerto, timeout=2.0)
+    finally:
+        servidor.close()
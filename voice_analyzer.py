@@ -1,21 +1,362 @@
-# Selecciona opción 1
-# Habla al micrófono por 3 segundos
-# El sistema analiza y muestra resultados automáticamente
+"""
+ANALIZADOR DE VOZ EMOCIONAL (backend de la API)
+Graba segmentos, extrae características y clasifica el estado emocional.
+Solo usa NumPy: una sola STFT por salto (espectro.FrenteSTFT) de la que salen
+el tono (YIN con la autocorrelación del espectro de potencia), el tempo (flujo
+espectral) y las características espectrales, todo vectorizado por tramas.
+"""
+
+import numpy as np
+
+from caracteristicas import caracteristicas_tramas, detectar_pausas, fusionar_canales
+from espectro import FrenteSTFT, autocorrelacion, centroide, energia, flujo
+from linea_base import LineaBase
+from remuestreo import RemuestreadorPolifasico
+
+# Rango de tono de voz humana (Hz)
+PITCH_MIN = 60.0
+PITCH_MAX = 400.0
+
+# Umbrales de YIN: primer mínimo bajo 0.15, voz si el mínimo queda bajo 0.35
+YIN_THRESHOLD = 0.15
+YIN_VOICED_MAX = 0.35
+
+# Con input_channels=None se usan los canales del dispositivo solo si son a
+# lo más estos: 'default' de ALSA/Pulse reporta 32 o más canales virtuales
+# (copias del mismo micrófono) y se abre en mono
+MAX_AUTO_CHANNELS = 8
+
+# Rango de tempo silábico (BPM)
+TEMPO_MIN = 60.0
+TEMPO_MAX = 300.0
+
+# Voz de referencia de los umbrales de classify_emotion: (media, desviación).
+# La línea base de la sesión lleva las características a esta escala.
+BASELINE_REFERENCE = {
+    'volume_mean': (0.05, 0.02),
+    'pitch_mean': (190.0, 40.0),
+    'tempo': (125.0, 25.0),
+    'avg_pause_duration': (0.5, 0.3),
+    'speech_ratio': (0.7, 0.15)
+}
+# Un 0 en estas significa "no medido" (sin tramas sonoras / sin inicios)
+BASELINE_OPTIONAL = ('pitch_mean', 'tempo')
+
+
 class EmotionalVoiceAnalyzer:
-    def __init__(self, duration): 
+    """Analizador de voz para la API: record_audio_segment → extract_features → classify_emotion."""
+
+    def __init__(self, duration=3, sample_rate=16000, device=None, channel_fusion='snr',
+                 input_channels=None):
         self.duration = duration
+        self.sample_rate = sample_rate
+        self.device = device  # Dispositivo de entrada de sounddevice (None = por defecto)
+        # Varios micrófonos: 'snr' | 'energia' | 'mezcla' (ver caracteristicas.fusionar_canales)
+        self.channel_fusion = channel_fusion
+        # Canales a abrir (None = los del dispositivo si es un arreglo real, ver MAX_AUTO_CHANNELS)
+        self.input_channels = input_channels
+        self._resamplers = {}  # (frecuencia nativa, canales) -> remuestreador
+
+        # Ventana de integración de YIN (25 ms) y salto de 10 ms
+        self.pitch_frame = int(0.025 * sample_rate)
+        self.hop = int(0.01 * sample_rate)
+
+        self._lag_min = int(sample_rate / PITCH_MAX)
+        self._lag_max = int(sample_rate / PITCH_MIN)
+        # Cada trama STFT cubre la ventana de YIN más el lag máximo; sin aliasing
+        # circular de la autocorrelación para lags 0..lag_max: nfft >= trama + lag_max
+        self._pitch_nfft = 1 << (self.pitch_frame + 2 * self._lag_max - 1).bit_length()
+        self.stft = self.new_frontend()
+
         print(f"Analizador inicializado con duración: {self.duration} segundos.")
 
-    ESTADO_EMOCIONAL = "ANSIEDAD"
-    NIVEL_DE_RIESGO = "MEDIO"
-
-Confianza = 78/100
-caracteristicas_voz = "Volumen elevado | Habla acelerada | Energía vocal irregular"
-# voice_analyzer.py, línea 12
-Métricas = {
-    "Volumen": 0.142, 
-    "Tono": "267.3 Hz", 
-    "Tempo": "185.2 BPM", 
-    "pausas_segundos": 1, 
-    "Ratio_de_habla": "87%"
-}
\ No newline at end of file
+    # ------------------------------------------------------------------
+    # Captura
+    # ------------------------------------------------------------------
+
+    def input_format(self):
+        """(frecuencia nativa, canales) con los que se abre el dispositivo."""
+        import sounddevice as sd
+
+        info = sd.query_devices(self.device, 'input')
+        available = max(1, int(info['max_input_channels']))
+        if self.input_channels:
+            channels = min(int(self.input_channels), available)
+        else:
+            channels = available if available <= MAX_AUTO_CHANNELS else 1
+        return int(info['default_samplerate']), channels
+
+    def new_resampler(self, native_rate, channels):
+        """Remuestreador con historial propio para un stream del dispositivo."""
+        if self.channel_fusion == 'mezcla':
+            channels = 1
+        return RemuestreadorPolifasico(native_rate, self.sample_rate, channels)
+
+    def convert_input(self, audio, resampler):
+        """
+        Bloque (muestras x canales) del dispositivo → float32 a `sample_rate`:
+        1-D con un canal, (canales x muestras) con varios, mono con 'mezcla'.
+        """
+        if audio.shape[1] > 1 and self.channel_fusion == 'mezcla':
+            audio = audio.mean(axis=1)
+        elif audio.shape[1] == 1:
+            audio = audio.reshape(-1)
+        return resampler.procesar(audio).T
+
+    def record_audio_segment(self):
+        """
+        Graba `duration` segundos del micrófono (float32 en [-1, 1]).
+        El dispositivo se abre a su frecuencia nativa y el audio se remuestrea
+        a `sample_rate`. Con varios micrófonos regresa un bloque (canales x
+        muestras), salvo con channel_fusion='mezcla' (mono).
+        Cada llamada abre su propio stream (sd.rec comparte uno global entre
+        hilos); para captura continua ver audio_sources.MicrophoneSource.
+        """
+        import sounddevice as sd
+
+        native_rate, channels = self.input_format()
+        with sd.InputStream(samplerate=native_rate, channels=channels, dtype='float32',
+                            device=self.device) as stream:
+            audio, _ = stream.read(int(self.duration * native_rate))
+
+        resampler = self._resamplers.get((native_rate, channels))
+        if resampler is None:
+            resampler = self._resamplers[(native_rate, channels)] = self.new_resampler(native_rate, channels)
+        # Los segmentos no son contiguos: sin la cola del filtro de la grabación anterior
+        resampler.reiniciar()
+        return self.convert_input(audio, resampler)
+
+    # ------------------------------------------------------------------
+    # Características
+    # ------------------------------------------------------------------
+
+    def new_frontend(self):
+        """
+        Frente STFT con el plan del analizador (uno por stream: guarda las
+        tramas ya transformadas). `self.stft` solo se usa sin estado.
+        """
+        return FrenteSTFT(self.sample_rate, self.pitch_frame + self._lag_max, self.hop,
+                          nfft=self._pitch_nfft, bordes=self._lag_max,
+                          max_tramas=int(self.duration * self.sample_rate / self.hop) + 1)
+
+    def stream_spectra(self, audio, frontend):
+        """
+        Pasa un segmento del stream por su frente STFT: solo se transforman
+        las tramas que completa el audio nuevo. Regresa (señal float32 mono,
+        espectros de esas tramas) para el VAD y extract_features.
+        """
+        if np.ndim(audio) > 1:
+            audio = fusionar_canales(audio, self.sample_rate, self.channel_fusion)
+        x = self._to_float(audio)
+        return x, frontend.ultimas(frontend.agregar(x))
+
+    def frame_power(self, spectra):
+        """Potencia media (x² promedio) de cada trama STFT, por Parseval."""
+        return energia(spectra['potencia'], self.stft.plan) / self.stft.plan.tam_trama
+
+    def _to_float(self, audio):
+        """Convierte el audio a float32 normalizado en [-1, 1]."""
+        audio = np.asarray(audio).reshape(-1)
+        if audio.dtype == np.int16:
+            return audio.astype(np.float32) / 32768.0
+        return audio.astype(np.float32, copy=False)
+
+    def estimate_pitch(self, spectra):
+        """
+        Tono fundamental por trama con YIN (diferencia acumulada normalizada)
+        a partir de los espectros del frente STFT: la autocorrelación es la
+        irfft de la potencia y las energías desplazadas salen de las sumas
+        acumuladas de los bordes, sin otra FFT.
+        Regresa (pitch_hz, claridad) por trama; pitch es 0 donde no hay voz.
+        """
+        power = spectra['potencia']
+        n = len(power)
+        if n == 0:
+            return np.zeros(0, np.float32), np.zeros(0, np.float32)
+
+        # r(tau) = sum_j x[j] * x[j + tau] sobre toda la trama (YIN tipo II)
+        corr = autocorrelacion(power, self.stft.plan, self._lag_max)
+
+        # d(tau) = e(x[0:L-tau]) + e(x[tau:L]) - 2 r(tau), con e la energía
+        head, tail = spectra['inicio'], spectra['fin']
+        total = tail[:, -1:]
+        diff = np.maximum(tail[:, ::-1] + (total - head) - 2.0 * corr, 0.0)
+        cum = np.cumsum(diff[:, 1:], axis=1)
+        lags = np.arange(1, self._lag_max + 1, dtype=np.float32)
+        cmnd = np.ones_like(diff)
+        cmnd[:, 1:] = diff[:, 1:] * lags / np.maximum(cum, 1e-12)
+
+        search = cmnd[:, self._lag_min:]
+        below = search < YIN_THRESHOLD
+        has_dip = below.any(axis=1)
+        first = np.where(has_dip, np.argmax(below, axis=1), np.argmin(search, axis=1))
+
+        # Mínimo local justo después del primer cruce del umbral
+        offsets = np.arange(search.shape[1])
+        region = (offsets >= first[:, None]) & (offsets <= first[:, None] * 5 // 4 + 2)
+        best = np.argmin(np.where(region, search, np.inf), axis=1)
+        rows = np.arange(n)
+        depth = search[rows, best]
+
+        # Interpolación parabólica alrededor del mínimo
+        left = search[rows, np.maximum(best - 1, 0)]
+        right = search[rows, np.minimum(best + 1, search.shape[1] - 1)]
+        denom = left - 2 * depth + right
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+        lag = best + self._lag_min + np.clip(shift, -0.5, 0.5)
+
+        clarity = 1.0 - np.clip(depth, 0.0, 1.0)
+        voiced = (total[:, 0] > 1e-6 * self.stft.plan.tam_trama) & (depth < YIN_VOICED_MAX)
+        pitch = np.where(voiced, self.sample_rate / lag, 0.0)
+        return pitch.astype(np.float32), clarity.astype(np.float32)
+
+    def estimate_tempo(self, onset):
+        """
+        Tempo silábico (BPM) a partir de la envolvente de inicios
+        (flujo espectral por trama, ver espectro.flujo).
+        """
+        if len(onset) < 3:
+            return 0.0
+
+        onset = onset - onset.mean()
+        if not np.any(onset):
+            return 0.0
+
+        nfft = 1 << (2 * len(onset) - 1).bit_length()
+        spec = np.fft.rfft(onset, n=nfft)
+        acf = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, n=nfft)[:len(onset)]
+
+        frame_rate = self.sample_rate / self.hop
+        lag_min = max(1, int(frame_rate * 60.0 / TEMPO_MAX))
+        lag_max = min(len(acf) - 1, int(frame_rate * 60.0 / TEMPO_MIN))
+        if lag_max <= lag_min or acf[0] <= 0:
+            return 0.0
+
+        best = lag_min + int(np.argmax(acf[lag_min:lag_max + 1]))
+        return float(60.0 * frame_rate / best)
+
+    def extract_features(self, audio, spectra=None):
+        """
+        Extrae las características de un segmento de audio.
+        Regresa None si el segmento está vacío o es demasiado corto.
+        Un bloque (canales x muestras) se reduce primero a una sola señal
+        (mejor SNR o fusión por energía): el tono se estima una vez, no por canal.
+        `spectra` son las tramas del segmento ya transformadas por un frente
+        STFT del stream (new_frontend); si no se dan, se transforma aquí.
+        """
+        if audio is None:
+            return None
+        if np.ndim(audio) > 1:
+            audio = fusionar_canales(audio, self.sample_rate, self.channel_fusion)
+        x = self._to_float(audio)
+        if len(x) < self.pitch_frame + self._lag_max:
+            return None
+
+        # Energía y pausas con el motor de tramas (salto de 10 ms)
+        frames = caracteristicas_tramas(x, self.sample_rate, trama_seg=self.hop / self.sample_rate)
+        rms = frames['rms']
+        pauses = detectar_pausas(frames['sonora'], self.hop / self.sample_rate)
+
+        if spectra is None:
+            spectra = self.stft.analizar(x)
+        power = spectra['potencia']
+        pitch, clarity = self.estimate_pitch(spectra)
+        voiced = pitch > 0
+        voiced_pitch = pitch[voiced]
+        onset = flujo(power)
+
+        # Jitter y shimmer aproximados: variación relativa entre tramas sonoras
+        # consecutivas del periodo y de la amplitud (no ciclo a ciclo)
+        jitter = shimmer = 0.0
+        consecutive = voiced[1:] & voiced[:-1]
+        if consecutive.any():
+            period = 1.0 / np.maximum(pitch, 1e-6)
+            amplitude = np.sqrt(self.frame_power(spectra))
+            jitter = float(np.abs(np.diff(period))[consecutive].mean() / period[voiced].mean())
+            shimmer = float(np.abs(np.diff(amplitude))[consecutive].mean()
+                            / max(amplitude[voiced].mean(), 1e-12))
+
+        return {
+            'volume_mean': float(rms.mean()),
+            'volume_std': float(rms.std()),
+            'pitch_mean': float(voiced_pitch.mean()) if len(voiced_pitch) else 0.0,
+            'pitch_std': float(voiced_pitch.std()) if len(voiced_pitch) else 0.0,
+            'voiced_ratio': float(len(voiced_pitch) / max(len(pitch), 1)),
+            'tempo': self.estimate_tempo(onset),
+            'pause_count': int(len(pauses)),
+            'avg_pause_duration': float(pauses.mean()) if len(pauses) else 0.0,
+            'speech_ratio': float(frames['sonora'].mean()),
+            'spectral_centroid': float(centroide(power.sum(axis=0, keepdims=True), self.stft.plan)[0]),
+            'spectral_flux': float(onset.mean()) if len(onset) else 0.0,
+            'jitter': jitter,
+            'shimmer': shimmer
+        }
+
+    # ------------------------------------------------------------------
+    # Clasificación
+    # ------------------------------------------------------------------
+
+    def new_baseline(self, snapshot=None):
+        """Línea base de la voz para una sesión (restaurada de `snapshot` si se da)."""
+        baseline = LineaBase(BASELINE_REFERENCE, opcionales=BASELINE_OPTIONAL)
+        return baseline.cargar(snapshot) if snapshot else baseline
+
+    def classify_emotion(self, features, baseline=None):
+        """
+        Clasifica la emoción a partir de las características.
+        Regresa (emocion, nivel_riesgo, confianza, explicacion).
+        Con una `baseline` lista, las reglas se aplican a las características
+        normalizadas contra la voz de la persona; la crisis y la depresión se
+        evalúan además con los valores absolutos (una voz deprimida toda la
+        sesión no se vuelve "estable" al normalizarla).
+        """
+        raw = features
+        if baseline is not None and baseline.lista:
+            features = baseline.normalizar(features)
+
+        volume = features['volume_mean']
+        pitch = features['pitch_mean']
+        tempo = features['tempo']
+        pause = features['avg_pause_duration']
+        speech = features['speech_ratio']
+
+        traits = []
+        if volume > 0.1:
+            traits.append('Volumen elevado')
+        elif volume < 0.02:
+            traits.append('Volumen muy bajo')
+        if tempo > 160:
+            traits.append('Habla acelerada')
+        elif 0 < tempo < 90:
+            traits.append('Habla lenta')
+        if features.get('volume_std', 0) > 0.6 * max(volume, 1e-6):
+            traits.append('Energía vocal irregular')
+        if pause > 1.0:
+            traits.append('Pausas largas')
+        if 0 < pitch < 150:
+            traits.append('Tono bajo')
+        elif pitch > 250:
+            traits.append('Tono alto')
+        explanation = ' | '.join(traits) or 'Parámetros de voz en rango normal'
+
+        # Confianza: más voz analizada → más confianza
+        confidence = min(0.95, 0.5 + 0.45 * raw['speech_ratio'])
+
+        # CRISIS: voz casi ausente con pausas largas (se evalúa primero)
+        if raw['volume_mean'] < 0.01 and raw['avg_pause_duration'] > 1.5 and raw['speech_ratio'] < 0.3:
+            return 'crisis', 'critico', 0.8, explanation
+
+        # DEPRESIÓN: volumen muy bajo, poca habla, pausas largas
+        if any(f['volume_mean'] < 0.02 and f['speech_ratio'] < 0.5 and f['avg_pause_duration'] > 0.8
+               for f in (raw, features)):
+            return 'depresion', 'alto', confidence, explanation
+
+        # ANSIEDAD: volumen alto, habla acelerada o tono alto
+        if volume > 0.1 and (tempo > 160 or pitch > 250):
+            return 'ansiedad', 'medio', confidence, explanation
+
+        # TRISTEZA: volumen bajo/medio y tono bajo
+        if volume < 0.05 and 0 < pitch < 150:
+            return 'tristeza', 'medio', confidence, explanation
+
+        return 'estable', 'normal', confidence, explanation
@@ -0,0 +1,123 @@
+"""
+VOZ SINTÉTICA DETERMINISTA - CABINAS ANTI-SUICIDIO
+Genera audio tipo voz (tono con armónicos, jitter de F0, sílabas, pausas,
+ruido y volumen variable) a 16 kHz sin micrófono. La misma semilla produce
+siempre la misma señal, así que sirve para benchmarks, pruebas y para
+alimentar el análisis por lotes.
+
+Uso:
+    python voz_sintetica.py salida/                 # un WAV por perfil
+    python voz_sintetica.py salida/ --segundos 30 --semilla 7
+"""
+
+import argparse
+import os
+import wave
+
+import numpy as np
+
+RATE = 16000
+
+# Parámetros por perfil (aproximan lo que cada clasificador espera ver)
+PERFILES = {
+    'estable': dict(f0=150, volumen=0.25, silabas_por_seg=4.0, pausas_por_seg=0.4,
+                    duracion_pausa=0.3, variacion_volumen=0.2),
+    'ansiedad': dict(f0=270, volumen=0.6, silabas_por_seg=6.5, pausas_por_seg=0.2,
+                     duracion_pausa=0.2, variacion_volumen=0.6, jitter=0.04),
+    'tristeza': dict(f0=110, volumen=0.08, silabas_por_seg=3.0, pausas_por_seg=0.6,
+                     duracion_pausa=0.5, variacion_volumen=0.1),
+    'depresion': dict(f0=100, volumen=0.03, silabas_por_seg=2.0, pausas_por_seg=0.6,
+                      duracion_pausa=1.0, variacion_volumen=0.1),
+    'crisis': dict(f0=95, volumen=0.015, silabas_por_seg=1.5, pausas_por_seg=0.4,
+                   duracion_pausa=2.0, variacion_volumen=0.1),
+    'silencio': dict(volumen=0.0, ruido=0.0005),
+}
+
+
+def generar_voz(segundos=3.0, rate=RATE, f0=150, jitter=0.02, volumen=0.25,
+                silabas_por_seg=4.0, pausas_por_seg=0.4, duracion_pausa=0.3,
+                variacion_volumen=0.2, ruido=0.0005, armonicos=5, semilla=0):
+    """
+    Regresa `segundos` de voz sintética como int16.
+
+    f0/jitter:         tono fundamental (Hz) y desviación relativa lenta
+    volumen:           amplitud pico de la voz (fracción de escala completa)
+    silabas_por_seg:   modulación de amplitud tipo sílaba
+    pausas_por_seg:    frecuencia media de pausas de `duracion_pausa` segundos
+    variacion_volumen: cambio lento de intensidad (0 = constante)
+    ruido:             desviación del ruido blanco de fondo
+    """
+    rng = np.random.default_rng(semilla)
+    n = int(segundos * rate)
+    t = np.arange(n) / rate
+
+    # F0 con jitter: caminata aleatoria suavizada (cambia cada 10 ms)
+    pasos = max(n // (rate // 100), 2)
+    deriva = np.cumsum(rng.normal(0.0, jitter, pasos))
+    deriva -= np.linspace(0, deriva[-1], pasos)  # Sin tendencia: vuelve al tono base
+    f0_t = f0 * (1.0 + np.interp(t, np.linspace(0, segundos, pasos), deriva))
+    fase = 2 * np.pi * np.cumsum(f0_t) / rate
+
+    voz = np.zeros(n)
+    for k in range(1, armonicos + 1):
+        voz += np.sin(k * fase) / k
+    voz /= np.abs(voz).max() or 1.0
+
+    # Sílabas: envolvente de medio seno con duración levemente aleatoria
+    envolvente = np.abs(np.sin(np.pi * silabas_por_seg * t + rng.uniform(0, np.pi)))
+    envolvente **= 0.6
+
+    # Intensidad lenta (frases más fuertes o más débiles)
+    lenta = 1.0 + variacion_volumen * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+
+    # Pausas: intervalos en silencio en posiciones aleatorias
+    mascara = np.ones(n)
+    num_pausas = rng.poisson(pausas_por_seg * segundos)
+    largo = int(duracion_pausa * rate)
+    for inicio in rng.integers(0, max(n - largo, 1), num_pausas):
+        mascara[inicio:inicio + largo] = 0.0
+
+    senal = volumen * voz * envolvente * np.clip(lenta, 0, None) * mascara
+    senal += rng.normal(0.0, ruido, n)
+    return (np.clip(senal, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def generar_perfil(nombre, segundos=3.0, rate=RATE, semilla=0):
+    """Voz sintética con los parámetros de un perfil de PERFILES."""
+    return generar_voz(segundos, rate, semilla=semilla, **PERFILES[nombre])
+
+
+def ventanas_de_prueba(cantidad, segundos=3.0, rate=RATE, semilla=0):
+    """Lista determinista de ventanas que recorre todos los perfiles."""
+    nombres = list(PERFILES)
+    return [generar_perfil(nombres[i % len(nombres)], segundos, rate, semilla + i)
+            for i in range(cantidad)]
+
+
+def guardar_wav(ruta, audio, rate=RATE):
+    """Escribe audio int16 mono como WAV."""
+    with wave.open(ruta, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.asarray(audio, dtype=np.int16).tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera WAV de voz sintética por perfil")
+    parser.add_argument('salida', help="Directorio donde guardar los WAV")
+    parser.add_argument('--segundos', type=float, default=10.0)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--perfil', action='append', choices=list(PERFILES),
+                        help="Perfil a generar (repetible; por defecto todos)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.salida, exist_ok=True)
+    for nombre in args.perfil or list(PERFILES):
+        ruta = os.path.join(args.salida, f"{nombre}_{args.semilla}.wav")
+        guardar_wav(ruta, generar_perfil(nombre, args.segundos, semilla=args.semilla))
+        print(f"✓ {ruta}")
+
+
+if __name__ == '__main__':
+    main()